@@ -0,0 +1,199 @@
+"""
+Pure-Python container probing for uploaded videos.
+
+Reads only the container headers (MP4 moov/mvhd/tkhd atoms, WebM/Matroska
+EBML Info and Tracks), so probing a multi-hundred-MB file touches a few KB.
+Kept free of server imports so it can run inside a ProcessPoolExecutor.
+"""
+import os
+import struct
+from typing import BinaryIO, Optional
+
+# ============ MP4 / QUICKTIME ============
+
+MP4_CONTAINER_BOXES = {b"moov", b"trak"}
+
+def _iter_boxes(f: BinaryIO, start: int, end: int):
+    """Yield (type, payload_offset, payload_size) for boxes in [start, end)"""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, size - header_size
+        offset += size
+
+def _parse_mvhd(data: bytes) -> Optional[float]:
+    version = data[0]
+    if version == 1:
+        timescale, duration = struct.unpack(">IQ", data[20:32])
+    else:
+        timescale, duration = struct.unpack(">II", data[12:20])
+    return duration / timescale if timescale else None
+
+def _parse_tkhd(data: bytes) -> tuple:
+    version = data[0]
+    # Width/height are 16.16 fixed point at the end of the box
+    offset = 88 if version == 1 else 76
+    width, height = struct.unpack(">II", data[offset:offset + 8])
+    return width >> 16, height >> 16
+
+def probe_mp4(f: BinaryIO, file_size: int) -> dict:
+    result = {"container": "mp4", "duration_seconds": None, "width": None, "height": None, "faststart": None}
+    seen_mdat = False
+    for box_type, payload, size in _iter_boxes(f, 0, file_size):
+        if box_type == b"mdat":
+            seen_mdat = True
+        elif box_type == b"moov":
+            result["faststart"] = not seen_mdat
+            _probe_mp4_moov(f, payload, payload + size, result)
+            break
+    if result["duration_seconds"] is None:
+        raise ValueError("MP4 tanpa atom moov/mvhd")
+    return result
+
+def _probe_mp4_moov(f: BinaryIO, start: int, end: int, result: dict):
+    for box_type, payload, size in _iter_boxes(f, start, end):
+        if box_type == b"mvhd":
+            f.seek(payload)
+            result["duration_seconds"] = _parse_mvhd(f.read(min(size, 32)))
+        elif box_type == b"tkhd" and not result["width"]:
+            f.seek(payload)
+            width, height = _parse_tkhd(f.read(min(size, 96)))
+            if width and height:
+                result["width"], result["height"] = width, height
+        elif box_type in MP4_CONTAINER_BOXES:
+            _probe_mp4_moov(f, payload, payload + size, result)
+
+# ============ WEBM / MATROSKA ============
+
+EBML_HEADER = 0x1A45DFA3
+MKV_SEGMENT = 0x18538067
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_CLUSTER = 0x1F43B675
+
+def _read_vint(f: BinaryIO, keep_marker: bool) -> tuple:
+    """Read an EBML variable-length integer; returns (value, length, all_ones)"""
+    first = f.read(1)
+    if not first:
+        raise EOFError
+    byte = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not byte & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("EBML vint tidak valid")
+    value = byte if keep_marker else byte & (mask - 1)
+    for b in f.read(length - 1):
+        value = (value << 8) | b
+    all_ones = not keep_marker and value == (1 << (7 * length)) - 1
+    return value, length, all_ones
+
+def _iter_elements(f: BinaryIO, start: int, end: Optional[int]):
+    """Yield (id, data_offset, size) for EBML elements; size is None when unknown"""
+    offset = start
+    while end is None or offset < end:
+        f.seek(offset)
+        try:
+            element_id, id_length, _ = _read_vint(f, keep_marker=True)
+            size, size_length, unknown = _read_vint(f, keep_marker=False)
+        except EOFError:
+            return
+        data_offset = offset + id_length + size_length
+        yield element_id, data_offset, None if unknown else size
+        if unknown:
+            return
+        offset = data_offset + size
+
+def _read_uint(f: BinaryIO, offset: int, size: int) -> int:
+    f.seek(offset)
+    return int.from_bytes(f.read(size), "big")
+
+def _read_float(f: BinaryIO, offset: int, size: int) -> float:
+    f.seek(offset)
+    data = f.read(size)
+    return struct.unpack(">f" if size == 4 else ">d", data)[0]
+
+def probe_webm(f: BinaryIO, file_size: int) -> dict:
+    result = {"container": "webm", "duration_seconds": None, "width": None, "height": None, "faststart": True}
+    for element_id, offset, size in _iter_elements(f, 0, file_size):
+        if element_id == MKV_SEGMENT:
+            _probe_mkv_segment(f, offset, offset + size if size is not None else file_size, result)
+            break
+    if result["duration_seconds"] is None:
+        raise ValueError("WebM tanpa Segment Info Duration")
+    return result
+
+def _probe_mkv_segment(f: BinaryIO, start: int, end: int, result: dict):
+    timecode_scale = 1_000_000
+    duration = None
+    for element_id, offset, size in _iter_elements(f, start, end):
+        if size is None or element_id == MKV_CLUSTER:
+            # Info and Tracks precede the clusters
+            break
+        if element_id == MKV_INFO:
+            for child_id, child_offset, child_size in _iter_elements(f, offset, offset + size):
+                if child_id == MKV_TIMECODE_SCALE:
+                    timecode_scale = _read_uint(f, child_offset, child_size)
+                elif child_id == MKV_DURATION:
+                    duration = _read_float(f, child_offset, child_size)
+        elif element_id == MKV_TRACKS:
+            _probe_mkv_tracks(f, offset, offset + size, result)
+    if duration is not None:
+        result["duration_seconds"] = duration * timecode_scale / 1e9
+
+def _probe_mkv_tracks(f: BinaryIO, start: int, end: int, result: dict):
+    for entry_id, entry_offset, entry_size in _iter_elements(f, start, end):
+        if entry_id != MKV_TRACK_ENTRY or entry_size is None:
+            continue
+        for child_id, child_offset, child_size in _iter_elements(f, entry_offset, entry_offset + entry_size):
+            if child_id != MKV_VIDEO or child_size is None:
+                continue
+            for video_id, video_offset, video_size in _iter_elements(f, child_offset, child_offset + child_size):
+                if video_id == MKV_PIXEL_WIDTH:
+                    result["width"] = _read_uint(f, video_offset, video_size)
+                elif video_id == MKV_PIXEL_HEIGHT:
+                    result["height"] = _read_uint(f, video_offset, video_size)
+            if result["width"]:
+                return
+
+# ============ ENTRY POINT ============
+
+def probe_file(path: str) -> dict:
+    """Probe a video file; raises ValueError if the container is not recognised"""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        magic = f.read(12)
+        f.seek(0)
+        try:
+            if magic[:4] == EBML_HEADER.to_bytes(4, "big"):
+                result = probe_webm(f, file_size)
+            elif magic[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+                result = probe_mp4(f, file_size)
+            else:
+                raise ValueError("Format container tidak dikenali")
+        except (struct.error, IndexError, EOFError):
+            raise ValueError("Header container rusak atau terpotong")
+
+    duration = result["duration_seconds"]
+    result["bitrate"] = int(file_size * 8 / duration) if duration else None
+    return result
@@ -0,0 +1,618 @@
+"""
+MongoDB storage through Motor: the original backend of the app.
+"""
+import asyncio
+import logging
+import uuid
+from typing import Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+from repository import PLAY_COUNTS, SCHEDULE_FIELDS, VIDEO_COLLECTIONS, DuplicateError, ListQuery, Repository
+
+logger = logging.getLogger(__name__)
+
+ADMIN_REVISIONS_ID = "admin"
+
+# ============ INDEXES ============
+
+def _id_index() -> IndexModel:
+    return IndexModel([("id", ASCENDING)], name="id_unique", unique=True)
+
+def _active_order_index() -> IndexModel:
+    return IndexModel([("is_active", ASCENDING), ("order", ASCENDING)], name="active_order")
+
+def _created_index() -> IndexModel:
+    # Keyset order of the admin lists
+    return IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_id")
+
+# Indexes the app relies on, reconciled at startup
+REQUIRED_INDEXES = {
+    "maghrib_schedules": [
+        IndexModel([("location", ASCENDING), ("date", ASCENDING)], name="location_date_unique", unique=True),
+        IndexModel([("date", ASCENDING), ("location", ASCENDING)], name="date_location"),
+        _id_index(),
+    ],
+    "tvc_videos": [
+        _active_order_index(),
+        IndexModel([("order", ASCENDING), ("id", ASCENDING)], name="order_id"),
+        _id_index(),
+    ],
+    "berbuka_videos": [_active_order_index(), _created_index(), _id_index()],
+    "countdown_videos": [_active_order_index(), _created_index(), _id_index()],
+    "admin_users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        _id_index(),
+    ],
+    "upload_sessions": [_id_index()],
+    "media_files": [
+        IndexModel([("sha256", ASCENDING)], name="sha256_unique", unique=True),
+        IndexModel([("filename", ASCENDING)], name="filename_unique", unique=True),
+        _id_index(),
+    ],
+    "screen_heartbeats": [
+        IndexModel([("received_at", ASCENDING)], name="received_at"),
+        IndexModel([("screen_id", ASCENDING), ("received_at", ASCENDING)], name="screen_received"),
+    ],
+    # One bucket document per screen and hour
+    "play_events": [
+        IndexModel([("screen_id", ASCENDING), ("hour", ASCENDING)], name="screen_hour_unique", unique=True),
+        IndexModel([("hour", ASCENDING)], name="hour"),
+    ],
+    "play_rollups_hourly": [
+        IndexModel(
+            [("hour", ASCENDING), ("video_id", ASCENDING), ("screen_id", ASCENDING)],
+            name="hour_video_screen_unique", unique=True
+        ),
+        IndexModel([("screen_id", ASCENDING), ("hour", ASCENDING)], name="screen_hour"),
+        IndexModel([("video_id", ASCENDING), ("hour", ASCENDING)], name="video_hour"),
+    ],
+    "play_rollups_daily": [
+        IndexModel(
+            [("date", ASCENDING), ("video_id", ASCENDING), ("screen_id", ASCENDING)],
+            name="date_video_screen_unique", unique=True
+        ),
+        IndexModel([("screen_id", ASCENDING), ("date", ASCENDING)], name="screen_date"),
+        IndexModel([("video_id", ASCENDING), ("date", ASCENDING)], name="video_date"),
+    ],
+}
+
+# Rollup collections by report period field
+PLAY_ROLLUP_COLLECTIONS = {"hour": "play_rollups_hourly", "date": "play_rollups_daily"}
+
+# Batch ids remembered per proof-of-play document; a failed batch is retried
+# within seconds, long before that many newer batches reach the same document
+PLAY_BATCHES_KEPT = 16
+
+# Indexes replaced by newer definitions, dropped at startup
+OBSOLETE_INDEXES = {
+    "maghrib_schedules": [
+        "date_unique",  # one schedule per date, before multi-location
+        "date",  # superseded by date_location, which also orders the admin list
+    ],
+}
+
+# Hot queries checked by the index report: (collection, filter, sort)
+HOT_QUERIES = [
+    ("maghrib_schedules", {"location": "x", "date": "2026-01-01"}, None),
+    ("maghrib_schedules", {"date": {"$gte": "2026-01-01", "$lte": "2026-01-08"}}, None),
+    ("maghrib_schedules", {}, [("date", ASCENDING), ("location", ASCENDING)]),
+    ("maghrib_schedules", {"location": "x"}, [("date", ASCENDING), ("location", ASCENDING)]),
+    ("maghrib_schedules", {"id": "x"}, None),
+    ("tvc_videos", {"is_active": True}, [("order", ASCENDING)]),
+    ("tvc_videos", {}, [("order", ASCENDING), ("id", ASCENDING)]),
+    ("tvc_videos", {"id": "x"}, None),
+    ("berbuka_videos", {"is_active": True}, None),
+    ("berbuka_videos", {}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("berbuka_videos", {"id": "x"}, None),
+    ("countdown_videos", {"is_active": True}, None),
+    ("countdown_videos", {}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("countdown_videos", {"id": "x"}, None),
+    ("admin_users", {"username": "x"}, None),
+    ("admin_users", {"id": "x"}, None),
+]
+
+def _index_matches(existing: dict, index: IndexModel) -> bool:
+    spec = index.document
+    return (
+        list(existing["key"]) == list(spec["key"].items())
+        and bool(existing.get("unique")) == bool(spec.get("unique"))
+    )
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+# ============ METRICS ============
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Per-collection command latency; pymongo calls this from its own threads"""
+
+    def __init__(self, duration, failures):
+        self.duration = duration  # histogram labelled (collection, command)
+        self.failures = failures  # counter labelled (collection, command)
+        self.pending = {}
+
+    def started(self, event):
+        if len(self.pending) > 10000:
+            self.pending.clear()
+        target = event.command.get("collection") if event.command_name == "getMore" else event.command.get(event.command_name)
+        self.pending[(event.connection_id, event.request_id)] = target if isinstance(target, str) else "-"
+
+    def succeeded(self, event):
+        self._observe(event)
+
+    def failed(self, event):
+        collection = self._observe(event)
+        self.failures.inc(collection, event.command_name)
+
+    def _observe(self, event) -> str:
+        collection = self.pending.pop((event.connection_id, event.request_id), "-")
+        self.duration.observe(collection, event.command_name, value=event.duration_micros / 1e6)
+        return collection
+
+# ============ QUERY HELPERS ============
+
+def _keyset_filter(sort_fields: tuple, key: tuple, after: bool) -> dict:
+    """Documents strictly after `key` (after=True) or up to and including it, in sort_fields order"""
+    op = "$gt" if after else "$lt"
+    branches = []
+    for i, field in enumerate(sort_fields):
+        branch = {f: v for f, v in zip(sort_fields[:i], key[:i])}
+        last = i == len(sort_fields) - 1
+        branch[field] = {op if after or not last else "$lte": key[i]}
+        branches.append(branch)
+    return {"$or": branches}
+
+def _list_filter(query: ListQuery, after: Optional[tuple] = None, upto: Optional[tuple] = None) -> dict:
+    conditions = []
+    match = dict(query.equals)
+    for field, (low, high) in query.ranges.items():
+        bounds = {}
+        if low is not None:
+            bounds["$gte"] = low
+        if high is not None:
+            bounds["$lte"] = high
+        if bounds:
+            match[field] = bounds
+    if match:
+        conditions.append(match)
+    if after is not None:
+        conditions.append(_keyset_filter(query.sort_fields, after, after=True))
+    if upto is not None:
+        conditions.append(_keyset_filter(query.sort_fields, upto, after=False))
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def _sort(query: ListQuery) -> list:
+    return [(field, ASCENDING) for field in query.sort_fields]
+
+class MongoRepository(Repository):
+    name = "mongo"
+
+    def __init__(self, db):
+        self.db = db
+        # Cleared the first time the server rejects a transaction (standalone mongod)
+        self.transactions_supported = True
+
+    @classmethod
+    def connect(cls, mongo_url: str, db_name: str, event_listeners: Optional[list] = None) -> "MongoRepository":
+        client = AsyncIOMotorClient(mongo_url, event_listeners=event_listeners or [])
+        return cls(client[db_name])
+
+    # ---- Lifecycle ----
+
+    async def ensure_schema(self):
+        """Create missing indexes and recreate ones whose definition changed"""
+        for collection_name, indexes in REQUIRED_INDEXES.items():
+            collection = self.db[collection_name]
+            existing = await collection.index_information()
+            for name in OBSOLETE_INDEXES.get(collection_name, []):
+                if name in existing:
+                    logger.info(f"Dropping obsolete index {collection_name}.{name}")
+                    await collection.drop_index(name)
+            for index in indexes:
+                name = index.document["name"]
+                if name in existing:
+                    if _index_matches(existing[name], index):
+                        continue
+                    logger.info(f"Recreating index {collection_name}.{name}")
+                    await collection.drop_index(name)
+                try:
+                    await collection.create_indexes([index])
+                    logger.info(f"Created index {collection_name}.{name}")
+                except OperationFailure as e:
+                    # E.g. existing duplicate data prevents a unique index
+                    logger.error(f"Failed to create index {collection_name}.{name}: {e}")
+
+    async def explain_hot_queries(self) -> List[dict]:
+        """Run explain on every hot query and report which ones still do a collection scan"""
+        report = []
+        for collection_name, query, sort in HOT_QUERIES:
+            cursor = self.db[collection_name].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+            stages = [stage for stage in _plan_stages(plan) if stage]
+            report.append({
+                "collection": collection_name,
+                "filter": query,
+                "sort": dict(sort) if sort else None,
+                "stages": stages,
+                "collection_scan": "COLLSCAN" in stages,
+            })
+        return report
+
+    def close(self):
+        self.db.client.close()
+
+    async def run_transaction(self, callback):
+        """Run `await callback(session)` in a transaction, or without one where the deployment has none"""
+        if self.transactions_supported:
+            try:
+                async with await self.db.client.start_session() as session:
+                    async with session.start_transaction():
+                        return await callback(session)
+            except OperationFailure as e:
+                # IllegalOperation: transactions need a replica set; the first operation fails, nothing was written
+                if e.code != 20:
+                    raise
+                self.transactions_supported = False
+                logger.warning("MongoDB has no transaction support (standalone); batch updates run without one")
+        return await callback(None)
+
+    # ---- Keyset listings ----
+
+    async def list_boundary(self, query: ListQuery, after: Optional[tuple], limit: int) -> tuple:
+        projection = {"_id": 0, **{field: 1 for field in query.sort_fields}}
+        boundary = await self.db[query.collection].find(_list_filter(query, after), projection).sort(
+            _sort(query)).skip(limit - 1).limit(2).to_list(2)
+        if not boundary:
+            return None, False
+        return tuple(boundary[0].get(field) for field in query.sort_fields), len(boundary) > 1
+
+    async def iter_list(self, query: ListQuery, after: Optional[tuple] = None, upto: Optional[tuple] = None):
+        projection = {"_id": 0}
+        if query.fields:
+            projection.update({field: 1 for field in query.fields})
+        async for doc in self.db[query.collection].find(_list_filter(query, after, upto), projection).sort(_sort(query)):
+            yield doc
+
+    # ---- Admin users ----
+
+    async def find_user(self, username: str) -> Optional[dict]:
+        return await self.db.admin_users.find_one({"username": username}, {"_id": 0})
+
+    async def find_user_by_id(self, user_id: str) -> Optional[dict]:
+        return await self.db.admin_users.find_one({"id": user_id}, {"_id": 0})
+
+    async def count_users(self) -> int:
+        return await self.db.admin_users.count_documents({})
+
+    async def insert_user(self, doc: dict):
+        try:
+            await self.db.admin_users.insert_one(dict(doc))
+        except DuplicateKeyError:
+            raise DuplicateError(doc.get("username"))
+
+    async def update_user(self, fields: dict, user_id: Optional[str] = None, username: Optional[str] = None):
+        query = {"id": user_id} if user_id is not None else {"username": username}
+        await self.db.admin_users.update_one(query, {"$set": fields})
+
+    async def delete_user(self, user_id: str) -> bool:
+        result = await self.db.admin_users.delete_one({"id": user_id})
+        return result.deleted_count > 0
+
+    async def list_users(self) -> List[dict]:
+        return await self.db.admin_users.find(
+            {}, {"_id": 0, "password_hash": 0, "tokens_valid_after": 0}
+        ).sort("created_at", 1).to_list(None)
+
+    async def user_token_states(self) -> List[dict]:
+        users = await self.db.admin_users.find({}, {"_id": 0, "username": 1, "tokens_valid_after": 1}).to_list(None)
+        return [{"username": u["username"], "tokens_valid_after": u.get("tokens_valid_after", 0)} for u in users]
+
+    # ---- Videos ----
+
+    async def insert_video(self, collection: str, doc: dict):
+        await self.db[collection].insert_one(dict(doc))
+
+    async def update_video(self, collection: str, video_id: str, fields: dict) -> Optional[tuple]:
+        previous = await self.db[collection].find_one_and_update({"id": video_id}, {"$set": fields}, {"_id": 0})
+        if previous is None:
+            return None
+        return previous, {**previous, **fields}
+
+    async def delete_video(self, collection: str, video_id: str) -> Optional[dict]:
+        return await self.db[collection].find_one_and_delete({"id": video_id}, {"_id": 0})
+
+    async def video_ids(self, collection: str) -> set:
+        return set(await self.db[collection].distinct("id"))
+
+    async def apply_video_updates(self, updates: Dict[str, Dict[str, dict]]) -> Dict[str, int]:
+        async def apply(session) -> dict:
+            modified = {}
+            for collection, by_id in updates.items():
+                if not by_id:
+                    modified[collection] = 0
+                    continue
+                result = await self.db[collection].bulk_write(
+                    [UpdateOne({"id": video_id}, {"$set": fields}) for video_id, fields in by_id.items()],
+                    session=session
+                )
+                modified[collection] = result.modified_count
+            return modified
+
+        return await self.run_transaction(apply)
+
+    async def video_urls(self) -> List[str]:
+        urls = []
+        for collection in VIDEO_COLLECTIONS:
+            async for doc in self.db[collection].find({}, {"_id": 0, "url": 1}):
+                urls.append(doc.get("url"))
+        return urls
+
+    async def display_videos(self) -> tuple:
+        return tuple(await asyncio.gather(
+            self.db.tvc_videos.find({"is_active": True}, {"_id": 0}).sort("order", 1).to_list(100),
+            self.db.berbuka_videos.find_one({"is_active": True}, {"_id": 0}),
+            self.db.countdown_videos.find_one({"is_active": True}, {"_id": 0}),
+        ))
+
+    # ---- Maghrib schedules ----
+
+    async def insert_schedule(self, doc: dict):
+        try:
+            await self.db.maghrib_schedules.insert_one(dict(doc))
+        except DuplicateKeyError:
+            # Unique index on (location, date) makes this check race-free
+            raise DuplicateError((doc.get("location"), doc.get("date")))
+
+    async def insert_schedules(self, docs: List[dict]) -> set:
+        try:
+            await self.db.maghrib_schedules.insert_many([dict(doc) for doc in docs], ordered=False)
+        except BulkWriteError as e:
+            return {error["index"] for error in e.details.get("writeErrors", [])}
+        return set()
+
+    async def update_schedule(self, schedule_id: str, fields: dict) -> Optional[dict]:
+        try:
+            return await self.db.maghrib_schedules.find_one_and_update(
+                {"id": schedule_id}, {"$set": fields}, {"_id": 0}, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            raise DuplicateError((fields.get("location"), fields.get("date")))
+
+    async def delete_schedule(self, schedule_id: str) -> bool:
+        result = await self.db.maghrib_schedules.delete_one({"id": schedule_id})
+        return result.deleted_count > 0
+
+    async def find_schedules(self, locations: List[str], dates: List[str]) -> List[dict]:
+        return await self.db.maghrib_schedules.find(
+            {"date": {"$in": list(dates)}, "location": {"$in": list(locations)}},
+            {"_id": 0}
+        ).to_list(None)
+
+    async def schedules_between(self, first_date: str, last_date: str) -> List[dict]:
+        return await self.db.maghrib_schedules.find(
+            {"date": {"$gte": first_date, "$lte": last_date}},
+            {"_id": 0}
+        ).to_list(None)
+
+    async def upsert_schedules(self, docs: List[dict], overwrite: bool = True) -> tuple:
+        operations = []
+        for doc in docs:
+            fields = {field: doc[field] for field in SCHEDULE_FIELDS}
+            on_insert = {"id": doc["id"], "created_at": doc["created_at"]}
+            update = {"$set": fields, "$setOnInsert": on_insert} if overwrite else {"$setOnInsert": {**fields, **on_insert}}
+            operations.append(UpdateOne({"location": doc["location"], "date": doc["date"]}, update, upsert=True))
+        if not operations:
+            return 0, 0
+        result = await self.db.maghrib_schedules.bulk_write(operations, ordered=False)
+        return result.upserted_count, result.modified_count
+
+    # ---- Media library ----
+
+    async def find_media(self, filename: str) -> Optional[dict]:
+        return await self.db.media_files.find_one({"filename": filename}, {"_id": 0})
+
+    async def find_media_by_sha256(self, sha256: str) -> Optional[dict]:
+        return await self.db.media_files.find_one({"sha256": sha256}, {"_id": 0})
+
+    async def insert_media(self, doc: dict):
+        try:
+            await self.db.media_files.insert_one(dict(doc))
+        except DuplicateKeyError:
+            raise DuplicateError(doc.get("sha256"))
+
+    async def delete_media(self, filename: str):
+        await self.db.media_files.delete_one({"filename": filename})
+
+    async def update_media_probe(self, filename: str, fields: dict) -> Optional[dict]:
+        return await self.db.media_files.find_one_and_update({"filename": filename}, {"$set": fields}, {"_id": 0})
+
+    async def change_media_refs(self, filename: str, delta: int):
+        query = {"filename": filename}
+        if delta < 0:
+            query["ref_count"] = {"$gte": -delta}
+        await self.db.media_files.update_one(query, {"$inc": {"ref_count": delta}})
+
+    async def set_media_refs(self, counts: Dict[str, int]):
+        await self.db.media_files.update_many({}, {"$set": {"ref_count": 0}})
+        if counts:
+            await self.db.media_files.bulk_write([
+                UpdateOne({"filename": filename}, {"$set": {"ref_count": count}})
+                for filename, count in counts.items()
+            ], ordered=False)
+
+    async def media_filenames(self, unprobed_only: bool = False) -> List[str]:
+        return await self.db.media_files.distinct("filename", {"probed_at": None} if unprobed_only else {})
+
+    async def media_usage(self) -> dict:
+        result = await self.db.media_files.aggregate([
+            {"$group": {
+                "_id": None,
+                "files": {"$sum": 1},
+                "bytes": {"$sum": "$size"},
+                "unreferenced_files": {"$sum": {"$cond": [{"$gt": ["$ref_count", 0]}, 0, 1]}},
+                "unreferenced_bytes": {"$sum": {"$cond": [{"$gt": ["$ref_count", 0]}, 0, "$size"]}},
+            }}
+        ]).to_list(1)
+        usage = result[0] if result else {"files": 0, "bytes": 0, "unreferenced_files": 0, "unreferenced_bytes": 0}
+        usage.pop("_id", None)
+        return usage
+
+    async def media_info(self, filenames: List[str]) -> List[dict]:
+        return await self.db.media_files.find(
+            {"filename": {"$in": list(filenames)}},
+            {"_id": 0, "filename": 1, "size": 1, "sha256": 1, "duration_seconds": 1}
+        ).to_list(None)
+
+    # ---- Resumable upload sessions ----
+
+    async def insert_upload_session(self, doc: dict):
+        await self.db.upload_sessions.insert_one(dict(doc))
+
+    async def find_upload_session(self, upload_id: str) -> Optional[dict]:
+        return await self.db.upload_sessions.find_one({"id": upload_id}, {"_id": 0})
+
+    async def delete_upload_session(self, upload_id: str) -> bool:
+        result = await self.db.upload_sessions.delete_one({"id": upload_id})
+        return result.deleted_count > 0
+
+    # ---- Screen heartbeats ----
+
+    async def insert_heartbeats(self, docs: List[dict]):
+        # Copies: insert_many adds _id to the documents it is given
+        await self.db.screen_heartbeats.insert_many([dict(doc) for doc in docs], ordered=False)
+
+    async def delete_heartbeats_before(self, received_at: str) -> int:
+        result = await self.db.screen_heartbeats.delete_many({"received_at": {"$lt": received_at}})
+        return result.deleted_count
+
+    # ---- Proof-of-play ----
+
+    async def record_plays(self, batch_id: str, events: List[dict], hourly: List[dict], daily: List[dict]):
+        # No transaction: each document records the batch ids applied to it, so a
+        # retry after a partial write only touches the documents it missed
+        buckets = {}
+        for event in events:
+            bucket = buckets.setdefault((event["screen_id"], event["hour"]), (event.get("location"), []))
+            bucket[1].append({"video_id": event["video_id"], "event": event["event"], "played_at": event["played_at"]})
+        await self._apply_play_batch("play_events", batch_id, [
+            (
+                {"screen_id": screen_id, "hour": hour},
+                {
+                    "$push": {"events": {"$each": bucket_events}},
+                    "$inc": {"count": len(bucket_events)},
+                    "$setOnInsert": {"location": location},
+                }
+            )
+            for (screen_id, hour), (location, bucket_events) in buckets.items()
+        ])
+        for period, rows in (("hour", hourly), ("date", daily)):
+            await self._apply_play_batch(PLAY_ROLLUP_COLLECTIONS[period], batch_id, [
+                (
+                    {period: row[period], "video_id": row["video_id"], "screen_id": row["screen_id"]},
+                    {"$inc": {count: row[count] for count in PLAY_COUNTS}}
+                )
+                for row in rows
+            ])
+
+    async def _apply_play_batch(self, collection: str, batch_id: str, updates: List[tuple]):
+        """
+        Upsert each (key, update) unless its document already lists `batch_id`
+        in `batches` (the last PLAY_BATCHES_KEPT ids applied to it). Where it
+        does, the filter matches nothing and the upsert's insert collides with
+        the unique key (11000). So does an insert racing another worker's
+        upsert of a new document; those are checked and applied once more.
+        """
+        for attempt in range(2):
+            if not updates:
+                return
+            try:
+                await self.db[collection].bulk_write([
+                    UpdateOne(
+                        {**key, "batches": {"$ne": batch_id}},
+                        {**update, "$push": {
+                            **update.get("$push", {}),
+                            "batches": {"$each": [batch_id], "$slice": -PLAY_BATCHES_KEPT}
+                        }},
+                        upsert=True
+                    )
+                    for key, update in updates
+                ], ordered=False)
+                return
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if attempt or e.details.get("writeConcernErrors") or any(error["code"] != 11000 for error in errors):
+                    raise
+                missed = []
+                for error in errors:
+                    key, update = updates[error["index"]]
+                    if not await self.db[collection].count_documents({**key, "batches": batch_id}, limit=1):
+                        missed.append((key, update))
+                updates = missed
+
+    async def prune_plays(self, events_before: str, batches_before: str) -> int:
+        for collection, field, before in (
+            ("play_events", "hour", batches_before),
+            ("play_rollups_hourly", "hour", batches_before),
+            ("play_rollups_daily", "date", batches_before[:10]),
+        ):
+            await self.db[collection].update_many(
+                {field: {"$lt": before}, "batches": {"$exists": True}}, {"$unset": {"batches": ""}}
+            )
+        result = await self.db.play_events.delete_many({"hour": {"$lt": events_before}})
+        return result.deleted_count
+
+    async def play_report(
+        self, period: str, first: str, last: str, per_screen: bool,
+        video_id: Optional[str] = None, screen_id: Optional[str] = None
+    ) -> List[dict]:
+        match = {period: {"$gte": first, "$lte": last}}
+        if video_id is not None:
+            match["video_id"] = video_id
+        if screen_id is not None:
+            match["screen_id"] = screen_id
+        group = {"period": f"${period}", "video_id": "$video_id"}
+        if per_screen:
+            group["screen_id"] = "$screen_id"
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": group, **{count: {"$sum": f"${count}"} for count in PLAY_COUNTS}}},
+            {"$sort": {f"_id.{key}": 1 for key in group}},
+        ]
+        rows = []
+        async for doc in self.db[PLAY_ROLLUP_COLLECTIONS[period]].aggregate(pipeline):
+            rows.append({**doc.pop("_id"), **doc})
+        return rows
+
+    # ---- Admin panel revisions ----
+
+    async def bump_revisions(self, sections: tuple):
+        await self.db.admin_revisions.update_one(
+            {"_id": ADMIN_REVISIONS_ID},
+            {"$inc": {section: 1 for section in sections}, "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}},
+            upsert=True
+        )
+
+    async def get_revisions(self) -> dict:
+        revisions = await self.db.admin_revisions.find_one({"_id": ADMIN_REVISIONS_ID})
+        if revisions is None:
+            # First read ever: create the epoch once, racing workers keep whichever landed
+            await self.db.admin_revisions.update_one(
+                {"_id": ADMIN_REVISIONS_ID},
+                {"$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}},
+                upsert=True
+            )
+            revisions = await self.db.admin_revisions.find_one({"_id": ADMIN_REVISIONS_ID})
+        revisions.pop("_id", None)
+        return revisions
@@ -0,0 +1,311 @@
+"""
+Storage interface used by server.py.
+
+Every query the API makes goes through a Repository, so the backing store can
+be chosen by configuration (STORAGE_BACKEND): MongoDB via Motor
+(mongo_repository.py) or an embedded SQLite file (sqlite_repository.py).
+Documents are plain dicts shaped like the pydantic models in server.py, and
+both implementations return the same shapes for the same data.
+
+Kept free of server imports and of any driver import, so picking one backend
+never loads the other's dependencies.
+"""
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional
+
+# Collections (SQLite: tables) holding the three kinds of videos
+VIDEO_COLLECTIONS = ("tvc_videos", "berbuka_videos", "countdown_videos")
+
+# Schedule fields written by import/generate, with their value for documents
+# written before the field existed
+SCHEDULE_FIELDS = {"subuh_time": None, "maghrib_time": None, "location": "Bekasi", "timezone": "WIB"}
+
+# Counters of a proof-of-play rollup row, one per playback event kind
+PLAY_COUNTS = ("starts", "completes", "skips")
+
+class DuplicateError(Exception):
+    """A unique key (username, schedule location+date, media hash/filename) already exists"""
+
+class ListQuery(NamedTuple):
+    """
+    A keyset-ordered listing: documents matching `equals` (field == value) and
+    `ranges` (field -> (low, high), inclusive, either end None), ordered by
+    `sort_fields`, which together must be unique. `fields` limits the returned
+    fields (None: all).
+    """
+    collection: str
+    sort_fields: tuple
+    equals: dict = {}
+    ranges: dict = {}
+    fields: Optional[frozenset] = None
+
+class Repository(ABC):
+    """
+    Storage operations the API needs; see MongoRepository and SQLiteRepository.
+    Every operation is abstract, so a backend missing one fails when it is
+    created at startup rather than on the request that needs it.
+    """
+
+    name = ""
+
+    # ---- Lifecycle ----
+
+    @abstractmethod
+    async def ensure_schema(self):
+        """Create missing tables/indexes and migrate outdated ones (run at startup)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def explain_hot_queries(self) -> List[dict]:
+        """Query plan of every hot query: collection, filter, sort, stages, collection_scan"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self):
+        raise NotImplementedError
+
+    # ---- Keyset listings ----
+
+    @abstractmethod
+    async def list_boundary(self, query: ListQuery, after: Optional[tuple], limit: int) -> tuple:
+        """(sort key of the limit-th document after `after` or None, whether more documents follow it)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_list(self, query: ListQuery, after: Optional[tuple] = None, upto: Optional[tuple] = None) -> AsyncIterator[dict]:
+        """Documents with a sort key in (after, upto], in order, without buffering the whole result"""
+        raise NotImplementedError
+
+    # ---- Admin users ----
+
+    @abstractmethod
+    async def find_user(self, username: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def find_user_by_id(self, user_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def count_users(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def insert_user(self, doc: dict):
+        """Raises DuplicateError if the username is taken"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_user(self, fields: dict, user_id: Optional[str] = None, username: Optional[str] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_user(self, user_id: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_users(self) -> List[dict]:
+        """Every user without password_hash/tokens_valid_after, oldest first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def user_token_states(self) -> List[dict]:
+        """username and tokens_valid_after (epoch ms, 0 if never revoked) of every user"""
+        raise NotImplementedError
+
+    # ---- Videos (collection: one of VIDEO_COLLECTIONS) ----
+
+    @abstractmethod
+    async def insert_video(self, collection: str, doc: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_video(self, collection: str, video_id: str, fields: dict) -> Optional[tuple]:
+        """(document before, document after) or None if there is no such video"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_video(self, collection: str, video_id: str) -> Optional[dict]:
+        """The deleted document, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def video_ids(self, collection: str) -> set:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def apply_video_updates(self, updates: Dict[str, Dict[str, dict]]) -> Dict[str, int]:
+        """
+        {collection: {video_id: fields}} applied atomically where the backend
+        can; returns the number of modified documents per collection
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def video_urls(self) -> List[str]:
+        """URL of every video in every video collection"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def display_videos(self) -> tuple:
+        """(active TVC videos by order, first active berbuka video or None, first active countdown video or None)"""
+        raise NotImplementedError
+
+    # ---- Maghrib schedules ----
+
+    @abstractmethod
+    async def insert_schedule(self, doc: dict):
+        """Raises DuplicateError if the location already has a schedule for that date"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def insert_schedules(self, docs: List[dict]) -> set:
+        """Insert what doesn't collide with an existing (location, date); returns the indexes that did"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_schedule(self, schedule_id: str, fields: dict) -> Optional[dict]:
+        """The updated document, or None if there is no such schedule; raises DuplicateError"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_schedule(self, schedule_id: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def find_schedules(self, locations: List[str], dates: List[str]) -> List[dict]:
+        """Schedules whose location is in `locations` and date in `dates`"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def schedules_between(self, first_date: str, last_date: str) -> List[dict]:
+        """Every location's schedules from first_date to last_date (YYYY-MM-DD, inclusive)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upsert_schedules(self, docs: List[dict], overwrite: bool = True) -> tuple:
+        """
+        Insert full schedule documents keyed by (location, date). Existing ones
+        get the SCHEDULE_FIELDS values when `overwrite` (id and created_at are
+        kept) and are left alone otherwise. Returns (inserted, modified).
+        """
+        raise NotImplementedError
+
+    # ---- Media library ----
+
+    @abstractmethod
+    async def find_media(self, filename: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def find_media_by_sha256(self, sha256: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def insert_media(self, doc: dict):
+        """Raises DuplicateError if the hash or filename is already stored"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_media(self, filename: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_media_probe(self, filename: str, fields: dict) -> Optional[dict]:
+        """Store probe results; returns the document as it was before, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def change_media_refs(self, filename: str, delta: int):
+        """Add delta to ref_count, never going below zero"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set_media_refs(self, counts: Dict[str, int]):
+        """Reset every ref_count to the given counts (files not listed: 0)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def media_filenames(self, unprobed_only: bool = False) -> List[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def media_usage(self) -> dict:
+        """files, bytes, unreferenced_files, unreferenced_bytes"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def media_info(self, filenames: List[str]) -> List[dict]:
+        """filename, size, sha256 and duration_seconds of the given files"""
+        raise NotImplementedError
+
+    # ---- Resumable upload sessions ----
+
+    @abstractmethod
+    async def insert_upload_session(self, doc: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def find_upload_session(self, upload_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_upload_session(self, upload_id: str) -> bool:
+        raise NotImplementedError
+
+    # ---- Screen heartbeats ----
+
+    @abstractmethod
+    async def insert_heartbeats(self, docs: List[dict]):
+        """Append a batch of heartbeat documents in one write"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_heartbeats_before(self, received_at: str) -> int:
+        """Remove heartbeats received before the given ISO time; returns how many"""
+        raise NotImplementedError
+
+    # ---- Proof-of-play ----
+
+    @abstractmethod
+    async def record_plays(self, batch_id: str, events: List[dict], hourly: List[dict], daily: List[dict]):
+        """
+        Append raw play events (bucketed per screen and hour) and add the
+        PLAY_COUNTS of each hourly (hour, video_id, screen_id) and daily (date,
+        video_id, screen_id) row to the stored rollups. Applied at most once
+        per `batch_id`: retrying the same batch after a failure, even one that
+        left part of it written, only writes what is missing.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def prune_plays(self, events_before: str, batches_before: str) -> int:
+        """
+        Remove raw play event buckets older than `events_before` and forget the
+        batch ids applied before `batches_before` (both YYYY-MM-DDTHH), which
+        can no longer be retried; returns how many buckets were removed
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def play_report(
+        self, period: str, first: str, last: str, per_screen: bool,
+        video_id: Optional[str] = None, screen_id: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Rollup totals ("hour" or "date" `period`, first..last inclusive) per
+        period and video, and per screen if `per_screen`, ordered by period,
+        video_id, screen_id: period, video_id, [screen_id,] and PLAY_COUNTS
+        """
+        raise NotImplementedError
+
+    # ---- Admin panel revisions ----
+
+    @abstractmethod
+    async def bump_revisions(self, sections: tuple):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_revisions(self) -> dict:
+        """{"epoch": random id of this store, section: revision, ...}"""
+        raise NotImplementedError
@@ -1,43 +1,234 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Header, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.concurrency import run_in_threadpool
 import os
+import io
+import stat
+import mimetypes
+import csv
+import asyncio
 import logging
+from bisect import bisect_right
+from itertools import islice
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import Dict, List, Optional, NamedTuple
 import uuid
+import json
+import base64
+import hashlib
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from concurrent.futures import BrokenExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
+from email.utils import formatdate
+import math
+import time
 import pytz
 import jwt
 import bcrypt
-import shutil
+
+import media_probe
+import metrics
+from repository import PLAY_COUNTS, SCHEDULE_FIELDS, DuplicateError, ListQuery, Repository
+
+# Boot time is measured from here (after the library imports) until the worker serves
+BOOT_STARTED = time.perf_counter()
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Create uploads directory
+# Uploaded videos (directories are created at startup)
 UPLOAD_DIR = ROOT_DIR / "uploads" / "videos"
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# In-progress uploads (simple and resumable) are written here first
+UPLOAD_TMP_DIR = ROOT_DIR / "uploads" / "tmp"
+
+# Upload limits
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', '1024')) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = int(os.environ.get('UPLOAD_CHUNK_MB', '8')) * 1024 * 1024
+ALLOWED_VIDEO_TYPES = ["video/mp4", "video/webm", "video/ogg", "video/quicktime"]
+
+# Video delivery: uploaded files never change, so they can be cached forever.
+# Set MEDIA_ACCEL_REDIRECT_PREFIX (e.g. /protected-videos/) to let nginx send the bytes.
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX', '')
+
+# Processes used to probe video metadata (default: one per CPU core)
+MEDIA_PROBE_WORKERS = int(os.environ.get('MEDIA_PROBE_WORKERS', '0')) or os.cpu_count() or 1
+
+# Optional bearer token required to read /metrics
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# ============ METRICS ============
+
+registry = metrics.Registry()
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template, method and status", ("route", "method", "status"))
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency (streams: connection lifetime)", ("route", "method"))
+http_in_flight = registry.gauge("http_requests_in_flight", "Requests currently being handled by this worker")
+event_loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "Delay of a 1s timer on the event loop; high values mean the worker is saturated")
+mongo_command_duration = registry.histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by collection and command", ("collection", "command"))
+mongo_command_failures = registry.counter(
+    "mongo_command_failures_total", "Failed MongoDB commands by collection and command", ("collection", "command"))
+upload_bytes = registry.counter("upload_bytes_total", "Bytes received by video uploads", ("kind",))
+upload_duration = registry.histogram(
+    "upload_duration_seconds", "Time to receive an upload (resumable: per chunk)", ("kind",),
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+display_payload_cache = registry.counter(
+    "display_payload_cache_total", "Display payload template lookups", ("result",))
+auth_token_cache = registry.counter("auth_token_cache_total", "Decoded-token cache lookups", ("result",))
+display_timeline_rebuild = registry.histogram("display_timeline_rebuild_seconds", "Display timeline rebuild time")
+display_timeline_failures = registry.counter(
+    "display_timeline_refresh_failures_total", "Display timeline refreshes that failed or timed out on the database")
+display_timeline_stale = registry.gauge(
+    "display_timeline_stale", "1 while the display timeline is served from data the database hasn't confirmed")
+display_subscribers = registry.gauge(
+    "display_subscribers", "Open display-stream connections and waiting long-polls")
+screen_heartbeats = registry.counter("screen_heartbeats_total", "Screen heartbeats received")
+screen_heartbeats_dropped = registry.counter(
+    "screen_heartbeats_dropped_total", "Buffered heartbeats dropped unwritten because storage stayed unreachable")
+screen_heartbeats_pending = registry.gauge("screen_heartbeats_pending", "Heartbeats buffered for the next batch write")
+screen_heartbeat_flush = registry.histogram("screen_heartbeat_flush_seconds", "Time to write one heartbeat batch")
+play_events = registry.counter("play_events_total", "Proof-of-play events accepted", ("event",))
+play_events_rejected = registry.counter(
+    "play_events_rejected_total", "Play events dropped for a timestamp too old or in the future")
+play_events_dropped = registry.counter(
+    "play_events_dropped_total", "Raw play events dropped unwritten because storage stayed unreachable (rollups kept)")
+play_events_pending = registry.gauge("play_events_pending", "Play events buffered for the next batch write")
+play_log_flush = registry.histogram("play_log_flush_seconds", "Time to write one batch of play events and rollups")
+startup_duration = registry.gauge(
+    "startup_duration_seconds", "Worker boot time: module import, storage, snapshot and total until serving", ("phase",))
+
+# ============ STORAGE ============
+
+# "mongo" (MONGO_URL/DB_NAME) or "sqlite": an embedded file for single-box deployments
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo').lower()
+SQLITE_PATH = os.environ.get('SQLITE_PATH', str(ROOT_DIR / 'data' / 'countdown.db'))
+SQLITE_READERS = int(os.environ.get('SQLITE_READERS', '4'))
+
+def create_repository() -> Repository:
+    """Only the chosen backend's driver is imported (Motor alone takes ~150 ms, so this runs in the threadpool)"""
+    if STORAGE_BACKEND == "sqlite":
+        from sqlite_repository import SQLiteRepository
+        return SQLiteRepository(SQLITE_PATH, readers=SQLITE_READERS)
+    if STORAGE_BACKEND != "mongo":
+        raise RuntimeError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r} (use mongo or sqlite)")
+    from mongo_repository import MongoCommandMetrics, MongoRepository
+    return MongoRepository.connect(
+        os.environ['MONGO_URL'],
+        os.environ['DB_NAME'],
+        event_listeners=[MongoCommandMetrics(mongo_command_duration, mongo_command_failures)]
+    )
+
+# Created by the lifespan hook, so importing the app opens no connection (tests may set it first)
+repo: Optional[Repository] = None
 
 # JWT Settings
 JWT_SECRET = os.environ.get('JWT_SECRET', 'frestea-ramadan-secret-key-2026')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+# bcrypt runs in its own small thread pool; requests beyond the pending cap get 503
+AUTH_HASH_WORKERS = int(os.environ.get('AUTH_HASH_WORKERS', '2'))
+AUTH_HASH_MAX_PENDING = int(os.environ.get('AUTH_HASH_MAX_PENDING', '16'))
+
+# Login throttling per username
+LOGIN_MAX_FAILURES = int(os.environ.get('LOGIN_MAX_FAILURES', '5'))
+LOGIN_LOCKOUT_SECONDS = int(os.environ.get('LOGIN_LOCKOUT_SECONDS', '300'))
+
+# Decoded-token cache and how often other workers' revocations are picked up
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', '256'))
+AUTH_USERS_REFRESH_SECONDS = int(os.environ.get('AUTH_USERS_REFRESH_SECONDS', '30'))
+
 # Security
 security = HTTPBearer()
 
+# ============ STARTUP / SHUTDOWN ============
+# Startup helpers run only once the app starts, after the whole module (and
+# everything they reference below) is defined
+
+def create_upload_dirs():
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+
+async def timed(phase: str, awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        startup_duration.set(phase, value=time.perf_counter() - started)
+
+async def warm_up_storage():
+    """Index reconciliation and a fresh timeline from the database, while the worker already serves"""
+    try:
+        await repo.ensure_schema()
+    except Exception:
+        logger.exception("Index reconciliation failed")
+    await display_timeline.rebuild()
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Nothing here waits for the database: the driver is imported off the event
+    loop, the display timeline comes from the snapshot file, and index
+    reconciliation plus the first rebuild run in the background. Without a
+    snapshot, the first display request waits for the rebuild instead.
+    """
+    startup_duration.set("module", value=time.perf_counter() - BOOT_STARTED)
+
+    async def open_storage():
+        global repo
+        if repo is None:
+            repo = await run_in_threadpool(create_repository)
+
+    _, _, from_snapshot = await asyncio.gather(
+        timed("storage", open_storage()),
+        run_in_threadpool(create_upload_dirs),
+        timed("snapshot", display_timeline.load_snapshot()),
+    )
+    tasks = [
+        asyncio.create_task(warm_up_storage()),
+        asyncio.create_task(display_hub.run()),
+        asyncio.create_task(display_timeline.watch_revisions()),
+        asyncio.create_task(monitor_event_loop_lag()),
+        asyncio.create_task(screen_fleet.run()),
+        asyncio.create_task(play_log.run()),
+    ]
+    boot_seconds = time.perf_counter() - BOOT_STARTED
+    startup_duration.set("total", value=boot_seconds)
+    logger.info(
+        f"Worker ready in {boot_seconds * 1000:.0f} ms ({repo.name} storage, display timeline "
+        f"{'from snapshot' if from_snapshot else 'pending first rebuild'})"
+    )
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+    if display_timeline.revalidate_task:
+        display_timeline.revalidate_task.cancel()
+    try:
+        await asyncio.wait_for(screen_fleet.flush(), SCREEN_HEARTBEAT_FLUSH_SECONDS)
+    except Exception as e:
+        logger.warning(f"Screen heartbeats lost at shutdown: {e}")
+    try:
+        await asyncio.wait_for(play_log.flush(), PLAY_LOG_FLUSH_SECONDS)
+    except Exception as e:
+        logger.warning(f"Play events lost at shutdown: {e}")
+    if probe_executor:
+        probe_executor.shutdown(wait=False, cancel_futures=True)
+    auth_executor.shutdown(wait=False, cancel_futures=True)
+    repo.close()
+
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -45,6 +236,71 @@ api_router = APIRouter(prefix="/api")
 # Indonesia timezone
 JAKARTA_TZ = pytz.timezone('Asia/Jakarta')
 
+# Time zones a schedule (and so a location) can use
+INDONESIA_TIMEZONES = {
+    "WIB": JAKARTA_TZ,
+    "WITA": pytz.timezone('Asia/Makassar'),
+    "WIT": pytz.timezone('Asia/Jayapura'),
+}
+
+# Location shown by screens that don't send ?location= (default: the only location, else Bekasi)
+DISPLAY_DEFAULT_LOCATION = os.environ.get('DISPLAY_DEFAULT_LOCATION')
+
+# Number of days ahead compiled into the in-memory display timeline
+TIMELINE_DAYS_AHEAD = int(os.environ.get('TIMELINE_DAYS_AHEAD', '7'))
+
+# Local copy of the display timeline data, read at boot before the database (empty: disabled)
+DISPLAY_SNAPSHOT_PATH = os.environ.get('DISPLAY_SNAPSHOT_PATH', str(ROOT_DIR / 'data' / 'display-snapshot.json'))
+DISPLAY_SNAPSHOT_FORMAT = 1
+
+# Display reads never wait longer than this on the database; past it the last good timeline is served, marked stale
+DISPLAY_DB_TIMEOUT_SECONDS = float(os.environ.get('DISPLAY_DB_TIMEOUT_SECONDS', '2'))
+# Background revalidation after a failed refresh: first retry, doubling up to the maximum
+DISPLAY_REVALIDATE_MIN_SECONDS = int(os.environ.get('DISPLAY_REVALIDATE_MIN_SECONDS', '1'))
+DISPLAY_REVALIDATE_MAX_SECONDS = int(os.environ.get('DISPLAY_REVALIDATE_MAX_SECONDS', '60'))
+
+# How often each worker checks the shared revision marker for edits made by other workers
+DISPLAY_REVISION_CHECK_SECONDS = float(os.environ.get('DISPLAY_REVISION_CHECK_SECONDS', '5'))
+
+# Rows written per bulk_write during schedule import
+SCHEDULE_IMPORT_BATCH_SIZE = int(os.environ.get('SCHEDULE_IMPORT_BATCH_SIZE', '1000'))
+
+# Longest date range the schedule generator accepts in one request
+SCHEDULE_GENERATE_MAX_DAYS = int(os.environ.get('SCHEDULE_GENERATE_MAX_DAYS', '732'))
+
+# Largest page the list endpoints return when ?limit= is given (no limit: everything, streamed)
+LIST_PAGE_MAX = int(os.environ.get('LIST_PAGE_MAX', '1000'))
+
+# Display stream (SSE) settings
+DISPLAY_STREAM_QUEUE_SIZE = int(os.environ.get('DISPLAY_STREAM_QUEUE_SIZE', '4'))
+DISPLAY_STREAM_HEARTBEAT_SECONDS = int(os.environ.get('DISPLAY_STREAM_HEARTBEAT_SECONDS', '15'))
+
+# Display manifest (prefetch) settings
+DISPLAY_MANIFEST_MAX_HOURS = int(os.environ.get('DISPLAY_MANIFEST_MAX_HOURS', '72'))
+DISPLAY_MANIFEST_HISTORY = 32
+
+# Upper bound for /display-state?wait= long-polling
+DISPLAY_LONG_POLL_MAX_SECONDS = int(os.environ.get('DISPLAY_LONG_POLL_MAX_SECONDS', '60'))
+
+# Screen heartbeats: buffered in memory and written in batches every few seconds
+SCREEN_HEARTBEAT_FLUSH_SECONDS = float(os.environ.get('SCREEN_HEARTBEAT_FLUSH_SECONDS', '5'))
+SCREEN_HEARTBEAT_BATCH_SIZE = int(os.environ.get('SCREEN_HEARTBEAT_BATCH_SIZE', '5000'))
+# Heartbeats kept in memory while storage is unreachable; the oldest are dropped beyond this
+SCREEN_HEARTBEAT_BUFFER_MAX = int(os.environ.get('SCREEN_HEARTBEAT_BUFFER_MAX', '100000'))
+SCREEN_HEARTBEAT_RETENTION_DAYS = int(os.environ.get('SCREEN_HEARTBEAT_RETENTION_DAYS', '7'))
+# A screen is offline after this long without a heartbeat, and forgotten after SCREEN_FORGET_HOURS
+SCREEN_OFFLINE_SECONDS = int(os.environ.get('SCREEN_OFFLINE_SECONDS', '90'))
+SCREEN_FORGET_HOURS = int(os.environ.get('SCREEN_FORGET_HOURS', '24'))
+SCREEN_FLEET_MAX = int(os.environ.get('SCREEN_FLEET_MAX', '20000'))
+
+# Proof-of-play: raw events and rollup increments, written together in batches
+PLAY_LOG_FLUSH_SECONDS = float(os.environ.get('PLAY_LOG_FLUSH_SECONDS', '5'))
+PLAY_EVENT_BUFFER_MAX = int(os.environ.get('PLAY_EVENT_BUFFER_MAX', '100000'))
+PLAY_EVENT_RETENTION_DAYS = int(os.environ.get('PLAY_EVENT_RETENTION_DAYS', '90'))
+# Oldest play event accepted (screens resend what they buffered while offline)
+PLAY_EVENT_MAX_AGE_HOURS = int(os.environ.get('PLAY_EVENT_MAX_AGE_HOURS', '48'))
+PLAY_REPORT_MAX_DAYS = int(os.environ.get('PLAY_REPORT_MAX_DAYS', '366'))
+
 # ============ MODELS ============
 
 class AdminUser(BaseModel):
@@ -146,6 +402,7 @@ class MaghribSchedule(BaseModel):
     subuh_time: Optional[str] = "04:30"  # Format: HH:MM - waktu mulai countdown
     maghrib_time: str  # Format: HH:MM - waktu berbuka
     location: str = "Bekasi"
+    timezone: str = "WIB"  # WIB, WITA atau WIT
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class MaghribScheduleCreate(BaseModel):
@@ -153,12 +410,86 @@ class MaghribScheduleCreate(BaseModel):
     subuh_time: Optional[str] = "04:30"
     maghrib_time: str
     location: str = "Bekasi"
+    timezone: str = "WIB"
 
 class MaghribScheduleUpdate(BaseModel):
     date: Optional[str] = None
     subuh_time: Optional[str] = None
     maghrib_time: Optional[str] = None
     location: Optional[str] = None
+    timezone: Optional[str] = None
+
+class MediaFile(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    filename: str  # Path relative to UPLOAD_DIR, e.g. ab/cd/<sha256>.mp4
+    sha256: str
+    size: int
+    content_type: str
+    original_name: Optional[str] = None
+    ref_count: int = 0  # Number of TVC/berbuka/countdown videos using this file
+    # Filled in by the background probe
+    duration_seconds: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    bitrate: Optional[int] = None
+    faststart: Optional[bool] = None
+    probed_at: Optional[str] = None
+    probe_error: Optional[str] = None
+    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    content_type: str
+    size: int
+    sha256: Optional[str] = None
+
+class UploadSession(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    filename: str
+    content_type: str
+    size: int
+    sha256: Optional[str] = None
+    offset: int = 0
+    chunk_size: int = UPLOAD_CHUNK_BYTES
+    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+class ScheduleImportRow(BaseModel):
+    row: int
+    date: Optional[str] = None
+    location: Optional[str] = None
+    status: str  # "inserted", "updated", "unchanged", "invalid"
+    error: Optional[str] = None
+
+class ScheduleImportReport(BaseModel):
+    total: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+    rows: List[ScheduleImportRow] = []
+
+class PrayerLocation(BaseModel):
+    location: str
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    elevation: float = 0  # Meters above sea level
+    timezone: str = "WIB"
+
+class ScheduleGenerateRequest(BaseModel):
+    locations: List[PrayerLocation]
+    start_date: str  # YYYY-MM-DD
+    end_date: str  # YYYY-MM-DD, inclusive
+    overwrite: bool = True  # False: only fill in dates that have no schedule yet
+
+class ScheduleGenerateReport(BaseModel):
+    locations: int
+    days: int
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped: List[str] = []  # "location date" pairs without a defined Subuh/Maghrib
 
 class LocationSettings(BaseModel):
     location: str = "Bekasi"
@@ -169,10 +500,100 @@ class DisplayState(BaseModel):
     subuh_time: Optional[str] = None
     maghrib_time: Optional[str] = None
     location: Optional[str] = None
+    timezone: Optional[str] = None
     current_tvc_videos: List[TVCVideo] = []
     berbuka_video: Optional[BerbukaVideo] = None
     berbuka_end_time: Optional[str] = None
     countdown_video: Optional[CountdownVideo] = None
+    # Today's transitions as absolute instants (ISO 8601 with offset), for countdowns on a synced clock
+    maghrib_at: Optional[str] = None
+    berbuka_end_at: Optional[str] = None
+
+class ScreenHeartbeat(BaseModel):
+    screen_id: str = Field(min_length=1, max_length=64)
+    location: Optional[str] = Field(None, max_length=64)
+    state: str = Field(max_length=16)  # "countdown", "berbuka", "tvc"
+    video_url: Optional[str] = Field(None, max_length=512)
+    buffered_seconds: Optional[float] = None  # Media buffered ahead of the playhead
+    stalls: int = Field(0, ge=0)  # Playback stalls since the previous heartbeat
+    client_time: Optional[int] = None  # Screen clock when sent, epoch milliseconds
+
+class ScreenStatus(BaseModel):
+    screen_id: str
+    online: bool
+    location: Optional[str] = None
+    state: str
+    video_url: Optional[str] = None
+    buffered_seconds: Optional[float] = None
+    stalls: int = 0
+    clock_drift_ms: Optional[int] = None  # Screen clock minus server clock (includes network delay)
+    first_seen: str
+    last_seen: str
+    heartbeats: int
+
+class FleetStatus(BaseModel):
+    online: int
+    offline: int
+    pending_writes: int
+    screens: List[ScreenStatus] = []
+
+class PlayEvent(BaseModel):
+    video_id: str = Field(min_length=1, max_length=64)
+    event: str = Field(pattern="^(start|complete|skipped)$")
+    played_at: Optional[int] = None  # Screen clock, epoch milliseconds (default: when received)
+
+class PlayEventBatch(BaseModel):
+    screen_id: str = Field(min_length=1, max_length=64)
+    location: Optional[str] = Field(None, max_length=64)
+    events: List[PlayEvent] = Field(max_length=500)
+
+class PlayReportRow(BaseModel):
+    period: str  # YYYY-MM-DD or YYYY-MM-DDTHH, local time of the screen's location
+    video_id: str
+    screen_id: Optional[str] = None  # Missing: summed over every screen
+    starts: int = 0
+    completes: int = 0
+    skips: int = 0
+
+class PlayReport(BaseModel):
+    granularity: str
+    start: str
+    end: str
+    rows: List[PlayReportRow] = []
+
+class VideoBatchUpdate(BaseModel):
+    order: Optional[List[str]] = None  # TVC only: every video id, in the new playlist order
+    active: Dict[str, bool] = {}  # video id -> is_active
+
+class VideoBatchRequest(BaseModel):
+    tvc_videos: Optional[VideoBatchUpdate] = None
+    berbuka_videos: Optional[VideoBatchUpdate] = None
+    countdown_videos: Optional[VideoBatchUpdate] = None
+
+class AdminBootstrap(BaseModel):
+    version: str
+    full: bool = True  # False: sections missing from the payload are unchanged since ?since=
+    display_state: DisplayState
+    tvc_videos: Optional[List[TVCVideo]] = None
+    berbuka_videos: Optional[List[BerbukaVideo]] = None
+    countdown_videos: Optional[List[CountdownVideo]] = None
+    schedules: Optional[List[MaghribSchedule]] = None
+    users: Optional[List[UserResponse]] = None
+
+class ManifestItem(BaseModel):
+    url: str
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+    first_needed_at: str
+    states: List[str]
+
+class DisplayManifest(BaseModel):
+    version: str
+    full: bool = True  # False when only the changes since a previous version are listed
+    window_start: str
+    window_end: str
+    items: List[ManifestItem] = []
+    removed: List[str] = []
 
 # ============ AUTH HELPERS ============
 
@@ -182,36 +603,150 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, password_hash: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
 
-def create_token(username: str) -> str:
+auth_executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="bcrypt")
+auth_hash_slots = asyncio.Semaphore(AUTH_HASH_MAX_PENDING)
+
+async def run_password_hash(func, *args):
+    """Run hash_password/verify_password in the bcrypt pool without blocking the event loop"""
+    if auth_hash_slots.locked():
+        raise HTTPException(status_code=503, detail="Server sibuk, coba lagi sebentar", headers={"Retry-After": "1"})
+    async with auth_hash_slots:
+        return await asyncio.get_running_loop().run_in_executor(auth_executor, func, *args)
+
+# username -> [failure count, time of first failure]
+login_failures = {}
+
+def check_login_throttle(username: str):
+    entry = login_failures.get(username)
+    if not entry or entry[0] < LOGIN_MAX_FAILURES:
+        return
+    retry_after = int(entry[1] + LOGIN_LOCKOUT_SECONDS - time.monotonic())
+    if retry_after <= 0:
+        login_failures.pop(username, None)
+        return
+    raise HTTPException(
+        status_code=429,
+        detail="Terlalu banyak percobaan login, coba lagi nanti",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+def record_login_failure(username: str):
+    now = time.monotonic()
+    entry = login_failures.get(username)
+    if not entry or now - entry[1] > LOGIN_LOCKOUT_SECONDS:
+        if len(login_failures) >= 10000:
+            # Drop stale entries so random usernames can't grow the table forever
+            for name in [n for n, e in login_failures.items() if now - e[1] > LOGIN_LOCKOUT_SECONDS]:
+                del login_failures[name]
+        login_failures[username] = [1, now]
+    else:
+        entry[0] += 1
+
+def create_token(username: str, iat_ms: Optional[int] = None) -> str:
+    """`iat_ms` overrides the issue time, e.g. to place a token just after a revocation"""
+    now = datetime.now(timezone.utc)
     payload = {
         "username": username,
-        "exp": datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
+        "iat": int(now.timestamp()),
+        # Revocation is compared in milliseconds, so a token from the same second as a revocation still loses
+        "iat_ms": int(now.timestamp() * 1000) if iat_ms is None else iat_ms,
+        "exp": now + timedelta(hours=JWT_EXPIRATION_HOURS)
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+class AuthUsers:
+    """
+    In-memory view of which usernames exist and since when their tokens are valid.
+    Tokens of deleted users, or issued at or before a password change, are rejected.
+    """
+
+    def __init__(self):
+        self.valid_after = {}  # username -> epoch milliseconds (0 = no revocation)
+        self.loaded_at = None
+
+    @staticmethod
+    def _milliseconds(valid_after: int) -> int:
+        # Revocations stored before millisecond precision are epoch seconds
+        return valid_after * 1000 if valid_after < 10 ** 11 else valid_after
+
+    async def refresh(self):
+        users = await repo.user_token_states()
+        self.valid_after = {u["username"]: self._milliseconds(u["tokens_valid_after"]) for u in users}
+        self.loaded_at = time.monotonic()
+
+    async def ensure_fresh(self):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > AUTH_USERS_REFRESH_SECONDS:
+            await self.refresh()
+
+    def accepts(self, username: str, issued_at_ms: Optional[int]) -> bool:
+        valid_after = self.valid_after.get(username)
+        if valid_after is None:
+            return False
+        if issued_at_ms is None:
+            # Tokens from before iat was added: valid until the user's first revocation
+            return valid_after == 0
+        return issued_at_ms > valid_after
+
+auth_users = AuthUsers()
+
+# token -> (username, issued at in epoch ms or None, exp) for recently verified tokens
+token_cache = OrderedDict()
+
+def decode_token(token: str) -> tuple:
+    cached = token_cache.get(token)
+    auth_token_cache.inc("miss" if cached is None else "hit")
+    if cached is not None:
+        token_cache.move_to_end(token)
+        if cached[2] <= time.time():
+            token_cache.pop(token, None)
+            raise HTTPException(status_code=401, detail="Token expired")
+        return cached
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload["username"]
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    # Tokens issued before iat_ms existed only carry whole seconds, the oldest no iat at all
+    issued_at_ms = payload.get("iat_ms")
+    if issued_at_ms is None and "iat" in payload:
+        issued_at_ms = payload["iat"] * 1000
+    decoded = (payload["username"], issued_at_ms, payload["exp"])
+    token_cache[token] = decoded
+    if len(token_cache) > AUTH_TOKEN_CACHE_SIZE:
+        token_cache.popitem(last=False)
+    return decoded
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    username, issued_at, _ = decode_token(credentials.credentials)
+    await auth_users.ensure_fresh()
+    if not auth_users.accepts(username, issued_at):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return username
+
+async def revoke_tokens(user_id: Optional[str] = None, username: Optional[str] = None) -> int:
+    """Invalidate every token issued so far for the user; returns the cutoff (epoch ms) tokens must be issued after"""
+    valid_after = int(time.time() * 1000)
+    await repo.update_user({"tokens_valid_after": valid_after}, user_id=user_id, username=username)
+    await auth_users.refresh()
+    return valid_after
 
 # ============ AUTH ENDPOINTS ============
 
 @api_router.post("/auth/login", response_model=LoginResponse)
 async def login(request: LoginRequest):
-    # Find user
-    user = await db.admin_users.find_one({"username": request.username}, {"_id": 0})
-    
+    # Locked-out usernames are refused before any database lookup
+    check_login_throttle(request.username)
+    user = await repo.find_user(request.username)
     if not user:
+        record_login_failure(request.username)
         raise HTTPException(status_code=401, detail="Username atau password salah")
     
-    if not verify_password(request.password, user["password_hash"]):
+    if not await run_password_hash(verify_password, request.password, user["password_hash"]):
+        record_login_failure(request.username)
         raise HTTPException(status_code=401, detail="Username atau password salah")
     
+    login_failures.pop(request.username, None)
     token = create_token(request.username)
     return LoginResponse(token=token, username=request.username)
 
@@ -222,15 +757,19 @@ async def verify_auth(username: str = Depends(verify_token)):
 @api_router.post("/auth/setup")
 async def setup_admin(request: LoginRequest):
     """Setup initial admin user - only works if no admin exists"""
-    existing = await db.admin_users.find_one({})
-    if existing:
+    if await repo.count_users():
         raise HTTPException(status_code=400, detail="Admin sudah ada. Gunakan login.")
     
     admin = AdminUser(
         username=request.username,
-        password_hash=hash_password(request.password)
+        password_hash=await run_password_hash(hash_password, request.password)
     )
-    await db.admin_users.insert_one(admin.model_dump())
+    try:
+        await repo.insert_user(admin.model_dump())
+    except DuplicateError:
+        raise HTTPException(status_code=400, detail="Admin sudah ada. Gunakan login.")
+    await auth_users.refresh()
+    await bump_admin_revision("users")
     
     token = create_token(request.username)
     return LoginResponse(token=token, username=request.username)
@@ -238,40 +777,38 @@ async def setup_admin(request: LoginRequest):
 @api_router.get("/auth/check-setup")
 async def check_setup():
     """Check if admin user has been setup"""
-    existing = await db.admin_users.find_one({})
-    return {"needs_setup": existing is None}
+    return {"needs_setup": await repo.count_users() == 0}
 
 @api_router.post("/auth/change-password")
 async def change_password(request: ChangePasswordRequest, username: str = Depends(verify_token)):
     """Change password for current user"""
-    user = await db.admin_users.find_one({"username": username}, {"_id": 0})
+    user = await repo.find_user(username)
     if not user:
         raise HTTPException(status_code=404, detail="User tidak ditemukan")
     
-    if not verify_password(request.current_password, user["password_hash"]):
+    if not await run_password_hash(verify_password, request.current_password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Password lama salah")
     
     if len(request.new_password) < 6:
         raise HTTPException(status_code=400, detail="Password minimal 6 karakter")
     
-    new_hash = hash_password(request.new_password)
-    await db.admin_users.update_one(
-        {"username": username},
-        {"$set": {"password_hash": new_hash}}
-    )
+    new_hash = await run_password_hash(hash_password, request.new_password)
+    await repo.update_user({"password_hash": new_hash}, username=username)
+    valid_after = await revoke_tokens(username=username)
     
-    return {"message": "Password berhasil diubah"}
+    # Other sessions are logged out; this one continues with a fresh token, which
+    # would often share the revocation's millisecond (and fail the strict check)
+    return {"message": "Password berhasil diubah", "token": create_token(username, iat_ms=valid_after + 1)}
 
 @api_router.get("/auth/users", response_model=List[UserResponse])
 async def get_users(username: str = Depends(verify_token)):
     """Get all admin users"""
-    users = await db.admin_users.find({}, {"_id": 0, "password_hash": 0}).to_list(100)
-    return users
+    return await repo.list_users()
 
 @api_router.post("/auth/users", response_model=UserResponse)
 async def create_user(request: CreateUserRequest, username: str = Depends(verify_token)):
     """Create a new admin user"""
-    existing = await db.admin_users.find_one({"username": request.username})
+    existing = await repo.find_user(request.username)
     if existing:
         raise HTTPException(status_code=400, detail="Username sudah digunakan")
     
@@ -280,9 +817,14 @@ async def create_user(request: CreateUserRequest, username: str = Depends(verify
     
     admin = AdminUser(
         username=request.username,
-        password_hash=hash_password(request.password)
+        password_hash=await run_password_hash(hash_password, request.password)
     )
-    await db.admin_users.insert_one(admin.model_dump())
+    try:
+        await repo.insert_user(admin.model_dump())
+    except DuplicateError:
+        raise HTTPException(status_code=400, detail="Username sudah digunakan")
+    await auth_users.refresh()
+    await bump_admin_revision("users")
     
     return UserResponse(
         id=admin.id,
@@ -294,7 +836,7 @@ async def create_user(request: CreateUserRequest, username: str = Depends(verify
 async def delete_user(user_id: str, username: str = Depends(verify_token)):
     """Delete an admin user"""
     # Prevent deleting self
-    user_to_delete = await db.admin_users.find_one({"id": user_id}, {"_id": 0})
+    user_to_delete = await repo.find_user_by_id(user_id)
     if not user_to_delete:
         raise HTTPException(status_code=404, detail="User tidak ditemukan")
     
@@ -302,78 +844,692 @@ async def delete_user(user_id: str, username: str = Depends(verify_token)):
         raise HTTPException(status_code=400, detail="Tidak bisa menghapus akun sendiri")
     
     # Check if this is the last user
-    count = await db.admin_users.count_documents({})
+    count = await repo.count_users()
     if count <= 1:
         raise HTTPException(status_code=400, detail="Minimal harus ada 1 admin")
     
-    await db.admin_users.delete_one({"id": user_id})
+    await repo.delete_user(user_id)
+    await auth_users.refresh()
+    await bump_admin_revision("users")
     return {"message": "User berhasil dihapus"}
 
 @api_router.put("/auth/users/{user_id}/reset-password")
 async def reset_user_password(user_id: str, request: LoginRequest, username: str = Depends(verify_token)):
     """Reset password for another user"""
-    user = await db.admin_users.find_one({"id": user_id}, {"_id": 0})
+    user = await repo.find_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User tidak ditemukan")
     
     if len(request.password) < 6:
         raise HTTPException(status_code=400, detail="Password minimal 6 karakter")
     
-    new_hash = hash_password(request.password)
-    await db.admin_users.update_one(
-        {"id": user_id},
-        {"$set": {"password_hash": new_hash}}
-    )
+    new_hash = await run_password_hash(hash_password, request.password)
+    await repo.update_user({"password_hash": new_hash}, user_id=user_id)
+    await revoke_tokens(user_id=user_id)
     
     return {"message": "Password berhasil direset"}
 
 # ============ FILE UPLOAD ENDPOINTS ============
 
+def _video_ext(filename: str) -> str:
+    return filename.split(".")[-1] if filename and "." in filename else "mp4"
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _remove_file(path: Path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _media_path(sha256: str, file_ext: str) -> str:
+    """Content-addressed location, sharded two levels deep so directories stay small"""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{file_ext.lower()}"
+
+def _media_path_sha256(relative_path: str) -> Optional[str]:
+    """The sha256 a content-addressed path is named after; None for files stored before content addressing"""
+    sha256, _, file_ext = relative_path.rpartition("/")[2].partition(".")
+    if len(sha256) == 64 and all(c in "0123456789abcdef" for c in sha256) and relative_path == _media_path(sha256, file_ext):
+        return sha256
+    return None
+
+def _place_media_file(tmp_path: Path, relative_path: str) -> bool:
+    """Move a completed upload into place; returns False if the content was already stored"""
+    target = UPLOAD_DIR / relative_path
+    if target.exists():
+        _remove_file(tmp_path)
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, target)
+    return True
+
+async def store_upload(tmp_path: Path, original_name: str, content_type: str, sha256: str, size: int) -> dict:
+    """Store a completed upload by content hash and record it in media_files"""
+    existing = await repo.find_media_by_sha256(sha256)
+    relative_path = existing["filename"] if existing else _media_path(sha256, _video_ext(original_name))
+    placed = await run_in_threadpool(_place_media_file, tmp_path, relative_path)
+
+    if not existing:
+        media = MediaFile(
+            filename=relative_path,
+            sha256=sha256,
+            size=size,
+            content_type=content_type,
+            original_name=original_name
+        )
+        try:
+            await repo.insert_media(media.model_dump())
+        except DuplicateError:
+            # Same content uploaded concurrently
+            pass
+
+    if not existing or not existing.get("probed_at"):
+        # Duration/resolution are read in the process pool, off the request path
+        run_in_background(probe_media_file(relative_path))
+
+    return {
+        "url": f"/api/videos/{relative_path}",
+        "filename": relative_path,
+        "size": size,
+        "sha256": sha256,
+        "deduplicated": existing is not None or not placed
+    }
+
 @api_router.post("/upload/video")
-async def upload_video(file: UploadFile = File(...), username: str = Depends(verify_token)):
-    """Upload video file"""
+async def upload_video(
+    file: UploadFile = File(...),
+    sha256: Optional[str] = Form(None),
+    username: str = Depends(verify_token)
+):
+    """Upload video file (streamed in chunks off the event loop)"""
     # Validate file type
-    allowed_types = ["video/mp4", "video/webm", "video/ogg", "video/quicktime"]
-    if file.content_type not in allowed_types:
+    if file.content_type not in ALLOWED_VIDEO_TYPES:
         raise HTTPException(status_code=400, detail="Format video tidak didukung. Gunakan MP4, WebM, atau OGG")
     
-    # Generate unique filename
-    file_ext = file.filename.split(".")[-1] if "." in file.filename else "mp4"
-    unique_filename = f"{uuid.uuid4()}.{file_ext}"
-    file_path = UPLOAD_DIR / unique_filename
+    tmp_path = UPLOAD_TMP_DIR / f"{uuid.uuid4()}.part"
+    digest = hashlib.sha256()
+    size = 0
+    started = time.perf_counter()
     
     # Save file
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        buffer = await run_in_threadpool(open, tmp_path, "wb")
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Ukuran video maksimal {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+                digest.update(chunk)
+                await run_in_threadpool(buffer.write, chunk)
+        finally:
+            await run_in_threadpool(buffer.close)
+    except HTTPException:
+        await run_in_threadpool(_remove_file, tmp_path)
+        raise
     except Exception as e:
+        await run_in_threadpool(_remove_file, tmp_path)
         raise HTTPException(status_code=500, detail=f"Gagal menyimpan file: {str(e)}")
     
+    upload_bytes.inc("simple", amount=size)
+    upload_duration.observe("simple", value=time.perf_counter() - started)
+    
+    checksum = digest.hexdigest()
+    if sha256 and sha256.lower() != checksum:
+        await run_in_threadpool(_remove_file, tmp_path)
+        raise HTTPException(status_code=400, detail="Checksum video tidak cocok")
+    
     # Return URL
-    video_url = f"/api/videos/{unique_filename}"
-    return {"url": video_url, "filename": unique_filename}
+    return await store_upload(tmp_path, file.filename, file.content_type, checksum, size)
+
+# Multipart framing around the file in /upload/video: boundaries, part headers, the sha256 field
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+class UploadSizeLimitMiddleware:
+    """
+    MAX_UPLOAD_BYTES for POST /api/upload/video, enforced before the form is
+    parsed: Starlette spools the whole multipart body to disk before the
+    endpoint runs, so a check there only fails once the bandwidth and temp
+    space are spent. A declared Content-Length over the limit is refused
+    without reading the body; a body without one is cut off once it passes it.
+    """
+
+    def __init__(self, app, path: str = "/api/upload/video"):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        limit = MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES
+        detail = f"Ukuran video maksimal {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside form parsing, which FastAPI lets through to the 413 handler
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
 
-@api_router.delete("/upload/video/{filename}")
+# ============ RESUMABLE UPLOAD ENDPOINTS ============
+
+# Serialises chunk writes per session within this worker
+upload_session_locks = {}
+
+def _session_part_path(upload_id: str) -> Path:
+    return UPLOAD_TMP_DIR / f"{upload_id}.part"
+
+def _part_size(path: Path) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+async def _get_upload_session(upload_id: str) -> UploadSession:
+    doc = await repo.find_upload_session(upload_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Sesi upload tidak ditemukan")
+    session = UploadSession(**doc)
+    # The part file on disk is the source of truth for the offset
+    session.offset = await run_in_threadpool(_part_size, _session_part_path(upload_id))
+    return session
+
+@api_router.post("/upload/sessions", response_model=UploadSession)
+async def create_upload_session(request: UploadSessionCreate, username: str = Depends(verify_token)):
+    """Start a resumable upload: init -> PUT chunks with offset -> finalize"""
+    if request.content_type not in ALLOWED_VIDEO_TYPES:
+        raise HTTPException(status_code=400, detail="Format video tidak didukung. Gunakan MP4, WebM, atau OGG")
+    if request.size <= 0 or request.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Ukuran video maksimal {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    
+    session = UploadSession(**request.model_dump())
+    await run_in_threadpool(_session_part_path(session.id).touch)
+    await repo.insert_upload_session(session.model_dump(exclude={"offset", "chunk_size"}))
+    return session
+
+@api_router.get("/upload/sessions/{upload_id}", response_model=UploadSession)
+async def get_upload_session(upload_id: str, username: str = Depends(verify_token)):
+    """Current offset, used by the client to resume after a failure"""
+    return await _get_upload_session(upload_id)
+
+@api_router.put("/upload/sessions/{upload_id}", response_model=UploadSession)
+async def upload_session_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    username: str = Depends(verify_token)
+):
+    """Append one chunk (raw request body) at the given offset"""
+    lock = upload_session_locks.setdefault(upload_id, asyncio.Lock())
+    async with lock:
+        session = await _get_upload_session(upload_id)
+        if offset != session.offset:
+            raise HTTPException(status_code=409, detail=f"Offset tidak sesuai, lanjutkan dari {session.offset}")
+        
+        part_path = _session_part_path(upload_id)
+        written = 0
+        started = time.perf_counter()
+        buffer = await run_in_threadpool(open, part_path, "ab")
+        try:
+            async for chunk in request.stream():
+                written += len(chunk)
+                if offset + written > session.size:
+                    raise HTTPException(status_code=400, detail="Data melebihi ukuran file yang dideklarasikan")
+                await run_in_threadpool(buffer.write, chunk)
+        except HTTPException:
+            # Drop the rejected chunk so the client can retry from the same offset
+            await run_in_threadpool(buffer.truncate, offset)
+            raise
+        finally:
+            await run_in_threadpool(buffer.close)
+            upload_bytes.inc("resumable", amount=written)
+        
+        upload_duration.observe("resumable", value=time.perf_counter() - started)
+        session.offset = offset + written
+        return session
+
+@api_router.post("/upload/sessions/{upload_id}/finalize")
+async def finalize_upload_session(upload_id: str, username: str = Depends(verify_token)):
+    """Verify size and checksum, then publish the file like /upload/video"""
+    # Same lock as the chunk writes: never hash or move a part file a late chunk is still appending to
+    lock = upload_session_locks.setdefault(upload_id, asyncio.Lock())
+    async with lock:
+        session = await _get_upload_session(upload_id)
+        if session.offset != session.size:
+            raise HTTPException(status_code=400, detail=f"Upload belum lengkap ({session.offset}/{session.size} byte)")
+        
+        part_path = _session_part_path(upload_id)
+        checksum = await run_in_threadpool(_sha256_file, part_path)
+        if session.sha256 and session.sha256.lower() != checksum:
+            await abort_upload_session(upload_id, username)
+            raise HTTPException(status_code=400, detail="Checksum video tidak cocok")
+        
+        result = await store_upload(part_path, session.filename, session.content_type, checksum, session.size)
+        await repo.delete_upload_session(upload_id)
+        upload_session_locks.pop(upload_id, None)
+        return result
+
+@api_router.delete("/upload/sessions/{upload_id}")
+async def abort_upload_session(upload_id: str, username: str = Depends(verify_token)):
+    deleted = await repo.delete_upload_session(upload_id)
+    await run_in_threadpool(_remove_file, _session_part_path(upload_id))
+    upload_session_locks.pop(upload_id, None)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Sesi upload tidak ditemukan")
+    return {"message": "Upload dibatalkan"}
+
+@api_router.delete("/upload/video/{filename:path}")
 async def delete_video_file(filename: str, username: str = Depends(verify_token)):
     """Delete uploaded video file"""
-    file_path = UPLOAD_DIR / filename
-    if file_path.exists():
-        os.remove(file_path)
+    media = await repo.find_media(filename)
+    if media and media.get("ref_count", 0) > 0:
+        raise HTTPException(status_code=400, detail=f"File masih dipakai oleh {media['ref_count']} video")
+    
+    file_path = _resolve_video_path(filename)
+    if await run_in_threadpool(file_path.is_file):
+        await run_in_threadpool(_remove_file, file_path)
+        await repo.delete_media(filename)
         return {"message": "File berhasil dihapus"}
     raise HTTPException(status_code=404, detail="File tidak ditemukan")
 
+# ============ MEDIA LIBRARY ============
+
+def media_filename_from_url(url: Optional[str]) -> Optional[str]:
+    """Map a video URL (absolute or relative) to its media_files filename"""
+    marker = "/api/videos/"
+    if not url or marker not in url:
+        return None
+    return url.split(marker, 1)[1].split("?", 1)[0]
+
+async def update_media_refs(old_url: Optional[str] = None, new_url: Optional[str] = None):
+    """Move one reference from the file behind old_url to the file behind new_url"""
+    old_filename = media_filename_from_url(old_url)
+    new_filename = media_filename_from_url(new_url)
+    if old_filename == new_filename:
+        return
+    if old_filename:
+        await repo.change_media_refs(old_filename, -1)
+    if new_filename:
+        await repo.change_media_refs(new_filename, 1)
+
+# Keeps fire-and-forget tasks referenced until they finish
+background_tasks = set()
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+probe_executor = None
+
+def get_probe_executor():
+    global probe_executor
+    if probe_executor is None:
+        from concurrent.futures import ProcessPoolExecutor  # Only needed once something is probed
+        probe_executor = ProcessPoolExecutor(max_workers=MEDIA_PROBE_WORKERS)
+    return probe_executor
+
+async def probe_media_file(filename: str, rebuild: bool = True) -> bool:
+    """Read container metadata in the process pool and store it on the media_files record"""
+    global probe_executor
+    loop = asyncio.get_running_loop()
+    executor = get_probe_executor()
+    try:
+        info = await loop.run_in_executor(executor, media_probe.probe_file, str(UPLOAD_DIR / filename))
+        update = {**info, "probe_error": None}
+    except (OSError, ValueError) as e:
+        # Unreadable or not a container we parse: probed, with the reason
+        logger.warning(f"Probe failed for {filename}: {e}")
+        update = {"probe_error": str(e)}
+    except Exception as e:
+        # A crashed worker or a parser bug: marked unprobed so /media/probe retries it; earlier metadata stays
+        logger.exception(f"Probe crashed for {filename}")
+        if isinstance(e, BrokenExecutor) and probe_executor is executor:
+            executor.shutdown(wait=False)
+            probe_executor = None
+        await repo.update_media_probe(filename, {"probe_error": f"{type(e).__name__}: {e}", "probed_at": None})
+        return False
+    update["probed_at"] = datetime.now(timezone.utc).isoformat()
+
+    previous = await repo.update_media_probe(filename, update)
+    changed = previous is not None and previous.get("duration_seconds") != update.get("duration_seconds")
+    if rebuild and changed and previous.get("ref_count", 0) > 0:
+        # The berbuka window follows the real media length
+        await bump_admin_revision("media")
+        await display_timeline.rebuild()
+    return "probe_error" not in update or update["probe_error"] is None
+
+@api_router.post("/media/probe")
+async def probe_media_library(all: bool = False, username: str = Depends(verify_token)):
+    """Re-probe the library (only unprobed files unless all=true), spread over every core"""
+    filenames = await repo.media_filenames(unprobed_only=not all)
+    results = await asyncio.gather(*(probe_media_file(filename, rebuild=False) for filename in filenames))
+    if filenames:
+        await bump_admin_revision("media")
+        await display_timeline.rebuild()
+    return {"probed": sum(results), "failed": len(results) - sum(results)}
+
+@api_router.get("/media/usage")
+async def get_media_usage(username: str = Depends(verify_token)):
+    """Storage usage from media_files, without walking the upload directory"""
+    return await repo.media_usage()
+
+@api_router.post("/media/reconcile")
+async def reconcile_media_refs(username: str = Depends(verify_token)):
+    """Recount references from the video collections (repairs drifted ref_count values)"""
+    counts = Counter()
+    for url in await repo.video_urls():
+        filename = media_filename_from_url(url)
+        if filename:
+            counts[filename] += 1
+
+    await repo.set_media_refs(counts)
+    return {"referenced_files": len(counts)}
+
+# ============ VIDEO DELIVERY ============
+
+class VideoFileResponse(Response):
+    """
+    Sends bytes [start, end] of a file.
+    Uses ASGI zero-copy send when the server offers it, otherwise reads
+    bounded chunks in the threadpool so the event loop never blocks on disk.
+    """
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: Path, start: int, end: int, status_code: int, headers: dict, send_body: bool = True):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.send_body = send_body
+        self.status_code = status_code
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        count = self.end - self.start + 1
+        if not self.send_body or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            f = await run_in_threadpool(open, self.path, "rb")
+            try:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False
+                })
+            finally:
+                await run_in_threadpool(f.close)
+            return
+        if "http.response.pathsend" in extensions and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        f = await run_in_threadpool(open, self.path, "rb")
+        try:
+            await run_in_threadpool(f.seek, self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await run_in_threadpool(f.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank while sending; close the response cleanly
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await run_in_threadpool(f.close)
+
+def parse_byte_range(range_header: str, size: int) -> Optional[tuple]:
+    """Parse a single 'bytes=' range. None means ignore it and send the whole file."""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_str, _, end_str = spec.strip().partition("-")
+    try:
+        if start_str == "":
+            # Suffix range: last N bytes
+            length = int(end_str)
+            start, end = max(size - length, 0), size - 1
+            if length <= 0:
+                start = size
+        else:
+            start = int(start_str)
+            end = min(int(end_str), size - 1) if end_str else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range tidak valid", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def _resolve_video_path(file_path: str) -> Path:
+    parts = file_path.split("/")
+    if any(not part or part.startswith(".") for part in parts):
+        raise HTTPException(status_code=404, detail="File tidak ditemukan")
+    return UPLOAD_DIR.joinpath(*parts)
+
+@api_router.api_route("/videos/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_video(file_path: str, request: Request):
+    """Serve an uploaded video with Range/206 support and immutable caching"""
+    path = _resolve_video_path(file_path)
+    try:
+        file_stat = await run_in_threadpool(os.stat, path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=404, detail="File tidak ditemukan")
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise HTTPException(status_code=404, detail="File tidak ditemukan")
+
+    size = file_stat.st_size
+    # The content hash is the name; a copy or restore with a new mtime keeps the same ETag
+    sha256 = _media_path_sha256(file_path)
+    etag = f'"{sha256}"' if sha256 else f'"{size:x}-{file_stat.st_mtime_ns:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(file_stat.st_mtime, usegmt=True),
+        "Cache-Control": MEDIA_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Type"] = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+    if MEDIA_ACCEL_REDIRECT_PREFIX:
+        # nginx serves the bytes (including Range) from its internal location
+        headers["X-Accel-Redirect"] = MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + file_path
+        return Response(headers=headers)
+
+    start, end, status_code = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range == etag):
+        byte_range = parse_byte_range(range_header, size)
+        if byte_range:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return VideoFileResponse(path, start, end, status_code, headers, send_body=request.method != "HEAD")
+
+# ============ LIST QUERIES (KEYSET PAGINATION) ============
+
+def encode_list_cursor(key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key), separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_list_cursor(cursor: str, size: int) -> tuple:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor tidak valid")
+    if not isinstance(key, list) or len(key) != size:
+        raise HTTPException(status_code=400, detail="Cursor tidak valid")
+    return tuple(key)
+
+def parse_list_fields(fields: Optional[str], model) -> Optional[frozenset]:
+    """?fields=a,b -> set of model fields to return (None: all)"""
+    if not fields:
+        return None
+    selected = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = selected - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Field tidak dikenal: {', '.join(sorted(unknown))}")
+    return frozenset(selected)
+
+async def list_response(
+    query: ListQuery,
+    model,
+    limit: Optional[int],
+    cursor: Optional[str],
+) -> StreamingResponse:
+    """
+    Stream the documents of `query` as a JSON array in its keyset order.
+
+    With a limit, the page boundary is read first from the index (sort keys
+    only) and the body is every document up to and including it, so the
+    X-Next-Cursor header is known before streaming and stays consistent with
+    the body even if documents are inserted in between.
+    """
+    after = decode_list_cursor(cursor, len(query.sort_fields)) if cursor else None
+    upto = None
+
+    headers = {"Cache-Control": "no-cache"}
+    if limit:
+        upto, has_more = await repo.list_boundary(query, after, limit)
+        if has_more:
+            headers["X-Next-Cursor"] = encode_list_cursor(upto)
+    fields = query.fields
+
+    async def body():
+        yield b"["
+        first = True
+        async for doc in repo.iter_list(query, after, upto):
+            if fields:
+                # Fill defaults for older documents without validating fields that weren't requested
+                item = model.model_construct(**doc).model_dump_json(include=fields)
+            else:
+                item = model.model_validate(doc).model_dump_json()
+            yield (b"" if first else b",") + item.encode()
+            first = False
+        yield b"]"
+
+    return StreamingResponse(body(), media_type="application/json", headers=headers)
+
+# ============ ADMIN BOOTSTRAP ============
+
+# Admin panel sections and the listing behind each one (users: repo.list_users)
+ADMIN_SECTIONS = {
+    "tvc_videos": ListQuery("tvc_videos", ("order", "id")),
+    "berbuka_videos": ListQuery("berbuka_videos", ("created_at", "id")),
+    "countdown_videos": ListQuery("countdown_videos", ("created_at", "id")),
+    "schedules": ListQuery("maghrib_schedules", ("date", "location")),
+    "users": None,
+}
+
+async def bump_admin_revision(*sections: str):
+    """Record that admin sections changed so /admin/bootstrap?since= can skip the rest"""
+    await repo.bump_revisions(sections)
+
+async def admin_content_changed(*sections: str):
+    """After an admin edit: bump the section revisions and recompile the display timeline"""
+    await bump_admin_revision(*sections)
+    await display_timeline.rebuild()
+
+# Revision sections that feed the display timeline ("media": probed durations)
+DISPLAY_SECTIONS = ("tvc_videos", "berbuka_videos", "countdown_videos", "schedules", "media")
+
+def display_revision(revisions: dict) -> str:
+    return revisions["epoch"] + "-" + ".".join(str(revisions.get(section, 0)) for section in DISPLAY_SECTIONS)
+
+async def get_admin_revisions() -> dict:
+    return await repo.get_revisions()
+
+def admin_version(revisions: dict) -> str:
+    """'<epoch>-<rev>.<rev>...' in ADMIN_SECTIONS order; a new epoch (e.g. restored DB) forces a full reload"""
+    return revisions["epoch"] + "-" + ".".join(str(revisions.get(section, 0)) for section in ADMIN_SECTIONS)
+
+def changed_admin_sections(revisions: dict, since: Optional[str]) -> List[str]:
+    try:
+        epoch, numbers = since.split("-", 1)
+        previous = [int(n) for n in numbers.split(".")]
+    except (AttributeError, ValueError):
+        previous = None
+    if previous is None or epoch != revisions["epoch"] or len(previous) != len(ADMIN_SECTIONS):
+        return list(ADMIN_SECTIONS)
+    return [
+        section for section, rev in zip(ADMIN_SECTIONS, previous)
+        if revisions.get(section, 0) != rev
+    ]
+
+async def _admin_section(section: str) -> List[dict]:
+    query = ADMIN_SECTIONS[section]
+    if query is None:
+        return await repo.list_users()
+    return [doc async for doc in repo.iter_list(query)]
+
+@api_router.get("/admin/bootstrap", response_model=AdminBootstrap, response_model_exclude_none=True)
+async def admin_bootstrap(since: Optional[str] = None, username: str = Depends(verify_token)):
+    """
+    Everything the admin panel shows, in one request: the collections are read
+    concurrently. With ?since=<version> only the sections changed since that
+    version are included (full=false); the display state is always included.
+    """
+    # Revisions are read before the data, so a concurrent edit at worst makes the data newer than the version
+    revisions = await get_admin_revisions()
+    sections = changed_admin_sections(revisions, since)
+    results = await asyncio.gather(*(_admin_section(section) for section in sections))
+
+    timeline, now = await resolve_display_location(None)
+    return AdminBootstrap(
+        version=admin_version(revisions),
+        full=len(sections) == len(ADMIN_SECTIONS),
+        display_state=DisplayState.model_validate_json(display_timeline.payload_at(now, timeline)),
+        **dict(zip(sections, results))
+    )
+
 # ============ TVC VIDEO ENDPOINTS (PROTECTED) ============
 
 @api_router.get("/tvc-videos", response_model=List[TVCVideo])
-async def get_tvc_videos():
-    videos = await db.tvc_videos.find({}, {"_id": 0}).sort("order", 1).to_list(100)
-    return videos
+async def get_tvc_videos(
+    limit: Optional[int] = Query(None, ge=1, le=LIST_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    query = ListQuery("tvc_videos", ("order", "id"), fields=parse_list_fields(fields, TVCVideo))
+    return await list_response(query, TVCVideo, limit, cursor)
 
 @api_router.post("/tvc-videos", response_model=TVCVideo)
 async def create_tvc_video(video: TVCVideoCreate, username: str = Depends(verify_token)):
     video_obj = TVCVideo(**video.model_dump())
     doc = video_obj.model_dump()
-    await db.tvc_videos.insert_one(doc)
+    await repo.insert_video("tvc_videos", doc)
+    await update_media_refs(new_url=video_obj.url)
+    await admin_content_changed("tvc_videos")
     return video_obj
 
 @api_router.put("/tvc-videos/{video_id}", response_model=TVCVideo)
@@ -382,32 +1538,42 @@ async def update_tvc_video(video_id: str, video: TVCVideoUpdate, username: str =
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    result = await db.tvc_videos.update_one({"id": video_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    result = await repo.update_video("tvc_videos", video_id, update_data)
+    if result is None:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    updated = await db.tvc_videos.find_one({"id": video_id}, {"_id": 0})
+    previous, updated = result
+    await update_media_refs(old_url=previous.get("url"), new_url=updated.get("url"))
+    await admin_content_changed("tvc_videos")
     return TVCVideo(**updated)
 
 @api_router.delete("/tvc-videos/{video_id}")
 async def delete_tvc_video(video_id: str, username: str = Depends(verify_token)):
-    result = await db.tvc_videos.delete_one({"id": video_id})
-    if result.deleted_count == 0:
+    deleted = await repo.delete_video("tvc_videos", video_id)
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Video not found")
+    await update_media_refs(old_url=deleted.get("url"))
+    await admin_content_changed("tvc_videos")
     return {"message": "Video deleted"}
 
 # ============ BERBUKA VIDEO ENDPOINTS (PROTECTED) ============
 
 @api_router.get("/berbuka-videos", response_model=List[BerbukaVideo])
-async def get_berbuka_videos():
-    videos = await db.berbuka_videos.find({}, {"_id": 0}).to_list(100)
-    return videos
+async def get_berbuka_videos(
+    limit: Optional[int] = Query(None, ge=1, le=LIST_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    query = ListQuery("berbuka_videos", ("created_at", "id"), fields=parse_list_fields(fields, BerbukaVideo))
+    return await list_response(query, BerbukaVideo, limit, cursor)
 
 @api_router.post("/berbuka-videos", response_model=BerbukaVideo)
 async def create_berbuka_video(video: BerbukaVideoCreate, username: str = Depends(verify_token)):
     video_obj = BerbukaVideo(**video.model_dump())
     doc = video_obj.model_dump()
-    await db.berbuka_videos.insert_one(doc)
+    await repo.insert_video("berbuka_videos", doc)
+    await update_media_refs(new_url=video_obj.url)
+    await admin_content_changed("berbuka_videos")
     return video_obj
 
 @api_router.put("/berbuka-videos/{video_id}", response_model=BerbukaVideo)
@@ -416,32 +1582,42 @@ async def update_berbuka_video(video_id: str, video: BerbukaVideoUpdate, usernam
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    result = await db.berbuka_videos.update_one({"id": video_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    result = await repo.update_video("berbuka_videos", video_id, update_data)
+    if result is None:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    updated = await db.berbuka_videos.find_one({"id": video_id}, {"_id": 0})
+    previous, updated = result
+    await update_media_refs(old_url=previous.get("url"), new_url=updated.get("url"))
+    await admin_content_changed("berbuka_videos")
     return BerbukaVideo(**updated)
 
 @api_router.delete("/berbuka-videos/{video_id}")
 async def delete_berbuka_video(video_id: str, username: str = Depends(verify_token)):
-    result = await db.berbuka_videos.delete_one({"id": video_id})
-    if result.deleted_count == 0:
+    deleted = await repo.delete_video("berbuka_videos", video_id)
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Video not found")
+    await update_media_refs(old_url=deleted.get("url"))
+    await admin_content_changed("berbuka_videos")
     return {"message": "Video deleted"}
 
 # ============ COUNTDOWN VIDEO ENDPOINTS (PROTECTED) ============
 
 @api_router.get("/countdown-videos", response_model=List[CountdownVideo])
-async def get_countdown_videos():
-    videos = await db.countdown_videos.find({}, {"_id": 0}).to_list(100)
-    return videos
+async def get_countdown_videos(
+    limit: Optional[int] = Query(None, ge=1, le=LIST_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    query = ListQuery("countdown_videos", ("created_at", "id"), fields=parse_list_fields(fields, CountdownVideo))
+    return await list_response(query, CountdownVideo, limit, cursor)
 
 @api_router.post("/countdown-videos", response_model=CountdownVideo)
 async def create_countdown_video(video: CountdownVideoCreate, username: str = Depends(verify_token)):
     video_obj = CountdownVideo(**video.model_dump())
     doc = video_obj.model_dump()
-    await db.countdown_videos.insert_one(doc)
+    await repo.insert_video("countdown_videos", doc)
+    await update_media_refs(new_url=video_obj.url)
+    await admin_content_changed("countdown_videos")
     return video_obj
 
 @api_router.put("/countdown-videos/{video_id}", response_model=CountdownVideo)
@@ -450,37 +1626,115 @@ async def update_countdown_video(video_id: str, video: CountdownVideoUpdate, use
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    result = await db.countdown_videos.update_one({"id": video_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    result = await repo.update_video("countdown_videos", video_id, update_data)
+    if result is None:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    updated = await db.countdown_videos.find_one({"id": video_id}, {"_id": 0})
+    previous, updated = result
+    await update_media_refs(old_url=previous.get("url"), new_url=updated.get("url"))
+    await admin_content_changed("countdown_videos")
     return CountdownVideo(**updated)
 
 @api_router.delete("/countdown-videos/{video_id}")
 async def delete_countdown_video(video_id: str, username: str = Depends(verify_token)):
-    result = await db.countdown_videos.delete_one({"id": video_id})
-    if result.deleted_count == 0:
+    deleted = await repo.delete_video("countdown_videos", video_id)
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Video not found")
+    await update_media_refs(old_url=deleted.get("url"))
+    await admin_content_changed("countdown_videos")
     return {"message": "Video deleted"}
 
+# ============ PLAYLIST BATCH UPDATES (PROTECTED) ============
+
+@api_router.post("/playlists/batch")
+async def batch_update_videos(request: VideoBatchRequest, username: str = Depends(verify_token)):
+    """
+    Apply a full TVC playlist order and/or is_active changes to the three video
+    collections at once: one atomic write (a transaction where the store has
+    one), then a single timeline rebuild, so screens never see a half-applied
+    order.
+    """
+    batches = {
+        collection_name: batch
+        for collection_name, batch in request.model_dump().items()
+        if batch and (batch["order"] is not None or batch["active"])
+    }
+    for collection_name, batch in batches.items():
+        if batch["order"] is not None and collection_name != "tvc_videos":
+            raise HTTPException(status_code=400, detail="Urutan hanya berlaku untuk video TVC")
+    if not batches:
+        raise HTTPException(status_code=400, detail="No data to update")
+
+    updates = {}
+    for collection_name, batch in batches.items():
+        existing = await repo.video_ids(collection_name)
+        collection_updates = updates[collection_name] = {}
+        if batch["order"] is not None:
+            order = batch["order"]
+            if len(order) != len(set(order)) or set(order) != existing:
+                raise HTTPException(status_code=400, detail="Urutan harus memuat setiap video TVC tepat satu kali")
+            for position, video_id in enumerate(order):
+                collection_updates.setdefault(video_id, {})["order"] = position
+        unknown = set(batch["active"]) - existing
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Video not found: {', '.join(sorted(unknown))}")
+        for video_id, is_active in batch["active"].items():
+            collection_updates.setdefault(video_id, {})["is_active"] = is_active
+
+    modified = await repo.apply_video_updates(updates)
+    if any(modified.values()):
+        await admin_content_changed(*(name for name, count in modified.items() if count))
+    return {"modified": modified}
+
 # ============ MAGHRIB SCHEDULE ENDPOINTS (PROTECTED) ============
 
+def validate_schedule_timezone(value: Optional[str]):
+    if value is not None and value not in INDONESIA_TIMEZONES:
+        raise HTTPException(status_code=400, detail="Zona waktu harus WIB, WITA, atau WIT")
+
+def validate_schedule_date(value: Optional[str], name: str):
+    if value is None:
+        return
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Parameter {name} harus berformat YYYY-MM-DD")
+
 @api_router.get("/schedules", response_model=List[MaghribSchedule])
-async def get_schedules():
-    schedules = await db.maghrib_schedules.find({}, {"_id": 0}).sort("date", 1).to_list(100)
-    return schedules
+async def get_schedules(
+    location: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1, le=LIST_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    Jadwal urut tanggal (lalu lokasi). Filter ?from=&to= (YYYY-MM-DD, inklusif),
+    halaman dengan ?limit= dan ?cursor= dari header X-Next-Cursor, ?fields=date,maghrib_time
+    untuk membatasi field.
+    """
+    validate_schedule_date(date_from, "from")
+    validate_schedule_date(date_to, "to")
+    query = ListQuery(
+        "maghrib_schedules", ("date", "location"),
+        equals={"location": location} if location else {},
+        ranges={"date": (date_from, date_to)},
+        fields=parse_list_fields(fields, MaghribSchedule)
+    )
+    return await list_response(query, MaghribSchedule, limit, cursor)
 
 @api_router.post("/schedules", response_model=MaghribSchedule)
 async def create_schedule(schedule: MaghribScheduleCreate, username: str = Depends(verify_token)):
-    # Check if schedule for this date already exists
-    existing = await db.maghrib_schedules.find_one({"date": schedule.date})
-    if existing:
-        raise HTTPException(status_code=400, detail="Schedule for this date already exists")
-    
+    validate_schedule_timezone(schedule.timezone)
     schedule_obj = MaghribSchedule(**schedule.model_dump())
     doc = schedule_obj.model_dump()
-    await db.maghrib_schedules.insert_one(doc)
+    try:
+        await repo.insert_schedule(doc)
+    except DuplicateError:
+        # Unique index on (location, date) makes this check race-free
+        raise HTTPException(status_code=400, detail="Schedule for this date and location already exists")
+    await admin_content_changed("schedules")
     return schedule_obj
 
 @api_router.put("/schedules/{schedule_id}", response_model=MaghribSchedule)
@@ -488,128 +1742,1370 @@ async def update_schedule(schedule_id: str, schedule: MaghribScheduleUpdate, use
     update_data = {k: v for k, v in schedule.model_dump().items() if v is not None}
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
+    validate_schedule_timezone(update_data.get("timezone"))
     
-    result = await db.maghrib_schedules.update_one({"id": schedule_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    try:
+        updated = await repo.update_schedule(schedule_id, update_data)
+    except DuplicateError:
+        raise HTTPException(status_code=400, detail="Schedule for this date and location already exists")
+    if updated is None:
         raise HTTPException(status_code=404, detail="Schedule not found")
     
-    updated = await db.maghrib_schedules.find_one({"id": schedule_id}, {"_id": 0})
+    await admin_content_changed("schedules")
     return MaghribSchedule(**updated)
 
 @api_router.delete("/schedules/{schedule_id}")
 async def delete_schedule(schedule_id: str, username: str = Depends(verify_token)):
-    result = await db.maghrib_schedules.delete_one({"id": schedule_id})
-    if result.deleted_count == 0:
+    if not await repo.delete_schedule(schedule_id):
         raise HTTPException(status_code=404, detail="Schedule not found")
+    await admin_content_changed("schedules")
     return {"message": "Schedule deleted"}
 
 @api_router.post("/schedules/bulk", response_model=List[MaghribSchedule])
 async def create_bulk_schedules(schedules: List[MaghribScheduleCreate], username: str = Depends(verify_token)):
+    # Existing (location, date) pairs are skipped; one query plus one insert_many instead of a round trip per row
+    for schedule in schedules:
+        validate_schedule_timezone(schedule.timezone)
+    existing = {
+        (doc.get("location"), doc["date"])
+        for doc in await repo.find_schedules(
+            list({schedule.location for schedule in schedules}),
+            list({schedule.date for schedule in schedules})
+        )
+    }
+
     created = []
     for schedule in schedules:
-        existing = await db.maghrib_schedules.find_one({"date": schedule.date})
-        if not existing:
-            schedule_obj = MaghribSchedule(**schedule.model_dump())
-            doc = schedule_obj.model_dump()
-            await db.maghrib_schedules.insert_one(doc)
-            created.append(schedule_obj)
+        key = (schedule.location, schedule.date)
+        if key not in existing:
+            existing.add(key)
+            created.append(MaghribSchedule(**schedule.model_dump()))
+
+    if created:
+        # Schedules inserted concurrently by another request are skipped as well
+        failed = await repo.insert_schedules([schedule.model_dump() for schedule in created])
+        created = [schedule for i, schedule in enumerate(created) if i not in failed]
+        await admin_content_changed("schedules")
     return created
 
+# ============ SCHEDULE IMPORT (CSV / EXCEL) ============
+
+# Accepted header names, English and Indonesian
+SCHEDULE_IMPORT_COLUMNS = {
+    "date": "date",
+    "tanggal": "date",
+    "subuh_time": "subuh_time",
+    "subuh": "subuh_time",
+    "maghrib_time": "maghrib_time",
+    "maghrib": "maghrib_time",
+    "location": "location",
+    "lokasi": "location",
+    "wilayah": "location",
+    "timezone": "timezone",
+    "zona": "timezone",
+    "zona_waktu": "timezone",
+}
+
+def _import_date(value) -> str:
+    if hasattr(value, "strftime"):  # date/datetime cell from Excel
+        return value.strftime("%Y-%m-%d")
+    try:
+        return datetime.strptime(str(value).strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"Format tanggal harus YYYY-MM-DD: {value}")
+
+def _import_time(value) -> str:
+    if hasattr(value, "strftime"):  # time cell from Excel
+        return value.strftime("%H:%M")
+    try:
+        return datetime.strptime(str(value).strip(), "%H:%M").strftime("%H:%M")
+    except ValueError:
+        raise ValueError(f"Format jam harus HH:MM: {value}")
+
+def _parse_import_row(values: dict) -> dict:
+    if values.get("date") in (None, ""):
+        raise ValueError("Tanggal kosong")
+    if values.get("maghrib_time") in (None, ""):
+        raise ValueError("Waktu maghrib kosong")
+    subuh = values.get("subuh_time")
+    zone = str(values.get("timezone") or "WIB").strip().upper()
+    if zone not in INDONESIA_TIMEZONES:
+        raise ValueError(f"Zona waktu harus WIB, WITA, atau WIT: {values.get('timezone')}")
+    return {
+        "date": _import_date(values["date"]),
+        "subuh_time": _import_time(subuh) if subuh not in (None, "") else "04:30",
+        "maghrib_time": _import_time(values["maghrib_time"]),
+        "location": str(values.get("location") or "Bekasi").strip(),
+        "timezone": zone,
+    }
+
+def _iter_csv(file):
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    yield from csv.reader(text)
+
+def _iter_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Import Excel membutuhkan paket openpyxl")
+    try:
+        # read_only streams rows instead of loading the whole sheet
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception:
+        raise ValueError("File Excel tidak valid")
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def iter_schedule_import(file, kind: str):
+    """Yield (row_number, parsed_row, error) for every non-empty row"""
+    rows = _iter_xlsx(file) if kind == "xlsx" else _iter_csv(file)
+    header = next(rows, None) or []
+    columns = [SCHEDULE_IMPORT_COLUMNS.get(str(h or "").strip().lower()) for h in header]
+    if "date" not in columns or "maghrib_time" not in columns:
+        raise ValueError("Header wajib berisi kolom date dan maghrib_time")
+
+    for row_number, row in enumerate(rows, start=2):
+        if not any(cell not in (None, "") for cell in row):
+            continue
+        values = {column: cell for column, cell in zip(columns, row) if column}
+        try:
+            yield row_number, _parse_import_row(values), None
+        except ValueError as e:
+            yield row_number, None, str(e)
+
+def _read_batch(rows, size: int) -> list:
+    return list(islice(rows, size))
+
+async def _import_schedule_batch(batch: list, report: ScheduleImportReport, seen_keys: set):
+    valid = []
+    for row_number, parsed, error in batch:
+        if error is None and (parsed["location"], parsed["date"]) in seen_keys:
+            error = "Tanggal dan lokasi duplikat di file"
+        if error is not None:
+            report.invalid += 1
+            report.rows.append(ScheduleImportRow(
+                row=row_number,
+                date=parsed["date"] if parsed else None,
+                location=parsed["location"] if parsed else None,
+                status="invalid",
+                error=error
+            ))
+            continue
+        seen_keys.add((parsed["location"], parsed["date"]))
+        valid.append((row_number, parsed))
+
+    if not valid:
+        return
+
+    existing = {}
+    for doc in await repo.find_schedules(
+        list({parsed["location"] for _, parsed in valid}),
+        list({parsed["date"] for _, parsed in valid})
+    ):
+        existing.setdefault((doc.get("location"), doc["date"]), doc)
+
+    changed = []
+    now = datetime.now(timezone.utc).isoformat()
+    for row_number, parsed in valid:
+        current = existing.get((parsed["location"], parsed["date"]))
+        if current is None:
+            status = "inserted"
+        elif all(current.get(field, default) == parsed[field] for field, default in SCHEDULE_FIELDS.items()):
+            status = "unchanged"
+        else:
+            status = "updated"
+
+        if status != "unchanged":
+            changed.append({
+                "id": str(uuid.uuid4()),
+                "date": parsed["date"],
+                "created_at": now,
+                **{field: parsed[field] for field in SCHEDULE_FIELDS}
+            })
+        setattr(report, status, getattr(report, status) + 1)
+        report.rows.append(ScheduleImportRow(
+            row=row_number,
+            date=parsed["date"],
+            location=parsed["location"],
+            status=status
+        ))
+
+    if changed:
+        await repo.upsert_schedules(changed, overwrite=True)
+
+@api_router.post("/schedules/import", response_model=ScheduleImportReport)
+async def import_schedules(file: UploadFile = File(...), username: str = Depends(verify_token)):
+    """
+    Import jadwal dari CSV atau Excel (.xlsx).
+    Kolom: date, subuh_time (opsional), maghrib_time, location (opsional), timezone (opsional, WIB/WITA/WIT).
+    Jadwal yang sudah ada untuk tanggal dan lokasi yang sama di-update, hasilnya dilaporkan per baris.
+    """
+    filename = (file.filename or "").lower()
+    if filename.endswith(".xlsx"):
+        kind = "xlsx"
+    elif filename.endswith(".csv"):
+        kind = "csv"
+    else:
+        raise HTTPException(status_code=400, detail="Format file tidak didukung. Gunakan CSV atau XLSX")
+
+    report = ScheduleImportReport()
+    seen_keys = set()
+    rows = iter_schedule_import(file.file, kind)
+    try:
+        while True:
+            # Parsing runs in a worker thread, one batch at a time, so memory stays flat
+            batch = await run_in_threadpool(_read_batch, rows, SCHEDULE_IMPORT_BATCH_SIZE)
+            if not batch:
+                break
+            report.total += len(batch)
+            await _import_schedule_batch(batch, report, seen_keys)
+    except UnicodeDecodeError:
+        # Before ValueError, which it subclasses
+        raise HTTPException(status_code=400, detail="File CSV harus berformat UTF-8")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    report.rows.sort(key=lambda row: row.row)
+    if report.inserted or report.updated:
+        await admin_content_changed("schedules")
+    return report
+
+# ============ SCHEDULE GENERATOR ============
+
+def _compute_schedule_times(request: ScheduleGenerateRequest, start, days: int) -> tuple:
+    """"HH:MM" Subuh and Maghrib arrays of shape (locations, days), computed in one vectorized pass"""
+    import prayer_times  # NumPy is only loaded when the generator is used
+
+    offsets = [
+        INDONESIA_TIMEZONES[loc.timezone].utcoffset(datetime(start.year, start.month, start.day)).total_seconds() / 3600
+        for loc in request.locations
+    ]
+    subuh, maghrib = prayer_times.compute_prayer_times(
+        [loc.latitude for loc in request.locations],
+        [loc.longitude for loc in request.locations],
+        [loc.elevation for loc in request.locations],
+        offsets,
+        start,
+        days,
+    )
+    return prayer_times.format_minutes(subuh), prayer_times.format_minutes(maghrib)
+
+def _generated_schedule_rows(request: ScheduleGenerateRequest, start, days: int, subuh, maghrib):
+    dates = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+    for i, loc in enumerate(request.locations):
+        for j, date_str in enumerate(dates):
+            yield {
+                "location": loc.location,
+                "date": date_str,
+                "subuh_time": str(subuh[i, j]),
+                "maghrib_time": str(maghrib[i, j]),
+                "timezone": loc.timezone,
+            }
+
+@api_router.post("/schedules/generate", response_model=ScheduleGenerateReport)
+async def generate_schedules(request: ScheduleGenerateRequest, username: str = Depends(verify_token)):
+    """
+    Hitung jadwal Subuh dan Maghrib (kriteria Kemenag) dari koordinat lokasi
+    untuk rentang tanggal, lalu simpan langsung ke maghrib_schedules.
+    """
+    try:
+        start = datetime.strptime(request.start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(request.end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Format tanggal harus YYYY-MM-DD")
+    days = (end - start).days + 1
+    if days < 1:
+        raise HTTPException(status_code=400, detail="Tanggal akhir harus setelah tanggal mulai")
+    if days > SCHEDULE_GENERATE_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Maksimal {SCHEDULE_GENERATE_MAX_DAYS} hari per generate")
+    if not request.locations:
+        raise HTTPException(status_code=400, detail="Daftar lokasi kosong")
+    for loc in request.locations:
+        validate_schedule_timezone(loc.timezone)
+    if len({location_key(loc.location) for loc in request.locations}) != len(request.locations):
+        raise HTTPException(status_code=400, detail="Nama lokasi duplikat")
+
+    report = ScheduleGenerateReport(locations=len(request.locations), days=days)
+    subuh, maghrib = await run_in_threadpool(_compute_schedule_times, request, start, days)
+    rows = _generated_schedule_rows(request, start, days, subuh, maghrib)
+    now = datetime.now(timezone.utc).isoformat()
+    while True:
+        batch = _read_batch(rows, SCHEDULE_IMPORT_BATCH_SIZE)
+        if not batch:
+            break
+        docs = []
+        for row in batch:
+            if not row["subuh_time"] or not row["maghrib_time"]:
+                report.skipped.append(f"{row['location']} {row['date']}")
+                continue
+            docs.append({"id": str(uuid.uuid4()), "created_at": now, **row})
+        if not docs:
+            continue
+        inserted, modified = await repo.upsert_schedules(docs, request.overwrite)
+        report.inserted += inserted
+        report.updated += modified
+        report.unchanged += len(docs) - inserted - modified
+
+    if report.inserted or report.updated:
+        await admin_content_changed("schedules")
+    return report
+
+# ============ DISPLAY TIMELINE ============
+
+class TimelineDay(NamedTuple):
+    starts: List[float]  # Unix timestamps, sorted
+    states: List[str]
+    subuh_time: str
+    maghrib_time: str
+    location: str
+    berbuka_end: datetime
+
+class LocationTimeline(NamedTuple):
+    location: str
+    timezone: str  # WIB, WITA or WIT
+    tz: object  # pytz timezone for `timezone`
+    digest: str  # Content digest of this location's schedules plus the active media
+    days: dict  # YYYY-MM-DD (local date) -> TimelineDay
+
+def location_key(location: str) -> str:
+    return location.strip().casefold()
+
+def compile_timeline_day(schedule: dict, berbuka_duration: int, tz=JAKARTA_TZ) -> TimelineDay:
+    """Compile one schedule into sorted state intervals: tvc -> countdown -> berbuka -> tvc"""
+    day = datetime.strptime(schedule["date"], "%Y-%m-%d")
+    subuh_time_str = schedule.get("subuh_time") or "04:30"
+    maghrib_time_str = schedule["maghrib_time"]
+
+    subuh_hour, subuh_minute = map(int, subuh_time_str.split(":"))
+    maghrib_hour, maghrib_minute = map(int, maghrib_time_str.split(":"))
+
+    day_start = tz.localize(day)
+    subuh_dt = tz.localize(day.replace(hour=subuh_hour, minute=subuh_minute))
+    maghrib_dt = tz.localize(day.replace(hour=maghrib_hour, minute=maghrib_minute))
+    berbuka_end = maghrib_dt + timedelta(seconds=berbuka_duration)
+
+    # Clamp so the boundaries stay sorted; an empty interval is never selected by bisect
+    subuh_ts = subuh_dt.timestamp()
+    maghrib_ts = max(maghrib_dt.timestamp(), subuh_ts)
+    berbuka_end_ts = max(berbuka_end.timestamp(), maghrib_ts)
+
+    return TimelineDay(
+        starts=[day_start.timestamp(), subuh_ts, maghrib_ts, berbuka_end_ts],
+        states=["tvc", "countdown", "berbuka", "tvc"],
+        subuh_time=subuh_time_str,
+        maghrib_time=maghrib_time_str,
+        location=schedule.get("location", "Bekasi"),
+        berbuka_end=berbuka_end,
+    )
+
+def compile_location_timeline(location: str, schedules: list, berbuka_duration: int, media_digest: str) -> LocationTimeline:
+    # The most recent schedule decides the location's time zone
+    schedules = sorted(schedules, key=lambda schedule: schedule.get("date", ""))
+    zone = schedules[-1].get("timezone") or "WIB"
+    if zone not in INDONESIA_TIMEZONES:
+        logger.warning(f"Unknown time zone {zone} for {location}, using WIB")
+        zone = "WIB"
+    tz = INDONESIA_TIMEZONES[zone]
+
+    days = {}
+    for schedule in schedules:
+        if schedule.get("date") in days:
+            continue
+        try:
+            days[schedule["date"]] = compile_timeline_day(schedule, berbuka_duration, tz)
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Skipping invalid schedule {schedule.get('id')}: {e}")
+
+    digest = hashlib.sha1(json.dumps(
+        [media_digest, schedules],
+        sort_keys=True,
+        default=str
+    ).encode('utf-8')).hexdigest()[:16]
+    return LocationTimeline(location=location, timezone=zone, tz=tz, digest=digest, days=days)
+
+class DisplayPayload(NamedTuple):
+    prefix: bytes  # JSON up to and including '"countdown_seconds":'
+    suffix: bytes  # The rest of the JSON after the countdown value
+    countdown: bool  # Whether countdown_seconds is filled in
+
+DISPLAY_COUNTDOWN_FIELD = b',"countdown_seconds":'
+
+# Cached payload templates; cleared on every rebuild anyway
+DISPLAY_PAYLOAD_CACHE_SIZE = 4096
+
+class DisplayTimeline:
+    """
+    In-memory display timeline.
+    Schedules for a window of days plus the active media are compiled once,
+    so answering /display-state is a bisect plus arithmetic with no DB round trip.
+    Each location gets its own compiled days in its own time zone; looking one up
+    is a dict access, so the cost per request doesn't grow with the number of locations.
+    Rebuilt whenever the schedule or video endpoints change data, and by every
+    other worker once it sees the bumped revision (watch_revisions); every rebuild
+    is also saved to a snapshot file, so a restarted worker can answer from it
+    before the database is reachable.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.media_digest = ""
+        self.first_date = None
+        self.last_date = None
+        self.locations = {}  # location_key -> LocationTimeline
+        self.default_location = DISPLAY_DEFAULT_LOCATION or "Bekasi"
+        self.tvc_videos: List[TVCVideo] = []
+        self.berbuka_video: Optional[BerbukaVideo] = None
+        self.countdown_video: Optional[CountdownVideo] = None
+        self.media_info = {}
+        self.payloads = {}  # (location_key, date, interval index) -> DisplayPayload
+        self.snapshot_digest = None  # SHA-1 of the snapshot file as last written or read
+        self.stale = False  # Serving data the database hasn't confirmed (snapshot, or the last refresh failed)
+        self.revalidate_task = None
+        self.revision = None  # display_revision() of the data the timeline was compiled from
+        self.changed = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def covers(self, date) -> bool:
+        """Whether the window holds Jakarta's `date` in every zone: WITA and WIT reach the next date up to two hours earlier"""
+        return self.first_date is not None and self.first_date <= date and date + timedelta(days=1) <= self.last_date
+
+    async def ensure(self, date=None):
+        """
+        Rebuild if the given date falls outside the compiled window (e.g. at midnight).
+        With a timeline already loaded, a database failure keeps it in service
+        (stale) instead of failing the request; only a worker with nothing to
+        serve yet answers 503.
+        """
+        date = date or datetime.now(JAKARTA_TZ).date()
+        if self.covers(date) or (self.loaded and self.revalidating):
+            return
+        async with self._lock:
+            if self.covers(date):
+                return
+            try:
+                await self._refresh(date)
+            except Exception:
+                if not self.loaded:
+                    raise HTTPException(
+                        status_code=503,
+                        detail="Data tampilan belum tersedia, database tidak dapat dihubungi",
+                        headers={"Retry-After": str(DISPLAY_REVALIDATE_MIN_SECONDS)}
+                    )
+
+    async def rebuild(self) -> bool:
+        """
+        Refresh from the database after a change. Returns False if that failed:
+        the data written by the caller is safe, and the timeline catches up
+        once background revalidation gets through.
+        """
+        async with self._lock:
+            try:
+                await self._refresh(datetime.now(JAKARTA_TZ).date())
+            except Exception:
+                return False
+        return True
+
+    async def watch_revisions(self):
+        """
+        Rebuild when another worker (Passenger process, uvicorn worker, or a
+        process sharing the SQLite file) changed display data: only the worker
+        that handled an edit rebuilds right away, the rest notice the bumped
+        revision here within DISPLAY_REVISION_CHECK_SECONDS.
+        """
+        while True:
+            await asyncio.sleep(DISPLAY_REVISION_CHECK_SECONDS)
+            if self.revalidating:
+                continue
+            try:
+                revisions = await asyncio.wait_for(repo.get_revisions(), DISPLAY_DB_TIMEOUT_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Display revision check failed: {e!r}")
+                continue
+            if display_revision(revisions) != self.revision:
+                await self.rebuild()
+
+    @property
+    def loaded(self) -> bool:
+        return self.first_date is not None
+
+    @property
+    def revalidating(self) -> bool:
+        return self.revalidate_task is not None and not self.revalidate_task.done()
+
+    def set_stale(self, stale: bool):
+        self.stale = stale
+        display_timeline_stale.set(value=int(stale))
+
+    async def _refresh(self, today):
+        """_rebuild; on failure the current timeline stays in service and revalidation starts"""
+        try:
+            await self._rebuild(today)
+        except Exception as e:
+            display_timeline_failures.inc()
+            if isinstance(e, asyncio.TimeoutError):
+                logger.warning(f"Display timeline refresh timed out after {DISPLAY_DB_TIMEOUT_SECONDS}s, serving the last good timeline")
+            else:
+                logger.exception("Display timeline refresh failed, serving the last good timeline")
+            self.set_stale(True)
+            if not self.revalidating:
+                self.revalidate_task = asyncio.create_task(self._revalidate())
+            raise
+        self.set_stale(False)
+
+    async def _revalidate(self):
+        """Retry the refresh in the background with exponential backoff until it succeeds"""
+        delay = DISPLAY_REVALIDATE_MIN_SECONDS
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                async with self._lock:
+                    await self._rebuild(datetime.now(JAKARTA_TZ).date())
+            except Exception as e:
+                display_timeline_failures.inc()
+                delay = min(delay * 2, DISPLAY_REVALIDATE_MAX_SECONDS)
+                logger.warning(f"Display timeline revalidation failed, retrying in {delay}s: {e!r}")
+                continue
+            self.set_stale(False)
+            logger.info("Display timeline revalidated from the database")
+            return
+
+    async def _rebuild(self, today):
+        started = time.perf_counter()
+        # One extra day at the end: WITA/WIT are already on it late in Jakarta's last day (see covers)
+        first_date = today - timedelta(days=1)
+        last_date = today + timedelta(days=TIMELINE_DAYS_AHEAD + 1)
+
+        # Read before the data: an edit landing in between shows up as a newer revision later
+        revision = display_revision(await asyncio.wait_for(repo.get_revisions(), DISPLAY_DB_TIMEOUT_SECONDS))
+
+        schedules, (tvc_videos, berbuka_video, countdown_video) = await asyncio.wait_for(asyncio.gather(
+            repo.schedules_between(first_date.isoformat(), (last_date + timedelta(days=1)).isoformat()),
+            repo.display_videos(),
+        ), DISPLAY_DB_TIMEOUT_SECONDS)
+
+        # Size, hash and probed duration of every uploaded file in use
+        active_videos = [v for v in [*tvc_videos, berbuka_video, countdown_video] if v]
+        filenames = {media_filename_from_url(v.get("url")) for v in active_videos} - {None}
+        media_info = {}
+        if filenames:
+            for media in await asyncio.wait_for(repo.media_info(list(filenames)), DISPLAY_DB_TIMEOUT_SECONDS):
+                media_info[media["filename"]] = media
+
+        data = {
+            "first_date": first_date.isoformat(),
+            "last_date": last_date.isoformat(),
+            "schedules": schedules,
+            "tvc_videos": tvc_videos,
+            "berbuka_video": berbuka_video,
+            "countdown_video": countdown_video,
+            "media_info": media_info,
+        }
+        self._apply(data)
+        self.revision = revision
+        display_timeline_rebuild.observe(value=time.perf_counter() - started)
+        await run_in_threadpool(self.save_snapshot, data)
+
+    def _apply(self, data: dict):
+        """Compile the timeline from the raw data read by _rebuild (or restored from the snapshot)"""
+        schedules = data["schedules"]
+        tvc_videos = data["tvc_videos"]
+        berbuka_video = data["berbuka_video"]
+        countdown_video = data["countdown_video"]
+        media_info = data["media_info"]
+
+        berbuka_duration = berbuka_video.get("duration_seconds", 300) if berbuka_video else 300
+        berbuka_media = media_info.get(media_filename_from_url(berbuka_video.get("url"))) if berbuka_video else None
+        if berbuka_media and berbuka_media.get("duration_seconds"):
+            # Prefer the probed media length over the hand-typed duration
+            berbuka_duration = math.ceil(berbuka_media["duration_seconds"])
+            berbuka_video = {**berbuka_video, "duration_seconds": berbuka_duration}
+
+        # Content digests are identical across workers for the same data
+        media_digest = hashlib.sha1(json.dumps(
+            [tvc_videos, berbuka_video, countdown_video],
+            sort_keys=True,
+            default=str
+        ).encode('utf-8')).hexdigest()[:16]
+
+        by_location = {}
+        for schedule in schedules:
+            name = schedule.get("location") or "Bekasi"
+            by_location.setdefault(location_key(name), (name, []))[1].append(schedule)
+        locations = {
+            key: compile_location_timeline(name, location_schedules, berbuka_duration, media_digest)
+            for key, (name, location_schedules) in by_location.items()
+        }
+
+        self.media_digest = media_digest
+        self.locations = locations
+        if DISPLAY_DEFAULT_LOCATION:
+            self.default_location = DISPLAY_DEFAULT_LOCATION
+        elif len(locations) == 1:
+            self.default_location = next(iter(locations.values())).location
+        else:
+            self.default_location = "Bekasi"
+        self.media_info = media_info
+        self.tvc_videos = [TVCVideo(**v) for v in tvc_videos]
+        self.berbuka_video = BerbukaVideo(**berbuka_video) if berbuka_video else None
+        self.countdown_video = CountdownVideo(**countdown_video) if countdown_video else None
+        self.first_date = datetime.strptime(data["first_date"], "%Y-%m-%d").date()
+        self.last_date = datetime.strptime(data["last_date"], "%Y-%m-%d").date()
+        self.payloads = {}
+        self.version += 1
+        self.changed.set()
+
+    def save_snapshot(self, data: dict):
+        """
+        Write the raw timeline data to DISPLAY_SNAPSHOT_PATH (runs in the threadpool).
+        Atomic rename, so a worker booting at the same time never reads half a file.
+        """
+        if not DISPLAY_SNAPSHOT_PATH:
+            return
+        content = json.dumps({"format": DISPLAY_SNAPSHOT_FORMAT, **data}, sort_keys=True, default=str).encode('utf-8')
+        digest = hashlib.sha1(content).digest()
+        if digest == self.snapshot_digest:
+            return
+        path = Path(DISPLAY_SNAPSHOT_PATH)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.write_bytes(content)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write display snapshot {path}: {e}")
+            return
+        self.snapshot_digest = digest
+
+    async def load_snapshot(self) -> bool:
+        """Restore the timeline written by the last rebuild of any worker, without touching the database"""
+        if not DISPLAY_SNAPSHOT_PATH:
+            return False
+        path = Path(DISPLAY_SNAPSHOT_PATH)
+        try:
+            content = await run_in_threadpool(path.read_bytes)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Could not read display snapshot {path}: {e}")
+            return False
+        try:
+            data = json.loads(content)
+            if data.get("format") != DISPLAY_SNAPSHOT_FORMAT:
+                return False
+            self._apply(data)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring invalid display snapshot {path}: {e}")
+            return False
+        self.snapshot_digest = hashlib.sha1(content).digest()
+        # Until the first rebuild confirms it against the database
+        self.set_stale(True)
+        return True
+
+    def location(self, name: Optional[str] = None) -> LocationTimeline:
+        """Compiled timeline for a location; unknown locations get an empty WIB timeline (TVC only)"""
+        name = (name or "").strip() or self.default_location
+        timeline = self.locations.get(location_key(name))
+        if timeline is None:
+            timeline = LocationTimeline(location=name, timezone="WIB", tz=JAKARTA_TZ, digest=self.media_digest, days={})
+        return timeline
+
+    def state_at(self, now: datetime, timeline: LocationTimeline) -> DisplayState:
+        """`now` must be in the location's time zone"""
+        day = timeline.days.get(now.strftime("%Y-%m-%d"))
+
+        if day is None:
+            # No schedule for today, show TVC
+            return DisplayState(
+                state="tvc",
+                current_tvc_videos=self.tvc_videos,
+                berbuka_video=self.berbuka_video
+            )
+
+        now_ts = now.timestamp()
+        index = max(bisect_right(day.starts, now_ts) - 1, 0)
+        state = day.states[index]
+
+        display = DisplayState(
+            state=state,
+            subuh_time=day.subuh_time,
+            maghrib_time=day.maghrib_time,
+            location=day.location,
+            timezone=timeline.timezone,
+            current_tvc_videos=self.tvc_videos,
+            berbuka_video=self.berbuka_video,
+            # The boundaries state changes at (clamped), not the raw schedule times
+            maghrib_at=datetime.fromtimestamp(day.starts[2], timeline.tz).isoformat(),
+            berbuka_end_at=datetime.fromtimestamp(day.starts[3], timeline.tz).isoformat(),
+        )
+        if state == "countdown":
+            display.countdown_seconds = int(day.starts[2] - now_ts)
+            display.countdown_video = self.countdown_video
+        elif state == "berbuka":
+            display.berbuka_end_time = day.berbuka_end.isoformat()
+        return display
+
+    def payload_at(self, now: datetime, timeline: LocationTimeline) -> bytes:
+        """
+        DisplayState JSON for `now`, identical to state_at(...).model_dump_json().
+        Everything but countdown_seconds is fixed within a state interval, so the
+        JSON is serialized once per interval and data version and only the
+        countdown is spliced in per request.
+        """
+        date_str = now.strftime("%Y-%m-%d")
+        day = timeline.days.get(date_str)
+        index = max(bisect_right(day.starts, now.timestamp()) - 1, 0) if day else -1
+        key = (location_key(timeline.location), date_str, index)
+
+        payload = self.payloads.get(key)
+        display_payload_cache.inc("miss" if payload is None else "hit")
+        if payload is None:
+            display = self.state_at(now, timeline)
+            display.countdown_seconds = None
+            data = display.model_dump_json().encode('utf-8')
+            # countdown_seconds directly follows the state field
+            split = data.index(DISPLAY_COUNTDOWN_FIELD) + len(DISPLAY_COUNTDOWN_FIELD)
+            payload = DisplayPayload(data[:split], data[split + len(b"null"):], display.state == "countdown")
+            if len(self.payloads) >= DISPLAY_PAYLOAD_CACHE_SIZE:
+                self.payloads.clear()
+            self.payloads[key] = payload
+
+        if not payload.countdown:
+            return payload.prefix + b"null" + payload.suffix
+        countdown = int(day.starts[2] - now.timestamp())
+        return payload.prefix + str(countdown).encode('ascii') + payload.suffix
+
+    def etag(self, now: datetime, timeline: LocationTimeline) -> str:
+        """
+        Weak ETag: changes only when the location's data or its current state
+        interval changes. countdown_seconds is NOT covered: it keeps ticking
+        within the countdown interval, so a client revalidating with a 304 must
+        count down from maghrib_at (absolute, covered), not from the
+        countdown_seconds it cached.
+        """
+        date_str = now.strftime("%Y-%m-%d")
+        day = timeline.days.get(date_str)
+        index = max(bisect_right(day.starts, now.timestamp()) - 1, 0) if day else -1
+        return f'W/"{timeline.digest}-{date_str}-{index}"'
+
+    def videos_for_state(self, state: str) -> list:
+        if state == "countdown":
+            return [self.countdown_video] if self.countdown_video else []
+        if state == "berbuka":
+            return [self.berbuka_video] if self.berbuka_video else []
+        return self.tvc_videos
+
+    def media_needs(self, start: datetime, end: datetime, timeline: LocationTimeline) -> dict:
+        """Map every media URL shown in [start, end) to when it is first needed and in which states"""
+        tz = timeline.tz
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        needs = {}
+        day = start.astimezone(tz).date()
+        while True:
+            day_start = tz.localize(datetime.combine(day, datetime.min.time())).timestamp()
+            if day_start >= end_ts:
+                break
+            day_end = tz.localize(datetime.combine(day + timedelta(days=1), datetime.min.time())).timestamp()
+
+            compiled = timeline.days.get(day.isoformat())
+            if compiled:
+                intervals = zip(compiled.starts, compiled.starts[1:] + [day_end], compiled.states)
+            else:
+                intervals = [(day_start, day_end, "tvc")]
+
+            for interval_start, interval_end, state in intervals:
+                if interval_start >= interval_end or interval_end <= start_ts or interval_start >= end_ts:
+                    continue
+                first_needed = max(interval_start, start_ts)
+                for video in self.videos_for_state(state):
+                    need = needs.setdefault(video.url, {"first_needed": first_needed, "states": set()})
+                    need["first_needed"] = min(need["first_needed"], first_needed)
+                    need["states"].add(state)
+            day += timedelta(days=1)
+        return needs
+
+    def next_transition(self, now: datetime, timeline: LocationTimeline) -> float:
+        """Timestamp of the next state boundary, or the next local midnight if none is left today"""
+        day = timeline.days.get(now.strftime("%Y-%m-%d"))
+        now_ts = now.timestamp()
+        if day is not None:
+            index = bisect_right(day.starts, now_ts)
+            if index < len(day.starts):
+                return day.starts[index]
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return timeline.tz.localize(tomorrow).timestamp()
+
+display_timeline = DisplayTimeline()
+
+async def resolve_display_location(location: Optional[str]) -> tuple:
+    """(LocationTimeline, current time in its time zone) for a screen's ?location="""
+    await display_timeline.ensure()
+    timeline = display_timeline.location(location)
+    return timeline, datetime.now(timeline.tz)
+
+# ============ DISPLAY STREAM (SERVER PUSH) ============
+
+class DisplayHub:
+    """
+    Fan-out hub for /display-stream subscribers, grouped by location.
+    Every client gets a small bounded queue; when a slow client falls behind
+    the oldest message is dropped, since only the latest state matters.
+    """
+
+    def __init__(self):
+        self.subscribers = {}  # location_key -> set of queues
+        self.last_etags = {}  # location_key -> ETag of the last published state
+        self.wake = asyncio.Event()
+
+    def subscribe(self, location: str, etag: Optional[str] = None) -> asyncio.Queue:
+        """`etag`: the state the subscriber already has, so it is not published again"""
+        key = location_key(location)
+        queue = asyncio.Queue(maxsize=DISPLAY_STREAM_QUEUE_SIZE)
+        display_subscribers.inc()
+        if key not in self.subscribers:
+            self.subscribers[key] = set()
+            if etag:
+                self.last_etags[key] = etag
+            # The hub has to start tracking this location's transitions
+            self.wake.set()
+        self.subscribers[key].add(queue)
+        return queue
+
+    def unsubscribe(self, location: str, queue: asyncio.Queue):
+        key = location_key(location)
+        queues = self.subscribers.get(key)
+        if queues is None or queue not in queues:
+            return
+        display_subscribers.dec()
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[key]
+            self.last_etags.pop(key, None)
+
+    def publish(self, location: str, message: str):
+        for queue in self.subscribers.get(location_key(location), ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def publish_changes(self) -> Optional[float]:
+        """Publish to every watched location whose state changed; returns the next transition timestamp"""
+        next_wake = None
+        for key in list(self.subscribers):
+            timeline = display_timeline.location(key)
+            now = datetime.now(timeline.tz)
+            etag = display_timeline.etag(now, timeline)
+            if self.last_etags.get(key) != etag:
+                self.last_etags[key] = etag
+                self.publish(key, display_timeline.payload_at(now, timeline).decode('utf-8'))
+            transition = display_timeline.next_transition(now, timeline)
+            next_wake = transition if next_wake is None else min(next_wake, transition)
+        return next_wake
+
+    async def run(self):
+        """Push the current state on every timeline transition and every admin edit"""
+        while True:
+            try:
+                await display_timeline.ensure()
+                display_timeline.changed.clear()
+                self.wake.clear()
+                next_wake = self.publish_changes()
+                timeout = None if next_wake is None else max(next_wake - time.time(), 0) + 0.5
+                waiters = [
+                    asyncio.ensure_future(display_timeline.changed.wait()),
+                    asyncio.ensure_future(self.wake.wait()),
+                ]
+                try:
+                    await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Display stream update failed")
+                await asyncio.sleep(5)
+
+display_hub = DisplayHub()
+
+def format_sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+@api_router.get("/display-stream")
+async def display_stream(location: Optional[str] = None):
+    """Server-Sent Events: current state on connect, then only transitions and admin edits"""
+    timeline, now = await resolve_display_location(location)
+    initial = display_timeline.payload_at(now, timeline).decode('utf-8')
+    queue = display_hub.subscribe(timeline.location, display_timeline.etag(now, timeline))
+
+    async def events():
+        try:
+            yield format_sse("state", initial)
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=DISPLAY_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Heartbeat keeps proxies from closing idle connections
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse("state", message)
+        finally:
+            display_hub.unsubscribe(timeline.location, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ============ DISPLAY MANIFEST (PREFETCH) ============
+
+# Recent manifest versions (version -> {url: sha256}) kept for incremental diffs.
+# The version is a content hash, the same on every worker, but this history is
+# per worker: a ?since= this worker never served (another worker, a restart)
+# gets the full manifest, which is always a correct answer.
+manifest_versions = OrderedDict()
+
+@api_router.get("/display-manifest", response_model=DisplayManifest)
+async def get_display_manifest(
+    response: Response,
+    hours: int = Query(24, ge=1, le=DISPLAY_MANIFEST_MAX_HOURS),
+    since: Optional[str] = None,
+    location: Optional[str] = None
+):
+    """
+    Semua media yang dibutuhkan layar dalam `hours` jam ke depan, beserta ukuran,
+    hash, dan kapan pertama kali dibutuhkan, supaya bisa di-cache saat jam TVC.
+    Dengan ?since=<version> hanya perubahan sejak versi itu yang dikirim (full=false);
+    versi yang tidak dikenal worker ini dijawab dengan manifest lengkap.
+    """
+    timeline, now = await resolve_display_location(location)
+    window_end = now + timedelta(hours=hours)
+    if display_timeline.stale:
+        response.headers["X-Display-Stale"] = "1"
+
+    items = []
+    for url, need in display_timeline.media_needs(now, window_end, timeline).items():
+        media = display_timeline.media_info.get(media_filename_from_url(url), {})
+        items.append(ManifestItem(
+            url=url,
+            size=media.get("size"),
+            sha256=media.get("sha256"),
+            first_needed_at=datetime.fromtimestamp(need["first_needed"], timeline.tz).isoformat(),
+            states=sorted(need["states"])
+        ))
+    items.sort(key=lambda item: (item.first_needed_at, item.url))
+
+    current = {item.url: item.sha256 for item in items}
+    version = hashlib.sha1(json.dumps(current, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    manifest_versions[version] = current
+    manifest_versions.move_to_end(version)
+    while len(manifest_versions) > DISPLAY_MANIFEST_HISTORY:
+        manifest_versions.popitem(last=False)
+
+    manifest = DisplayManifest(
+        version=version,
+        window_start=now.isoformat(),
+        window_end=window_end.isoformat(),
+        items=items
+    )
+    previous = manifest_versions.get(since) if since else None
+    if previous is not None:
+        manifest.full = False
+        manifest.items = [item for item in items if item.url not in previous or previous[item.url] != item.sha256]
+        manifest.removed = [url for url in previous if url not in current]
+    return manifest
+
 # ============ DISPLAY STATE ENDPOINT ============
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses the weak comparison: a W/ added by a compressing proxy still matches"""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") in (opaque, "*") for tag in if_none_match.split(","))
+
 @api_router.get("/display-state", response_model=DisplayState)
-async def get_display_state():
+async def get_display_state(
+    wait: int = Query(0, ge=0),
+    location: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
     """
     Flow baru:
     1. Subuh -> Maghrib: Countdown saja (tanpa video)
     2. Maghrib -> (Maghrib + durasi berbuka): Video Berbuka saja (tanpa tulisan)
     3. Setelah Berbuka selesai: Video TVC looping
+
+    Layar memilih lokasinya dengan ?location= (jadwal dan zona waktu WIB/WITA/WIT per lokasi).
+    Mendukung If-None-Match (304 Not Modified) dan long-poll dengan ?wait=detik:
+    request ditahan sampai state berubah atau timeout.
+    Saat database lambat atau mati, jawaban dihitung dari jadwal terakhir yang
+    berhasil dimuat dan diberi header X-Display-Stale: 1.
+    ETag tidak ikut berubah dengan countdown_seconds: setelah 304, hitung
+    mundur dari maghrib_at, bukan dari countdown_seconds yang tersimpan.
     """
-    now = datetime.now(JAKARTA_TZ)
-    today_str = now.strftime("%Y-%m-%d")
-    
-    # Get today's schedule
-    schedule = await db.maghrib_schedules.find_one({"date": today_str}, {"_id": 0})
-    
-    # Get active TVC videos
-    tvc_videos = await db.tvc_videos.find({"is_active": True}, {"_id": 0}).sort("order", 1).to_list(100)
-    
-    # Get active berbuka video
-    berbuka_video = await db.berbuka_videos.find_one({"is_active": True}, {"_id": 0})
-    
-    if not schedule:
-        # No schedule for today, show TVC
-        return DisplayState(
-            state="tvc",
-            current_tvc_videos=[TVCVideo(**v) for v in tvc_videos],
-            berbuka_video=BerbukaVideo(**berbuka_video) if berbuka_video else None
-        )
-    
-    location = schedule.get("location", "Bekasi")
-    subuh_time_str = schedule.get("subuh_time", "04:30")
-    maghrib_time_str = schedule["maghrib_time"]
-    
-    # Parse times
-    subuh_hour, subuh_minute = map(int, subuh_time_str.split(":"))
-    maghrib_hour, maghrib_minute = map(int, maghrib_time_str.split(":"))
-    
-    # Create datetime objects for today
-    subuh_dt = now.replace(hour=subuh_hour, minute=subuh_minute, second=0, microsecond=0)
-    maghrib_dt = now.replace(hour=maghrib_hour, minute=maghrib_minute, second=0, microsecond=0)
-    
-    # Calculate berbuka end time based on video duration
-    berbuka_duration = berbuka_video.get("duration_seconds", 300) if berbuka_video else 300
-    berbuka_end = maghrib_dt + timedelta(seconds=berbuka_duration)
-    
-    # Determine current state based on new flow
-    if now < subuh_dt:
-        # Before subuh - show TVC
-        return DisplayState(
-            state="tvc",
-            subuh_time=subuh_time_str,
-            maghrib_time=maghrib_time_str,
-            location=location,
-            current_tvc_videos=[TVCVideo(**v) for v in tvc_videos],
-            berbuka_video=BerbukaVideo(**berbuka_video) if berbuka_video else None
+    timeline, now = await resolve_display_location(location)
+    etag = display_timeline.etag(now, timeline)
+
+    if wait and etag_matches(if_none_match, etag):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(wait, DISPLAY_LONG_POLL_MAX_SECONDS)
+        queue = display_hub.subscribe(timeline.location, etag)
+        try:
+            while etag_matches(if_none_match, etag) and loop.time() < deadline:
+                try:
+                    await asyncio.wait_for(queue.get(), timeout=deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                timeline, now = await resolve_display_location(location)
+                etag = display_timeline.etag(now, timeline)
+        finally:
+            display_hub.unsubscribe(timeline.location, queue)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if display_timeline.stale:
+        # The last good timeline while the database is unreachable; countdowns still run from it
+        headers["X-Display-Stale"] = "1"
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    # Pre-serialized JSON; skips building and re-validating DisplayState per request
+    return Response(
+        content=display_timeline.payload_at(now, timeline),
+        media_type="application/json",
+        headers=headers
+    )
+
+# ============ TIME SYNC ============
+
+@api_router.get("/time")
+async def get_server_time(t0: Optional[float] = None):
+    """
+    One NTP-style exchange: the client sends its clock as ?t0= (epoch ms) and
+    notes t3 when the answer arrives; t1/t2 are the server clock on receipt and
+    reply (epoch ms, microsecond resolution). Offset = ((t1 - t0) + (t2 - t3)) / 2,
+    round trip = (t3 - t0) - (t2 - t1); the sample with the smallest round trip
+    is the most accurate. Hand-written JSON keeps this cheap enough to poll.
+    """
+    t1 = time.time_ns() / 1e6
+    echo = "null" if t0 is None or not math.isfinite(t0) else repr(t0)
+    t2 = time.time_ns() / 1e6
+    return Response(
+        content=f'{{"t0":{echo},"t1":{t1:.3f},"t2":{t2:.3f}}}',
+        media_type="application/json",
+        headers={"Cache-Control": "no-store"}
+    )
+
+# ============ SCREEN FLEET (HEARTBEATS) ============
+
+class ScreenFleet:
+    """
+    Latest heartbeat of every screen, kept in memory, plus the heartbeats
+    waiting to be written. Recording one is a dict update; the buffer goes to
+    storage in batched inserts every SCREEN_HEARTBEAT_FLUSH_SECONDS, so the
+    database sees a handful of writes per interval whatever the screen count.
+    Each worker only knows the screens that reported to it.
+    """
+
+    def __init__(self):
+        self.screens = {}  # screen_id -> latest status (ScreenStatus fields, plus seen_at: monotonic time)
+        self.pending = deque(maxlen=SCREEN_HEARTBEAT_BUFFER_MAX)
+        self.pruned_at = None
+
+    def record(self, heartbeat: ScreenHeartbeat):
+        received = datetime.now(timezone.utc)
+        received_at = received.isoformat()
+        drift = None
+        if heartbeat.client_time is not None:
+            drift = heartbeat.client_time - int(received.timestamp() * 1000)
+
+        status = self.screens.get(heartbeat.screen_id)
+        if status is None:
+            if len(self.screens) >= SCREEN_FLEET_MAX:
+                self.forget_idle()
+                if len(self.screens) >= SCREEN_FLEET_MAX:
+                    raise HTTPException(status_code=503, detail="Terlalu banyak layar terdaftar")
+            status = self.screens[heartbeat.screen_id] = {
+                "screen_id": heartbeat.screen_id, "first_seen": received_at, "heartbeats": 0
+            }
+        status.update(
+            location=heartbeat.location,
+            state=heartbeat.state,
+            video_url=heartbeat.video_url,
+            buffered_seconds=heartbeat.buffered_seconds,
+            stalls=heartbeat.stalls,
+            clock_drift_ms=drift,
+            last_seen=received_at,
+            seen_at=time.monotonic(),
+            heartbeats=status["heartbeats"] + 1,
         )
-    elif now < maghrib_dt:
-        # From Subuh to Maghrib - show COUNTDOWN with optional video
-        seconds_remaining = int((maghrib_dt - now).total_seconds())
-        
-        # Get active countdown video
-        countdown_video = await db.countdown_videos.find_one({"is_active": True}, {"_id": 0})
-        
-        return DisplayState(
-            state="countdown",
-            countdown_seconds=seconds_remaining,
-            subuh_time=subuh_time_str,
-            maghrib_time=maghrib_time_str,
-            location=location,
-            current_tvc_videos=[TVCVideo(**v) for v in tvc_videos],
-            berbuka_video=BerbukaVideo(**berbuka_video) if berbuka_video else None,
-            countdown_video=CountdownVideo(**countdown_video) if countdown_video else None
+
+        if len(self.pending) == self.pending.maxlen:
+            screen_heartbeats_dropped.inc()
+        self.pending.append({
+            "screen_id": heartbeat.screen_id,
+            "location": heartbeat.location,
+            "state": heartbeat.state,
+            "video_url": heartbeat.video_url,
+            "buffered_seconds": heartbeat.buffered_seconds,
+            "stalls": heartbeat.stalls,
+            "clock_drift_ms": drift,
+            "received_at": received_at,
+        })
+        screen_heartbeats.inc()
+        screen_heartbeats_pending.set(value=len(self.pending))
+
+    def forget_idle(self):
+        cutoff = time.monotonic() - SCREEN_FORGET_HOURS * 3600
+        for screen_id in [s for s, status in self.screens.items() if status["seen_at"] < cutoff]:
+            del self.screens[screen_id]
+
+    def status(self, location: Optional[str] = None) -> FleetStatus:
+        offline_before = time.monotonic() - SCREEN_OFFLINE_SECONDS
+        screens = [
+            ScreenStatus(**status, online=status["seen_at"] >= offline_before)
+            for _, status in sorted(self.screens.items())
+            if location is None or location_key(status["location"] or "") == location_key(location)
+        ]
+        online = sum(1 for screen in screens if screen.online)
+        return FleetStatus(
+            online=online, offline=len(screens) - online, pending_writes=len(self.pending), screens=screens
         )
-    elif now < berbuka_end:
-        # From Maghrib to berbuka_end - show BERBUKA VIDEO only (no text)
-        return DisplayState(
-            state="berbuka",
-            subuh_time=subuh_time_str,
-            maghrib_time=maghrib_time_str,
-            location=location,
-            current_tvc_videos=[TVCVideo(**v) for v in tvc_videos],
-            berbuka_video=BerbukaVideo(**berbuka_video) if berbuka_video else None,
-            berbuka_end_time=berbuka_end.isoformat()
+
+    async def flush(self):
+        """Write everything buffered; on failure it goes back in front of newer heartbeats"""
+        if not self.pending:
+            return
+        batch, self.pending = list(self.pending), deque(maxlen=SCREEN_HEARTBEAT_BUFFER_MAX)
+        written = 0
+        try:
+            while written < len(batch):
+                chunk = batch[written:written + SCREEN_HEARTBEAT_BATCH_SIZE]
+                started = time.perf_counter()
+                await repo.insert_heartbeats(chunk)
+                screen_heartbeat_flush.observe(value=time.perf_counter() - started)
+                written += len(chunk)
+        except Exception:
+            unwritten = batch[written:] + list(self.pending)
+            self.pending = deque(unwritten, maxlen=SCREEN_HEARTBEAT_BUFFER_MAX)
+            screen_heartbeats_dropped.inc(amount=len(unwritten) - len(self.pending))
+            raise
+        finally:
+            screen_heartbeats_pending.set(value=len(self.pending))
+
+    async def prune(self):
+        """Drop stored heartbeats past retention, at most once an hour"""
+        if self.pruned_at is not None and time.monotonic() - self.pruned_at < 3600:
+            return
+        self.pruned_at = time.monotonic()
+        cutoff = datetime.now(timezone.utc) - timedelta(days=SCREEN_HEARTBEAT_RETENTION_DAYS)
+        removed = await repo.delete_heartbeats_before(cutoff.isoformat())
+        if removed:
+            logger.info(f"Pruned {removed} screen heartbeats older than {SCREEN_HEARTBEAT_RETENTION_DAYS} days")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(SCREEN_HEARTBEAT_FLUSH_SECONDS)
+            try:
+                await self.flush()
+                self.forget_idle()
+                await self.prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Screen heartbeat write failed, {len(self.pending)} kept for the next attempt: {e}")
+
+screen_fleet = ScreenFleet()
+
+@api_router.post("/screens/heartbeat", status_code=204)
+async def screen_heartbeat(heartbeat: ScreenHeartbeat):
+    """Dikirim layar secara berkala: state, video yang diputar, buffer dan jam layar"""
+    screen_fleet.record(heartbeat)
+    return Response(status_code=204)
+
+@api_router.get("/admin/screens", response_model=FleetStatus)
+async def get_screen_fleet(location: Optional[str] = None, username: str = Depends(verify_token)):
+    """Status layar dari memori worker ini (tanpa query ke database)"""
+    return screen_fleet.status(location)
+
+# ============ PROOF-OF-PLAY ============
+
+# Rollup counter incremented by each event kind
+PLAY_EVENT_COUNTS = dict(zip(("start", "complete", "skipped"), PLAY_COUNTS))
+
+def _rollup_rows(rollup: dict, period: str) -> List[dict]:
+    return [
+        {period: key, "video_id": video_id, "screen_id": screen_id, **{c: counts[c] for c in PLAY_COUNTS}}
+        for (key, video_id, screen_id), counts in rollup.items()
+    ]
+
+class PlayLog:
+    """
+    TVC playback events (start, complete, skipped) from the screens. An
+    incoming batch only touches memory: the events are buffered and their
+    hourly and daily rollup increments summed per (period, video, screen).
+    Every PLAY_LOG_FLUSH_SECONDS the events and the summed increments are
+    written in one batch, so reports read small pre-aggregated rollups and
+    never the raw events. Hours and dates are local to the screen's location
+    (WIB/WITA/WIT), corrected for the clock drift its heartbeats report.
+
+    Rollups outlive the raw events (PLAY_EVENT_RETENTION_DAYS) and are never
+    dropped from memory while storage is down; only the raw buffer is bounded.
+    A batch that failed to write is retried as is, under the same id, before
+    anything newer: the repository applies each batch id once, so a retry
+    after a partial write does not count those plays twice.
+    """
+
+    def __init__(self):
+        self.pending = deque(maxlen=PLAY_EVENT_BUFFER_MAX)
+        self.hourly = {}  # (YYYY-MM-DDTHH, video_id, screen_id) -> Counter of PLAY_COUNTS
+        self.daily = {}  # (YYYY-MM-DD, video_id, screen_id) -> Counter of PLAY_COUNTS
+        self.unwritten = None  # (batch_id, events, hourly rows, daily rows) of the batch that failed
+        self.pruned_at = None
+
+    def record(self, batch: PlayEventBatch) -> int:
+        now_ms = int(time.time() * 1000)
+        oldest_ms = now_ms - PLAY_EVENT_MAX_AGE_HOURS * 3600 * 1000
+        drift = (screen_fleet.screens.get(batch.screen_id) or {}).get("clock_drift_ms") or 0
+        timeline = display_timeline.location(batch.location)
+        accepted = 0
+        for event in batch.events:
+            played_ms = now_ms if event.played_at is None else event.played_at - drift
+            if not oldest_ms <= played_ms <= now_ms + 60 * 1000:
+                play_events_rejected.inc()
+                continue
+            played = datetime.fromtimestamp(played_ms / 1000, timeline.tz)
+            hour = played.strftime("%Y-%m-%dT%H")
+            count = PLAY_EVENT_COUNTS[event.event]
+            self.hourly.setdefault((hour, event.video_id, batch.screen_id), Counter())[count] += 1
+            self.daily.setdefault((hour[:10], event.video_id, batch.screen_id), Counter())[count] += 1
+
+            if len(self.pending) == self.pending.maxlen:
+                play_events_dropped.inc()
+            self.pending.append({
+                "screen_id": batch.screen_id,
+                "hour": hour,
+                "location": timeline.location,
+                "video_id": event.video_id,
+                "event": event.event,
+                "played_at": played.isoformat(),
+            })
+            play_events.inc(event.event)
+            accepted += 1
+        play_events_pending.set(value=len(self.pending))
+        return accepted
+
+    @property
+    def buffered(self) -> int:
+        return len(self.pending) + (len(self.unwritten[1]) if self.unwritten else 0)
+
+    async def flush(self):
+        """Retry the batch that failed last time, if any, then write the buffer as a new batch"""
+        while True:
+            if self.unwritten is None:
+                if not self.pending and not self.hourly:
+                    return
+                self.unwritten = (
+                    uuid.uuid4().hex,
+                    list(self.pending),
+                    _rollup_rows(self.hourly, "hour"),
+                    _rollup_rows(self.daily, "date"),
+                )
+                self.pending = deque(maxlen=PLAY_EVENT_BUFFER_MAX)
+                self.hourly, self.daily = {}, {}
+            started = time.perf_counter()
+            try:
+                await repo.record_plays(*self.unwritten)
+                self.unwritten = None
+            finally:
+                play_events_pending.set(value=self.buffered)
+            play_log_flush.observe(value=time.perf_counter() - started)
+
+    async def prune(self):
+        """
+        Drop raw events past retention and the batch ids too old to be retried
+        (events are only accepted for PLAY_EVENT_MAX_AGE_HOURS), at most once an
+        hour; rollups are kept
+        """
+        if self.pruned_at is not None and time.monotonic() - self.pruned_at < 3600:
+            return
+        self.pruned_at = time.monotonic()
+        now = datetime.now(JAKARTA_TZ)
+        removed = await repo.prune_plays(
+            (now - timedelta(days=PLAY_EVENT_RETENTION_DAYS)).strftime("%Y-%m-%dT%H"),
+            (now - timedelta(hours=PLAY_EVENT_MAX_AGE_HOURS + 24)).strftime("%Y-%m-%dT%H"),
         )
+        if removed:
+            logger.info(f"Pruned {removed} play event buckets older than {PLAY_EVENT_RETENTION_DAYS} days")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(PLAY_LOG_FLUSH_SECONDS)
+            try:
+                await self.flush()
+                await self.prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Play log write failed, {self.buffered} events kept for the next attempt: {e}")
+
+play_log = PlayLog()
+
+@api_router.post("/screens/plays")
+async def record_play_events(batch: PlayEventBatch):
+    """Event pemutaran video TVC dari layar (start, complete, skipped), dikirim per batch"""
+    return {"accepted": play_log.record(batch)}
+
+@api_router.get("/reports/plays", response_model=PlayReport, response_model_exclude_none=True)
+async def get_play_report(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    granularity: str = Query("day", pattern="^(day|hour)$"),
+    video_id: Optional[str] = None,
+    screen_id: Optional[str] = None,
+    per_screen: bool = False,
+    username: str = Depends(verify_token)
+):
+    """
+    Jumlah pemutaran TVC (start, complete, skipped) per hari atau per jam
+    (?granularity=hour), per video, dan per layar dengan ?per_screen=true atau
+    ?screen_id=. Rentang ?from=&to= (YYYY-MM-DD, inklusif, default 30 hari
+    terakhir). Dibaca dari rollup saja; event beberapa detik terakhir bisa
+    belum masuk.
+    """
+    validate_schedule_date(date_from, "from")
+    validate_schedule_date(date_to, "to")
+    today = datetime.now(JAKARTA_TZ).date()
+    last = datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else today
+    first = datetime.strptime(date_from, "%Y-%m-%d").date() if date_from else last - timedelta(days=29)
+    if first > last:
+        raise HTTPException(status_code=400, detail="Parameter from harus sebelum to")
+    if (last - first).days >= PLAY_REPORT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Rentang laporan maksimal {PLAY_REPORT_MAX_DAYS} hari")
+
+    start, end = first.isoformat(), last.isoformat()
+    if granularity == "hour":
+        rows = await repo.play_report("hour", f"{start}T00", f"{end}T23", per_screen or screen_id is not None,
+                                      video_id=video_id, screen_id=screen_id)
     else:
-        # After berbuka ends - show TVC videos
-        return DisplayState(
-            state="tvc",
-            subuh_time=subuh_time_str,
-            maghrib_time=maghrib_time_str,
-            location=location,
-            current_tvc_videos=[TVCVideo(**v) for v in tvc_videos],
-            berbuka_video=BerbukaVideo(**berbuka_video) if berbuka_video else None
-        )
+        rows = await repo.play_report("date", start, end, per_screen or screen_id is not None,
+                                      video_id=video_id, screen_id=screen_id)
+    return PlayReport(granularity=granularity, start=start, end=end, rows=rows)
+
+# ============ ADMIN DIAGNOSTICS ============
+
+@api_router.get("/admin/index-report")
+async def get_index_report(username: str = Depends(verify_token)):
+    """Explain every hot query and flag collection scans"""
+    report = await repo.explain_hot_queries()
+    return {
+        "collection_scans": sum(1 for entry in report if entry["collection_scan"]),
+        "queries": report
+    }
 
 # ============ ROOT ENDPOINT ============
 
@@ -617,19 +3113,66 @@ async def get_display_state():
 async def root():
     return {"message": "Frestea Ramadan Countdown API"}
 
+# ============ METRICS ENDPOINT ============
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus text format; scrape each worker directly (not routed through /api)"""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return Response(content=registry.render(), media_type=metrics.CONTENT_TYPE)
+
+class MetricsMiddleware:
+    """Plain ASGI middleware (no BaseHTTPMiddleware overhead, streams pass through untouched)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.dec()
+            # The router stores the matched route in the scope; label by template to bound cardinality
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_requests.inc(route, scope["method"], status)
+            http_request_duration.observe(route, scope["method"], value=time.perf_counter() - started)
+
+async def monitor_event_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + 1
+        await asyncio.sleep(1)
+        event_loop_lag.observe(value=max(loop.time() - expected, 0))
+
 # Include the router in the main app
 app.include_router(api_router)
 
-# Serve uploaded videos
-app.mount("/api/videos", StaticFiles(directory=str(UPLOAD_DIR)), name="videos")
-
+# Innermost, so its 413 still gets the CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Display-Stale"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Configure logging
 logging.basicConfig(
@@ -637,7 +3180,3 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
@@ -0,0 +1,754 @@
+"""
+Embedded SQLite storage for single-box deployments (STORAGE_BACKEND=sqlite).
+
+One local file and no external service. The database runs in WAL mode, so
+reads never wait for the writer. Writes are serialised on one connection in
+a dedicated thread, one transaction per repository call. Reads use a small
+pool of threads with a connection each. All SQL is constant text with ?
+parameters, so sqlite3's per-connection statement cache prepares each query
+once. Every model field has its own column, and the tables carry the same
+indexes as the Mongo collections.
+
+NULL columns are left out of returned documents, like fields missing from
+a Mongo document, so the pydantic defaults apply the same way.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from repository import PLAY_COUNTS, SCHEDULE_FIELDS, VIDEO_COLLECTIONS, DuplicateError, ListQuery, Repository
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip when streaming a listing
+LIST_CHUNK_ROWS = 500
+
+# Seconds a connection waits for another process's write lock (uvicorn workers share the file)
+BUSY_TIMEOUT_SECONDS = 10
+
+# ============ SCHEMA ============
+
+COLUMNS = {
+    "admin_users": ("id", "username", "password_hash", "created_at", "tokens_valid_after"),
+    "tvc_videos": ("id", "name", "url", "order", "is_active", "created_at"),
+    "berbuka_videos": ("id", "name", "url", "duration_seconds", "is_active", "created_at"),
+    "countdown_videos": ("id", "name", "url", "duration_minutes", "is_active", "created_at"),
+    "maghrib_schedules": ("id", "date", "subuh_time", "maghrib_time", "location", "timezone", "created_at"),
+    "media_files": (
+        "id", "filename", "sha256", "size", "content_type", "original_name", "ref_count",
+        "container", "duration_seconds", "width", "height", "bitrate", "faststart", "probed_at", "probe_error",
+        "created_at",
+    ),
+    "upload_sessions": ("id", "filename", "content_type", "size", "sha256", "created_at"),
+    "screen_heartbeats": (
+        "screen_id", "location", "state", "video_url", "buffered_seconds", "stalls", "clock_drift_ms", "received_at",
+    ),
+    "play_events": ("screen_id", "hour", "location", "video_id", "event", "played_at"),
+}
+
+BOOLEAN_COLUMNS = {"is_active", "faststart"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS admin_users (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    created_at TEXT,
+    tokens_valid_after INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS tvc_videos (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    "order" INTEGER NOT NULL DEFAULT 0,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS tvc_videos_active_order ON tvc_videos (is_active, "order");
+CREATE INDEX IF NOT EXISTS tvc_videos_order_id ON tvc_videos ("order", id);
+
+CREATE TABLE IF NOT EXISTS berbuka_videos (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    duration_seconds INTEGER NOT NULL DEFAULT 300,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS berbuka_videos_active ON berbuka_videos (is_active);
+CREATE INDEX IF NOT EXISTS berbuka_videos_created_id ON berbuka_videos (created_at, id);
+
+CREATE TABLE IF NOT EXISTS countdown_videos (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    duration_minutes INTEGER NOT NULL DEFAULT 5,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS countdown_videos_active ON countdown_videos (is_active);
+CREATE INDEX IF NOT EXISTS countdown_videos_created_id ON countdown_videos (created_at, id);
+
+CREATE TABLE IF NOT EXISTS maghrib_schedules (
+    id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    subuh_time TEXT,
+    maghrib_time TEXT NOT NULL,
+    location TEXT NOT NULL DEFAULT 'Bekasi',
+    timezone TEXT NOT NULL DEFAULT 'WIB',
+    created_at TEXT,
+    UNIQUE (location, date)
+);
+CREATE INDEX IF NOT EXISTS maghrib_schedules_date_location ON maghrib_schedules (date, location);
+
+CREATE TABLE IF NOT EXISTS media_files (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    sha256 TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    content_type TEXT,
+    original_name TEXT,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    container TEXT,
+    duration_seconds REAL,
+    width INTEGER,
+    height INTEGER,
+    bitrate INTEGER,
+    faststart INTEGER,
+    probed_at TEXT,
+    probe_error TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS media_files_unprobed ON media_files (filename) WHERE probed_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT,
+    created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS screen_heartbeats (
+    screen_id TEXT NOT NULL,
+    location TEXT,
+    state TEXT NOT NULL,
+    video_url TEXT,
+    buffered_seconds REAL,
+    stalls INTEGER NOT NULL DEFAULT 0,
+    clock_drift_ms INTEGER,
+    received_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS screen_heartbeats_received ON screen_heartbeats (received_at);
+CREATE INDEX IF NOT EXISTS screen_heartbeats_screen_received ON screen_heartbeats (screen_id, received_at);
+
+CREATE TABLE IF NOT EXISTS play_events (
+    screen_id TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    location TEXT,
+    video_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    played_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS play_events_hour_screen ON play_events (hour, screen_id);
+
+CREATE TABLE IF NOT EXISTS play_rollups_hourly (
+    hour TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    screen_id TEXT NOT NULL,
+    starts INTEGER NOT NULL DEFAULT 0,
+    completes INTEGER NOT NULL DEFAULT 0,
+    skips INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, video_id, screen_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS play_rollups_hourly_screen ON play_rollups_hourly (screen_id, hour);
+CREATE INDEX IF NOT EXISTS play_rollups_hourly_video ON play_rollups_hourly (video_id, hour);
+
+CREATE TABLE IF NOT EXISTS play_rollups_daily (
+    date TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    screen_id TEXT NOT NULL,
+    starts INTEGER NOT NULL DEFAULT 0,
+    completes INTEGER NOT NULL DEFAULT 0,
+    skips INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (date, video_id, screen_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS play_rollups_daily_screen ON play_rollups_daily (screen_id, date);
+CREATE INDEX IF NOT EXISTS play_rollups_daily_video ON play_rollups_daily (video_id, date);
+
+CREATE TABLE IF NOT EXISTS play_batches (
+    id TEXT PRIMARY KEY,
+    hour TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS play_batches_hour ON play_batches (hour);
+
+CREATE TABLE IF NOT EXISTS admin_revisions (
+    section TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Hot queries checked by the index report: (table, where, parameters, order by)
+HOT_QUERIES = [
+    ("maghrib_schedules", "location = ? AND date = ?", ("x", "2026-01-01"), None),
+    ("maghrib_schedules", "date BETWEEN ? AND ?", ("2026-01-01", "2026-01-08"), None),
+    ("maghrib_schedules", None, (), "date, location"),
+    ("maghrib_schedules", "location = ?", ("x",), "date, location"),
+    ("maghrib_schedules", "id = ?", ("x",), None),
+    ("tvc_videos", "is_active = 1", (), '"order"'),
+    ("tvc_videos", None, (), '"order", id'),
+    ("tvc_videos", "id = ?", ("x",), None),
+    ("berbuka_videos", "is_active = 1", (), None),
+    ("berbuka_videos", None, (), "created_at, id"),
+    ("berbuka_videos", "id = ?", ("x",), None),
+    ("countdown_videos", "is_active = 1", (), None),
+    ("countdown_videos", None, (), "created_at, id"),
+    ("countdown_videos", "id = ?", ("x",), None),
+    ("admin_users", "username = ?", ("x",), None),
+    ("admin_users", "id = ?", ("x",), None),
+    ("media_files", "filename = ?", ("x",), None),
+    ("media_files", "sha256 = ?", ("x",), None),
+]
+
+# Rollup tables by report period column
+PLAY_ROLLUP_TABLES = {"hour": "play_rollups_hourly", "date": "play_rollups_daily"}
+
+def _create_schema(connection):
+    connection.executescript(SCHEMA)
+
+def _document(cursor, row) -> dict:
+    """Row factory: column -> value, skipping NULLs and turning 0/1 flags back into booleans"""
+    doc = {}
+    for (name, *_), value in zip(cursor.description, row):
+        if value is None:
+            continue
+        doc[name] = bool(value) if name in BOOLEAN_COLUMNS else value
+    return doc
+
+def _quote(table: str, column: str) -> str:
+    if column not in COLUMNS[table]:
+        raise ValueError(f"Unknown column {table}.{column}")
+    return f'"{column}"'
+
+def _assignments(table: str, fields: dict) -> str:
+    return ", ".join(f"{_quote(table, column)} = ?" for column in fields)
+
+def _insert_sql(table: str, doc: dict, verb: str = "INSERT") -> tuple:
+    columns = [column for column in COLUMNS[table] if column in doc]
+    sql = f"{verb} INTO {table} ({', '.join(_quote(table, c) for c in columns)}) VALUES ({', '.join('?' * len(columns))})"
+    return sql, [doc[column] for column in columns]
+
+def _list_where(query: ListQuery, after: Optional[tuple], upto: Optional[tuple]) -> tuple:
+    table = query.collection
+    clauses, params = [], []
+    for column, value in query.equals.items():
+        clauses.append(f"{_quote(table, column)} = ?")
+        params.append(value)
+    for column, (low, high) in query.ranges.items():
+        if low is not None:
+            clauses.append(f"{_quote(table, column)} >= ?")
+            params.append(low)
+        if high is not None:
+            clauses.append(f"{_quote(table, column)} <= ?")
+            params.append(high)
+    key = "(" + ", ".join(_quote(table, column) for column in query.sort_fields) + ")"
+    marks = "(" + ", ".join("?" * len(query.sort_fields)) + ")"
+    if after is not None:
+        clauses.append(f"{key} > {marks}")
+        params.extend(after)
+    if upto is not None:
+        clauses.append(f"{key} <= {marks}")
+        params.extend(upto)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def _order_by(query: ListQuery) -> str:
+    return " ORDER BY " + ", ".join(_quote(query.collection, column) for column in query.sort_fields)
+
+class SQLiteRepository(Repository):
+    name = "sqlite"
+
+    def __init__(self, path: str, readers: int = 4):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._read_pool = ThreadPoolExecutor(max_workers=max(readers, 1), thread_name_prefix="sqlite-read")
+        self._write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-write")
+        # Tables exist before the first query, like Mongo collections, even if startup hasn't run yet
+        self._write_pool.submit(self._call, _create_schema, (), False).result()
+
+    # ---- Connections and threads ----
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection; each pool thread opens its own"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=BUSY_TIMEOUT_SECONDS,
+                isolation_level=None,  # Autocommit; writes open their own transaction
+                check_same_thread=False,  # Only so close() can run from the event loop thread
+                cached_statements=256,
+            )
+            connection.row_factory = _document
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA temp_store = MEMORY")
+            self._local.connection = connection
+            self._connections.append(connection)
+        return connection
+
+    def _call(self, func, args: tuple, transaction: bool):
+        connection = self._connection()
+        if not transaction:
+            return func(connection, *args)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(connection, *args)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return result
+
+    async def _read(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._read_pool, self._call, func, args, False)
+
+    async def _write(self, func, *args):
+        """Run func(connection, *args) in one transaction on the writer thread"""
+        return await asyncio.get_running_loop().run_in_executor(self._write_pool, self._call, func, args, True)
+
+    # ---- Lifecycle ----
+
+    async def ensure_schema(self):
+        await asyncio.get_running_loop().run_in_executor(self._write_pool, self._call, _create_schema, (), False)
+        logger.info(f"SQLite storage ready at {self.path}")
+
+    async def explain_hot_queries(self) -> List[dict]:
+        def explain(connection):
+            report = []
+            for table, where, params, order_by in HOT_QUERIES:
+                sql = f"SELECT * FROM {table}"
+                if where:
+                    sql += f" WHERE {where}"
+                if order_by:
+                    sql += f" ORDER BY {order_by}"
+                stages = [row["detail"] for row in connection.execute("EXPLAIN QUERY PLAN " + sql, params)]
+                report.append({
+                    "collection": table,
+                    "filter": where,
+                    "sort": order_by,
+                    "stages": stages,
+                    # "SCAN t" reads the whole table; "SCAN t USING INDEX" walks an index in order
+                    "collection_scan": any(s.startswith("SCAN") and "USING" not in s for s in stages),
+                })
+            return report
+        return await self._read(explain)
+
+    def close(self):
+        self._read_pool.shutdown(wait=True)
+        self._write_pool.shutdown(wait=True)
+        for connection in self._connections:
+            connection.close()
+        self._connections.clear()
+
+    # ---- Keyset listings ----
+
+    async def list_boundary(self, query: ListQuery, after: Optional[tuple], limit: int) -> tuple:
+        def boundary(connection):
+            where, params = _list_where(query, after, None)
+            columns = ", ".join(_quote(query.collection, column) for column in query.sort_fields)
+            sql = f"SELECT {columns} FROM {query.collection}{where}{_order_by(query)} LIMIT 2 OFFSET ?"
+            return connection.execute(sql, (*params, limit - 1)).fetchall()
+
+        rows = await self._read(boundary)
+        if not rows:
+            return None, False
+        return tuple(rows[0].get(column) for column in query.sort_fields), len(rows) > 1
+
+    async def iter_list(self, query: ListQuery, after: Optional[tuple] = None, upto: Optional[tuple] = None):
+        # Chunks are separate keyset queries, so no cursor is held open between awaits
+        selected = COLUMNS[query.collection] if not query.fields else (
+            [column for column in COLUMNS[query.collection] if column in query.fields or column in query.sort_fields]
+        )
+        columns = ", ".join(_quote(query.collection, column) for column in selected)
+
+        def chunk(connection, start):
+            where, params = _list_where(query, start, upto)
+            sql = f"SELECT {columns} FROM {query.collection}{where}{_order_by(query)} LIMIT ?"
+            return connection.execute(sql, (*params, LIST_CHUNK_ROWS)).fetchall()
+
+        start = after
+        while True:
+            rows = await self._read(chunk, start)
+            for row in rows:
+                if query.fields:
+                    yield {k: v for k, v in row.items() if k in query.fields}
+                else:
+                    yield row
+            if len(rows) < LIST_CHUNK_ROWS:
+                return
+            start = tuple(rows[-1].get(column) for column in query.sort_fields)
+
+    # ---- Generic row helpers ----
+
+    async def _find_one(self, table: str, column: str, value) -> Optional[dict]:
+        sql = f"SELECT * FROM {table} WHERE {_quote(table, column)} = ?"
+        return await self._read(lambda connection: connection.execute(sql, (value,)).fetchone())
+
+    async def _insert(self, table: str, doc: dict):
+        sql, params = _insert_sql(table, doc)
+
+        def insert(connection):
+            try:
+                connection.execute(sql, params)
+            except sqlite3.IntegrityError as e:
+                raise DuplicateError(str(e))
+        await self._write(insert)
+
+    async def _delete(self, table: str, column: str, value) -> bool:
+        sql = f"DELETE FROM {table} WHERE {_quote(table, column)} = ?"
+        return await self._write(lambda connection: connection.execute(sql, (value,)).rowcount > 0)
+
+    # ---- Admin users ----
+
+    async def find_user(self, username: str) -> Optional[dict]:
+        return await self._find_one("admin_users", "username", username)
+
+    async def find_user_by_id(self, user_id: str) -> Optional[dict]:
+        return await self._find_one("admin_users", "id", user_id)
+
+    async def count_users(self) -> int:
+        return await self._read(lambda connection: connection.execute("SELECT COUNT(*) AS n FROM admin_users").fetchone()["n"])
+
+    async def insert_user(self, doc: dict):
+        await self._insert("admin_users", doc)
+
+    async def update_user(self, fields: dict, user_id: Optional[str] = None, username: Optional[str] = None):
+        column, value = ("id", user_id) if user_id is not None else ("username", username)
+        sql = f"UPDATE admin_users SET {_assignments('admin_users', fields)} WHERE {column} = ?"
+        await self._write(lambda connection: connection.execute(sql, (*fields.values(), value)))
+
+    async def delete_user(self, user_id: str) -> bool:
+        return await self._delete("admin_users", "id", user_id)
+
+    async def list_users(self) -> List[dict]:
+        return await self._read(lambda connection: connection.execute(
+            "SELECT id, username, created_at FROM admin_users ORDER BY created_at"
+        ).fetchall())
+
+    async def user_token_states(self) -> List[dict]:
+        return await self._read(lambda connection: connection.execute(
+            "SELECT username, tokens_valid_after FROM admin_users"
+        ).fetchall())
+
+    # ---- Videos ----
+
+    async def insert_video(self, collection: str, doc: dict):
+        await self._insert(collection, doc)
+
+    async def update_video(self, collection: str, video_id: str, fields: dict) -> Optional[tuple]:
+        sql = f"UPDATE {collection} SET {_assignments(collection, fields)} WHERE id = ?"
+
+        def update(connection):
+            previous = connection.execute(f"SELECT * FROM {collection} WHERE id = ?", (video_id,)).fetchone()
+            if previous is None:
+                return None
+            connection.execute(sql, (*fields.values(), video_id))
+            return previous, {**previous, **fields}
+        return await self._write(update)
+
+    async def delete_video(self, collection: str, video_id: str) -> Optional[dict]:
+        def delete(connection):
+            deleted = connection.execute(f"SELECT * FROM {collection} WHERE id = ?", (video_id,)).fetchone()
+            if deleted is not None:
+                connection.execute(f"DELETE FROM {collection} WHERE id = ?", (video_id,))
+            return deleted
+        return await self._write(delete)
+
+    async def video_ids(self, collection: str) -> set:
+        rows = await self._read(lambda connection: connection.execute(f"SELECT id FROM {collection}").fetchall())
+        return {row["id"] for row in rows}
+
+    async def apply_video_updates(self, updates: Dict[str, Dict[str, dict]]) -> Dict[str, int]:
+        def apply(connection):
+            modified = {}
+            for collection, by_id in updates.items():
+                count = 0
+                for video_id, fields in by_id.items():
+                    # Only rows whose values actually change count as modified, as in Mongo
+                    columns = ", ".join(_quote(collection, column) for column in fields)
+                    marks = ", ".join("?" * len(fields))
+                    sql = (
+                        f"UPDATE {collection} SET {_assignments(collection, fields)} "
+                        f"WHERE id = ? AND ({columns}) IS NOT ({marks})"
+                    )
+                    values = tuple(fields.values())
+                    count += connection.execute(sql, (*values, video_id, *values)).rowcount
+                modified[collection] = count
+            return modified
+        return await self._write(apply)
+
+    async def video_urls(self) -> List[str]:
+        sql = " UNION ALL ".join(f"SELECT url FROM {collection}" for collection in VIDEO_COLLECTIONS)
+        rows = await self._read(lambda connection: connection.execute(sql).fetchall())
+        return [row.get("url") for row in rows]
+
+    async def display_videos(self) -> tuple:
+        def select(connection):
+            return (
+                connection.execute('SELECT * FROM tvc_videos WHERE is_active = 1 ORDER BY "order" LIMIT 100').fetchall(),
+                connection.execute("SELECT * FROM berbuka_videos WHERE is_active = 1 LIMIT 1").fetchone(),
+                connection.execute("SELECT * FROM countdown_videos WHERE is_active = 1 LIMIT 1").fetchone(),
+            )
+        return await self._read(select)
+
+    # ---- Maghrib schedules ----
+
+    async def insert_schedule(self, doc: dict):
+        await self._insert("maghrib_schedules", doc)
+
+    async def insert_schedules(self, docs: List[dict]) -> set:
+        def insert(connection):
+            failed = set()
+            for index, doc in enumerate(docs):
+                sql, params = _insert_sql("maghrib_schedules", doc, verb="INSERT OR IGNORE")
+                if connection.execute(sql, params).rowcount == 0:
+                    failed.add(index)
+            return failed
+        return await self._write(insert)
+
+    async def update_schedule(self, schedule_id: str, fields: dict) -> Optional[dict]:
+        sql = f"UPDATE maghrib_schedules SET {_assignments('maghrib_schedules', fields)} WHERE id = ?"
+
+        def update(connection):
+            try:
+                matched = connection.execute(sql, (*fields.values(), schedule_id)).rowcount
+            except sqlite3.IntegrityError as e:
+                raise DuplicateError(str(e))
+            if not matched:
+                return None
+            return connection.execute("SELECT * FROM maghrib_schedules WHERE id = ?", (schedule_id,)).fetchone()
+        return await self._write(update)
+
+    async def delete_schedule(self, schedule_id: str) -> bool:
+        return await self._delete("maghrib_schedules", "id", schedule_id)
+
+    async def find_schedules(self, locations: List[str], dates: List[str]) -> List[dict]:
+        # json_each keeps the statement text constant whatever the list lengths
+        return await self._read(lambda connection: connection.execute(
+            "SELECT * FROM maghrib_schedules"
+            " WHERE location IN (SELECT value FROM json_each(?)) AND date IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(locations)), json.dumps(list(dates)))
+        ).fetchall())
+
+    async def schedules_between(self, first_date: str, last_date: str) -> List[dict]:
+        return await self._read(lambda connection: connection.execute(
+            "SELECT * FROM maghrib_schedules WHERE date BETWEEN ? AND ?", (first_date, last_date)
+        ).fetchall())
+
+    async def upsert_schedules(self, docs: List[dict], overwrite: bool = True) -> tuple:
+        fields = [field for field in SCHEDULE_FIELDS if field != "location"]
+        changed = ", ".join(f"{field} = excluded.{field}" for field in fields)
+        current = "(" + ", ".join(fields) + ")"
+        incoming = "(" + ", ".join(f"excluded.{field}" for field in fields) + ")"
+        conflict = (
+            f" ON CONFLICT (location, date) DO UPDATE SET {changed} WHERE {current} IS NOT {incoming}"
+            if overwrite else " ON CONFLICT (location, date) DO NOTHING"
+        )
+
+        def upsert(connection):
+            inserted = modified = 0
+            for doc in docs:
+                exists = connection.execute(
+                    "SELECT 1 AS found FROM maghrib_schedules WHERE location = ? AND date = ?",
+                    (doc["location"], doc["date"])
+                ).fetchone()
+                sql, params = _insert_sql("maghrib_schedules", doc)
+                if connection.execute(sql + conflict, params).rowcount:
+                    if exists:
+                        modified += 1
+                    else:
+                        inserted += 1
+            return inserted, modified
+        return await self._write(upsert)
+
+    # ---- Media library ----
+
+    async def find_media(self, filename: str) -> Optional[dict]:
+        return await self._find_one("media_files", "filename", filename)
+
+    async def find_media_by_sha256(self, sha256: str) -> Optional[dict]:
+        return await self._find_one("media_files", "sha256", sha256)
+
+    async def insert_media(self, doc: dict):
+        await self._insert("media_files", doc)
+
+    async def delete_media(self, filename: str):
+        await self._delete("media_files", "filename", filename)
+
+    async def update_media_probe(self, filename: str, fields: dict) -> Optional[dict]:
+        sql = f"UPDATE media_files SET {_assignments('media_files', fields)} WHERE filename = ?"
+
+        def update(connection):
+            previous = connection.execute("SELECT * FROM media_files WHERE filename = ?", (filename,)).fetchone()
+            if previous is not None:
+                connection.execute(sql, (*fields.values(), filename))
+            return previous
+        return await self._write(update)
+
+    async def change_media_refs(self, filename: str, delta: int):
+        await self._write(lambda connection: connection.execute(
+            "UPDATE media_files SET ref_count = ref_count + ? WHERE filename = ? AND ref_count + ? >= 0",
+            (delta, filename, delta)
+        ))
+
+    async def set_media_refs(self, counts: Dict[str, int]):
+        def update(connection):
+            connection.execute("UPDATE media_files SET ref_count = 0")
+            connection.executemany(
+                "UPDATE media_files SET ref_count = ? WHERE filename = ?",
+                [(count, filename) for filename, count in counts.items()]
+            )
+        await self._write(update)
+
+    async def media_filenames(self, unprobed_only: bool = False) -> List[str]:
+        sql = "SELECT filename FROM media_files" + (" WHERE probed_at IS NULL" if unprobed_only else "")
+        rows = await self._read(lambda connection: connection.execute(sql).fetchall())
+        return [row["filename"] for row in rows]
+
+    async def media_usage(self) -> dict:
+        return await self._read(lambda connection: connection.execute(
+            "SELECT COUNT(*) AS files,"
+            " COALESCE(SUM(size), 0) AS bytes,"
+            " COALESCE(SUM(ref_count <= 0), 0) AS unreferenced_files,"
+            " COALESCE(SUM(CASE WHEN ref_count > 0 THEN 0 ELSE size END), 0) AS unreferenced_bytes"
+            " FROM media_files"
+        ).fetchone())
+
+    async def media_info(self, filenames: List[str]) -> List[dict]:
+        return await self._read(lambda connection: connection.execute(
+            "SELECT filename, size, sha256, duration_seconds FROM media_files"
+            " WHERE filename IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(filenames)),)
+        ).fetchall())
+
+    # ---- Resumable upload sessions ----
+
+    async def insert_upload_session(self, doc: dict):
+        await self._insert("upload_sessions", doc)
+
+    async def find_upload_session(self, upload_id: str) -> Optional[dict]:
+        return await self._find_one("upload_sessions", "id", upload_id)
+
+    async def delete_upload_session(self, upload_id: str) -> bool:
+        return await self._delete("upload_sessions", "id", upload_id)
+
+    # ---- Screen heartbeats ----
+
+    async def insert_heartbeats(self, docs: List[dict]):
+        columns = COLUMNS["screen_heartbeats"]
+        sql, _ = _insert_sql("screen_heartbeats", dict.fromkeys(columns))
+        rows = [[doc.get(column) for column in columns] for doc in docs]
+        await self._write(lambda connection: connection.executemany(sql, rows))
+
+    async def delete_heartbeats_before(self, received_at: str) -> int:
+        return await self._write(lambda connection: connection.execute(
+            "DELETE FROM screen_heartbeats WHERE received_at < ?", (received_at,)
+        ).rowcount)
+
+    # ---- Proof-of-play ----
+
+    async def record_plays(self, batch_id: str, events: List[dict], hourly: List[dict], daily: List[dict]):
+        columns = COLUMNS["play_events"]
+        events_sql, _ = _insert_sql("play_events", dict.fromkeys(columns))
+        counts = ", ".join(PLAY_COUNTS)
+        increments = ", ".join(f"{count} = {count} + excluded.{count}" for count in PLAY_COUNTS)
+        # Pruned like the Mongo batch ids: by the latest hour the batch counted
+        hour = max((row["hour"] for row in hourly), default="")
+
+        def record(connection):
+            # One transaction: the batch id is recorded with everything it wrote
+            if not connection.execute(
+                "INSERT OR IGNORE INTO play_batches (id, hour) VALUES (?, ?)", (batch_id, hour)
+            ).rowcount:
+                return
+            connection.executemany(events_sql, [[event.get(column) for column in columns] for event in events])
+            for period, rows in (("hour", hourly), ("date", daily)):
+                connection.executemany(
+                    f"INSERT INTO {PLAY_ROLLUP_TABLES[period]} ({period}, video_id, screen_id, {counts})"
+                    f" VALUES (?, ?, ?, {', '.join('?' * len(PLAY_COUNTS))})"
+                    f" ON CONFLICT ({period}, video_id, screen_id) DO UPDATE SET {increments}",
+                    [(row[period], row["video_id"], row["screen_id"], *(row[c] for c in PLAY_COUNTS)) for row in rows]
+                )
+        await self._write(record)
+
+    async def prune_plays(self, events_before: str, batches_before: str) -> int:
+        def prune(connection):
+            connection.execute("DELETE FROM play_batches WHERE hour < ?", (batches_before,))
+            return connection.execute("DELETE FROM play_events WHERE hour < ?", (events_before,)).rowcount
+        return await self._write(prune)
+
+    async def play_report(
+        self, period: str, first: str, last: str, per_screen: bool,
+        video_id: Optional[str] = None, screen_id: Optional[str] = None
+    ) -> List[dict]:
+        keys = f"{period} AS period, video_id" + (", screen_id" if per_screen else "")
+        where, params = f"{period} BETWEEN ? AND ?", [first, last]
+        if video_id is not None:
+            where += " AND video_id = ?"
+            params.append(video_id)
+        if screen_id is not None:
+            where += " AND screen_id = ?"
+            params.append(screen_id)
+        group = "period, video_id" + (", screen_id" if per_screen else "")
+        sql = (
+            f"SELECT {keys}, {', '.join(f'SUM({c}) AS {c}' for c in PLAY_COUNTS)}"
+            f" FROM {PLAY_ROLLUP_TABLES[period]} WHERE {where} GROUP BY {group} ORDER BY {group}"
+        )
+        return await self._read(lambda connection: connection.execute(sql, params).fetchall())
+
+    # ---- Admin panel revisions ----
+
+    @staticmethod
+    def _ensure_epoch(connection):
+        connection.execute(
+            "INSERT OR IGNORE INTO store_meta (key, value) VALUES ('admin_epoch', ?)", (uuid.uuid4().hex[:8],)
+        )
+
+    async def bump_revisions(self, sections: tuple):
+        def bump(connection):
+            self._ensure_epoch(connection)
+            connection.executemany(
+                "INSERT INTO admin_revisions (section, revision) VALUES (?, 1)"
+                " ON CONFLICT (section) DO UPDATE SET revision = revision + 1",
+                [(section,) for section in sections]
+            )
+        await self._write(bump)
+
+    async def get_revisions(self) -> dict:
+        def select(connection):
+            epoch = connection.execute("SELECT value FROM store_meta WHERE key = 'admin_epoch'").fetchone()
+            if epoch is None:
+                return None
+            revisions = {row["section"]: row["revision"] for row in connection.execute("SELECT * FROM admin_revisions")}
+            return {"epoch": epoch["value"], **revisions}
+
+        revisions = await self._read(select)
+        if revisions is None:
+            await self._write(self._ensure_epoch)
+            revisions = await self._read(select)
+        return revisions
@@ -0,0 +1,441 @@
+"""
+Offline load test / benchmark for the countdown backend.
+
+Runs concurrent display-poll, admin-CRUD and upload workloads and reports
+req/s plus p50/p95/p99 latency per endpoint, saved as JSON so runs can be
+compared between commits.
+
+Targets:
+  in-process (default)  the ASGI app from backend/server.py, driven through
+                        httpx.ASGITransport, backed by mongomock-motor (in-memory),
+                        a local MongoDB via --mongo-url or a SQLite file via --sqlite
+  --url URL             a running server (e.g. local uvicorn); data is seeded
+                        through the API
+
+Extra packages (not needed by the server itself):
+  pip install httpx mongomock-motor
+
+Examples:
+  python backend_bench.py --duration 20
+  python backend_bench.py --mongo-url mongodb://localhost:27017 --locations 200 --years 2
+  python backend_bench.py --sqlite /tmp/countdown-bench.db
+  python backend_bench.py --url http://localhost:8001 --username admin --password admin123
+  python backend_bench.py --compare bench_results/old.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / "backend"
+
+# Rough bounding box of Indonesia for generated locations
+LATITUDE_RANGE = (-10.5, 5.5)
+LONGITUDE_RANGE = (95.0, 141.0)
+
+def timezone_for_longitude(longitude: float) -> str:
+    if longitude < 114.5:
+        return "WIB"
+    if longitude < 127.0:
+        return "WITA"
+    return "WIT"
+
+# ============ STATS ============
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+
+    def record(self, seconds: float, status: int):
+        self.latencies.append(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status >= 400:
+            self.errors += 1
+
+    @staticmethod
+    def percentile(values: list, fraction: float) -> float:
+        if not values:
+            return 0.0
+        index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+        return values[index]
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        ms = lambda seconds: round(seconds * 1000, 3)
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "req_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": ms(self.percentile(latencies, 0.50)),
+            "p95_ms": ms(self.percentile(latencies, 0.95)),
+            "p99_ms": ms(self.percentile(latencies, 0.99)),
+            "max_ms": ms(latencies[-1]) if latencies else 0.0,
+        }
+
+class Recorder:
+    def __init__(self):
+        self.endpoints = {}
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        # In-process requests against mongomock can complete without ever suspending,
+        # which would let one worker starve the others
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 599
+        self.endpoints.setdefault(name, EndpointStats()).record(time.perf_counter() - start, status)
+        return response
+
+# ============ TARGET SETUP ============
+
+async def start_in_process(args):
+    """Import the server with an in-memory or local Mongo or a SQLite file; returns (client, server, startup, cleanup)"""
+    os.environ.setdefault("MONGO_URL", args.mongo_url or "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = args.db_name
+    # Uploads and the display snapshot go to a throwaway directory instead of backend/
+    scratch = Path(tempfile.mkdtemp(prefix="countdown-bench-"))
+    os.environ["DISPLAY_SNAPSHOT_PATH"] = str(scratch / "display-snapshot.json")
+    if args.sqlite:
+        os.environ["STORAGE_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = args.sqlite
+        for suffix in ("", "-wal", "-shm"):
+            Path(args.sqlite + suffix).unlink(missing_ok=True)
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+
+    # Seeding runs before the lifespan hook, which would otherwise create the repository
+    if not args.mongo_url and not args.sqlite:
+        from mongomock_motor import AsyncMongoMockClient
+        from mongo_repository import MongoRepository
+        server.repo = MongoRepository(AsyncMongoMockClient()[args.db_name])
+    else:
+        server.repo = server.create_repository()
+        if args.mongo_url:
+            await server.repo.db.client.drop_database(args.db_name)
+
+    server.UPLOAD_DIR = scratch / "videos"
+    server.UPLOAD_TMP_DIR = scratch / "tmp"
+    server.create_upload_dirs()
+
+    # The lifespan hook (index creation, timeline, stream hub) runs after seeding:
+    # mongomock checks unique indexes with a scan per inserted document
+    transport = httpx.ASGITransport(app=server.app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+    lifespan = server.lifespan(server.app)
+    started = False
+
+    async def startup():
+        nonlocal started
+        await lifespan.__aenter__()
+        started = True
+
+    async def cleanup():
+        await client.aclose()
+        if started:
+            await lifespan.__aexit__(None, None, None)
+
+    return client, server, startup, cleanup
+
+async def authenticate(client: httpx.AsyncClient, args) -> dict:
+    response = await client.post("/api/auth/login", json={"username": args.username, "password": args.password})
+    if response.status_code != 200:
+        response = await client.post("/api/auth/setup", json={"username": args.username, "password": args.password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+# ============ SEEDING ============
+
+def generate_locations(count: int, rng: random.Random) -> list:
+    locations = []
+    for i in range(count):
+        longitude = rng.uniform(*LONGITUDE_RANGE)
+        locations.append({
+            "location": f"Kota {i + 1:04d}",
+            "latitude": round(rng.uniform(*LATITUDE_RANGE), 4),
+            "longitude": round(longitude, 4),
+            "elevation": round(rng.uniform(0, 800)),
+            "timezone": timezone_for_longitude(longitude),
+        })
+    return locations
+
+def video_docs(kind: str, count: int, rng: random.Random) -> list:
+    now = datetime.now(timezone.utc).isoformat()
+    docs = []
+    for i in range(count):
+        doc = {
+            "id": str(uuid.uuid4()),
+            "name": f"{kind} {i + 1}",
+            "url": f"https://cdn.example.com/{kind}/{uuid.uuid4().hex}.mp4",
+            "is_active": i < 20 if kind == "tvc" else i == 0,
+            "created_at": now,
+        }
+        if kind == "tvc":
+            doc["order"] = i
+        elif kind == "berbuka":
+            doc["duration_seconds"] = rng.choice([180, 300, 420])
+        else:
+            doc["duration_minutes"] = 5
+        docs.append(doc)
+    return docs
+
+async def seed_direct(server, locations: list, start: date, days: int, args, rng: random.Random):
+    """Insert straight into the database; mongomock is far too slow for per-row upserts"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import prayer_times
+
+    repo = server.repo
+    for collection, kind, count in (
+        ("tvc_videos", "tvc", args.videos), ("berbuka_videos", "berbuka", 5), ("countdown_videos", "countdown", 5)
+    ):
+        for doc in video_docs(kind, count, rng):
+            await repo.insert_video(collection, doc)
+
+    offsets = [{"WIB": 7, "WITA": 8, "WIT": 9}[loc["timezone"]] for loc in locations]
+    subuh, maghrib = prayer_times.compute_prayer_times(
+        [loc["latitude"] for loc in locations],
+        [loc["longitude"] for loc in locations],
+        [loc["elevation"] for loc in locations],
+        offsets,
+        start,
+        days,
+    )
+    subuh, maghrib = prayer_times.format_minutes(subuh), prayer_times.format_minutes(maghrib)
+    now = datetime.now(timezone.utc).isoformat()
+    for i, loc in enumerate(locations):
+        await repo.insert_schedules([
+            {
+                "id": str(uuid.uuid4()),
+                "date": (start + timedelta(days=j)).isoformat(),
+                "subuh_time": str(subuh[i, j]),
+                "maghrib_time": str(maghrib[i, j]),
+                "location": loc["location"],
+                "timezone": loc["timezone"],
+                "created_at": now,
+            }
+            for j in range(days)
+        ])
+
+async def seed_via_api(client: httpx.AsyncClient, headers: dict, locations: list, start: date, days: int, args, rng: random.Random):
+    for kind, count in (("tvc", args.videos), ("berbuka", 5), ("countdown", 5)):
+        endpoint = {"tvc": "tvc-videos", "berbuka": "berbuka-videos", "countdown": "countdown-videos"}[kind]
+        for doc in video_docs(kind, count, rng):
+            body = {k: v for k, v in doc.items() if k not in ("id", "created_at")}
+            (await client.post(f"/api/{endpoint}", json=body, headers=headers)).raise_for_status()
+
+    # The generator endpoint caps the range per request
+    chunk = 366
+    for offset in range(0, days, chunk):
+        chunk_start = start + timedelta(days=offset)
+        chunk_end = start + timedelta(days=min(offset + chunk, days) - 1)
+        response = await client.post("/api/schedules/generate", headers=headers, timeout=600, json={
+            "locations": locations,
+            "start_date": chunk_start.isoformat(),
+            "end_date": chunk_end.isoformat(),
+        })
+        response.raise_for_status()
+
+# ============ WORKLOADS ============
+
+async def display_worker(client, recorder: Recorder, locations: list, deadline: float, rng: random.Random):
+    """A screen: conditional polls of display-state, occasionally the prefetch manifest"""
+    etags = {}
+    while time.perf_counter() < deadline:
+        location = rng.choice(locations)["location"]
+        if rng.random() < 0.05:
+            await recorder.request(client, "GET /api/display-manifest", "GET", "/api/display-manifest", params={"location": location})
+            continue
+        headers = {"If-None-Match": etags[location]} if location in etags and rng.random() < 0.5 else {}
+        response = await recorder.request(
+            client, "GET /api/display-state", "GET", "/api/display-state",
+            params={"location": location}, headers=headers
+        )
+        if response is not None and "etag" in response.headers:
+            etags[location] = response.headers["etag"]
+
+async def admin_worker(client, recorder: Recorder, headers: dict, locations: list, deadline: float, rng: random.Random):
+    """An admin: list pages, edit a TVC video, create and delete a schedule"""
+    while time.perf_counter() < deadline:
+        action = rng.random()
+        if action < 0.3:
+            await recorder.request(client, "GET /api/tvc-videos", "GET", "/api/tvc-videos")
+        elif action < 0.6:
+            await recorder.request(
+                client, "GET /api/schedules", "GET", "/api/schedules",
+                params={"location": rng.choice(locations)["location"]}
+            )
+        elif action < 0.8:
+            response = await recorder.request(client, "GET /api/tvc-videos", "GET", "/api/tvc-videos")
+            videos = response.json() if response is not None and response.status_code == 200 else []
+            if videos:
+                video = rng.choice(videos)
+                await recorder.request(
+                    client, "PUT /api/tvc-videos/{id}", "PUT", f"/api/tvc-videos/{video['id']}",
+                    json={"order": rng.randint(0, 1000)}, headers=headers
+                )
+        else:
+            body = {
+                "date": (date(2100, 1, 1) + timedelta(days=rng.randint(0, 3650))).isoformat(),
+                "maghrib_time": "18:00",
+                "location": f"Bench {uuid.uuid4().hex[:8]}",
+            }
+            response = await recorder.request(client, "POST /api/schedules", "POST", "/api/schedules", json=body, headers=headers)
+            if response is not None and response.status_code == 200:
+                await recorder.request(
+                    client, "DELETE /api/schedules/{id}", "DELETE", f"/api/schedules/{response.json()['id']}",
+                    headers=headers
+                )
+
+async def upload_worker(client, recorder: Recorder, headers: dict, deadline: float, size: int):
+    """Upload a unique file and remove it again"""
+    while time.perf_counter() < deadline:
+        payload = os.urandom(size)
+        response = await recorder.request(
+            client, "POST /api/upload/video", "POST", "/api/upload/video",
+            files={"file": ("bench.mp4", payload, "video/mp4")}, headers=headers
+        )
+        if response is not None and response.status_code == 200:
+            await recorder.request(
+                client, "DELETE /api/upload/video/{filename}", "DELETE",
+                f"/api/upload/video/{response.json()['filename']}", headers=headers
+            )
+
+# ============ REPORTING ============
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def print_report(results: dict, previous: dict = None):
+    print(f"\n{'endpoint':<36} {'req':>7} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in sorted(results["endpoints"].items()):
+        line = (
+            f"{name:<36} {stats['requests']:>7} {stats['errors']:>5} {stats['req_per_s']:>9.1f} "
+            f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+        )
+        old = (previous or {}).get("endpoints", {}).get(name)
+        if old and old["p95_ms"] and old["req_per_s"]:
+            line += (
+                f"   p95 {100 * (stats['p95_ms'] / old['p95_ms'] - 1):+.0f}%"
+                f"  req/s {100 * (stats['req_per_s'] / old['req_per_s'] - 1):+.0f}%"
+            )
+        print(line)
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    locations = generate_locations(args.locations, rng)
+    start = date.today().replace(month=1, day=1)
+    days = 365 * args.years
+
+    server = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+        cleanup = client.aclose
+    else:
+        client, server, startup, cleanup = await start_in_process(args)
+
+    try:
+        headers = await authenticate(client, args)
+        seed_started = time.perf_counter()
+        if not args.no_seed:
+            if server is not None:
+                await seed_direct(server, locations, start, days, args, rng)
+            else:
+                await seed_via_api(client, headers, locations, start, days, args, rng)
+        if server is not None:
+            await startup()
+        seed_seconds = time.perf_counter() - seed_started
+        print(f"Seeded {len(locations)} locations x {days} days, {args.videos} TVC videos in {seed_seconds:.1f}s")
+
+        recorder = Recorder()
+        deadline = time.perf_counter() + args.duration
+        workers = [
+            *(display_worker(client, recorder, locations, deadline, random.Random(rng.random())) for _ in range(args.display_clients)),
+            *(admin_worker(client, recorder, headers, locations, deadline, random.Random(rng.random())) for _ in range(args.admin_clients)),
+            *(upload_worker(client, recorder, headers, deadline, args.upload_kb * 1024) for _ in range(args.upload_clients)),
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - started
+    finally:
+        await cleanup()
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "target": args.url or ("in-process, " + (
+                "sqlite " + args.sqlite if args.sqlite
+                else "mongo " + args.mongo_url if args.mongo_url
+                else "mongomock"
+            )),
+            "duration_s": round(elapsed, 2),
+            "seed_s": round(seed_seconds, 2),
+            "config": {
+                key: getattr(args, key) for key in (
+                    "locations", "years", "videos", "display_clients", "admin_clients",
+                    "upload_clients", "upload_kb", "seed"
+                )
+            },
+        },
+        "endpoints": {name: stats.summary(elapsed) for name, stats in recorder.endpoints.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the countdown backend")
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--mongo-url", help="Local MongoDB for the in-process app (default: in-memory mongomock)")
+    parser.add_argument("--sqlite", help="SQLite file for the in-process app (recreated on every run)")
+    parser.add_argument("--db-name", default="countdown_bench")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of load")
+    parser.add_argument("--locations", type=int, default=50)
+    parser.add_argument("--years", type=int, default=2, help="Years of schedules per location")
+    parser.add_argument("--videos", type=int, default=300, help="TVC videos (the first 20 active)")
+    parser.add_argument("--display-clients", type=int, default=50)
+    parser.add_argument("--admin-clients", type=int, default=2)
+    parser.add_argument("--upload-clients", type=int, default=1)
+    parser.add_argument("--upload-kb", type=int, default=1024)
+    parser.add_argument("--no-seed", action="store_true", help="Use the data already in the target")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for generated data and workloads")
+    parser.add_argument("--output", help="Result JSON path (default: bench_results/<time>-<revision>.json)")
+    parser.add_argument("--compare", help="Previous result JSON to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    output = Path(args.output) if args.output else (
+        ROOT_DIR / "bench_results" / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['meta']['revision']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+
+    previous = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(results, previous)
+    print(f"\nResults saved to {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
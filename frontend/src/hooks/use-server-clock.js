@@ -0,0 +1,56 @@
+import { useCallback, useEffect, useRef } from "react";
+import axios from "axios";
+
+// Jam monotonic layar: tidak lompat saat jam OS diubah
+const clientNow = () => performance.timeOrigin + performance.now();
+
+const SYNC_INTERVAL_MS = 15000;
+const SYNC_BURST = 4; // Pertukaran berturut-turut saat halaman dibuka
+const SYNC_SAMPLES = 8;
+
+/**
+ * Selisih jam layar terhadap server, diukur gaya NTP lewat /api/time.
+ * Dari SYNC_SAMPLES pertukaran terakhir dipakai yang round trip-nya paling
+ * kecil (paling sedikit terpengaruh antrean jaringan).
+ * Mengembalikan serverNow(): waktu server sekarang, epoch ms.
+ */
+export function useServerClock(api) {
+  // Sebelum sync pertama: jam sistem layar
+  const offset = useRef(Date.now() - clientNow());
+  const samples = useRef([]);
+
+  useEffect(() => {
+    let cancelled = false;
+
+    const sync = async () => {
+      const t0 = clientNow();
+      try {
+        const { data } = await axios.get(`${api}/time`, { params: { t0 } });
+        const t3 = clientNow();
+        if (cancelled) return;
+        const sample = {
+          offset: ((data.t1 - t0) + (data.t2 - t3)) / 2,
+          delay: (t3 - t0) - (data.t2 - data.t1),
+        };
+        samples.current = [...samples.current, sample].slice(-SYNC_SAMPLES);
+        offset.current = samples.current.reduce((best, s) => (s.delay < best.delay ? s : best)).offset;
+      } catch (error) {
+        // Coba lagi di interval berikutnya; offset terakhir tetap dipakai
+      }
+    };
+
+    const burst = async () => {
+      for (let i = 0; i < SYNC_BURST && !cancelled; i++) {
+        await sync();
+      }
+    };
+    burst();
+    const interval = setInterval(sync, SYNC_INTERVAL_MS);
+    return () => {
+      cancelled = true;
+      clearInterval(interval);
+    };
+  }, [api]);
+
+  return useCallback(() => clientNow() + offset.current, []);
+}
@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import axios from "axios";
 import { toast } from "sonner";
@@ -27,6 +27,7 @@ import {
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { Calendar } from "@/components/ui/calendar";
 import { Popover, PopoverContent, PopoverTrigger } from "@/components/ui/popover";
+import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
 import { 
   Plus, 
   Trash2, 
@@ -51,6 +52,9 @@ import { format } from "date-fns";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const RESUMABLE_UPLOAD_THRESHOLD = 16 * 1024 * 1024;
+const MAX_UPLOAD_RETRIES = 5;
+const TIMEZONES = ["WIB", "WITA", "WIT"];
 
 const AdminPage = () => {
   const navigate = useNavigate();
@@ -104,7 +108,7 @@ const AdminPage = () => {
   const [newTvc, setNewTvc] = useState({ name: "", url: "", order: 0 });
   const [newBerbuka, setNewBerbuka] = useState({ name: "", url: "", duration_seconds: 300 });
   const [newCountdown, setNewCountdown] = useState({ name: "", url: "", duration_minutes: 5 });
-  const [newSchedule, setNewSchedule] = useState({ date: "", subuh_time: "04:30", maghrib_time: "", location: "Bekasi" });
+  const [newSchedule, setNewSchedule] = useState({ date: "", subuh_time: "04:30", maghrib_time: "", location: "Bekasi", timezone: "WIB" });
   const [selectedDate, setSelectedDate] = useState(null);
   const [editingTvc, setEditingTvc] = useState(null);
   const [editingBerbuka, setEditingBerbuka] = useState(null);
@@ -123,24 +127,78 @@ const AdminPage = () => {
   const [uploadingTvc, setUploadingTvc] = useState(false);
   const [uploadingBerbuka, setUploadingBerbuka] = useState(false);
   const [uploadingCountdown, setUploadingCountdown] = useState(false);
+  const [importingSchedules, setImportingSchedules] = useState(false);
+  const [generateForm, setGenerateForm] = useState({ start_date: "", end_date: "", locations: "" });
+  const [generatingSchedules, setGeneratingSchedules] = useState(false);
+
+  // Upload video: file kecil langsung, file besar per chunk lewat sesi resumable
+  const uploadVideoFile = async (file) => {
+    if (file.size < RESUMABLE_UPLOAD_THRESHOLD) {
+      const formData = new FormData();
+      formData.append("file", file);
+      const response = await axios.post(`${API}/upload/video`, formData, {
+        headers: { 
+          ...getAuthHeader(),
+          "Content-Type": "multipart/form-data"
+        }
+      });
+      return response.data;
+    }
+
+    const { data: session } = await axios.post(`${API}/upload/sessions`, {
+      filename: file.name,
+      content_type: file.type,
+      size: file.size
+    }, { headers: getAuthHeader() });
+
+    let offset = 0;
+    let retries = 0;
+    while (offset < file.size) {
+      const chunk = file.slice(offset, offset + session.chunk_size);
+      try {
+        const { data } = await axios.put(`${API}/upload/sessions/${session.id}?offset=${offset}`, chunk, {
+          headers: { ...getAuthHeader(), "Content-Type": "application/octet-stream" }
+        });
+        offset = data.offset;
+        retries = 0;
+      } catch (error) {
+        if (error.response?.status === 401 || retries >= MAX_UPLOAD_RETRIES) throw error;
+        retries += 1;
+        await new Promise((resolve) => setTimeout(resolve, 1000 * retries));
+        // Lanjutkan dari offset yang sudah diterima server
+        try {
+          const { data } = await axios.get(`${API}/upload/sessions/${session.id}`, { headers: getAuthHeader() });
+          offset = data.offset;
+        } catch (statusError) {
+          console.error("Error fetching upload status:", statusError);
+        }
+      }
+    }
+
+    const { data } = await axios.post(`${API}/upload/sessions/${session.id}/finalize`, null, {
+      headers: getAuthHeader()
+    });
+    return data;
+  };
+
+  // Version of the last /admin/bootstrap payload; later refreshes only fetch what changed
+  const adminVersion = useRef(null);
 
   const fetchData = useCallback(async () => {
-    setLoading(true);
+    const refresh = adminVersion.current !== null;
+    if (!refresh) setLoading(true);
     try {
-      const [tvcRes, berbukaRes, countdownRes, scheduleRes, stateRes, usersRes] = await Promise.all([
-        axios.get(`${API}/tvc-videos`),
-        axios.get(`${API}/berbuka-videos`),
-        axios.get(`${API}/countdown-videos`),
-        axios.get(`${API}/schedules`),
-        axios.get(`${API}/display-state`),
-        axios.get(`${API}/auth/users`, { headers: getAuthHeader() })
-      ]);
-      setTvcVideos(tvcRes.data);
-      setBerbukaVideos(berbukaRes.data);
-      setCountdownVideos(countdownRes.data);
-      setSchedules(scheduleRes.data);
-      setDisplayState(stateRes.data);
-      setUsers(usersRes.data);
+      const { data } = await axios.get(`${API}/admin/bootstrap`, {
+        params: refresh ? { since: adminVersion.current } : {},
+        headers: getAuthHeader()
+      });
+      if (data.tvc_videos) setTvcVideos(data.tvc_videos);
+      if (data.berbuka_videos) setBerbukaVideos(data.berbuka_videos);
+      if (data.countdown_videos) setCountdownVideos(data.countdown_videos);
+      if (data.schedules) setSchedules(data.schedules);
+      if (data.users) setUsers(data.users);
+      setDisplayState(data.display_state);
+      adminVersion.current = data.version;
     } catch (error) {
       console.error("Error fetching data:", error);
       if (error.response?.status === 401) {
@@ -163,19 +221,11 @@ const AdminPage = () => {
     if (!file) return;
     
     setUploadingTvc(true);
-    const formData = new FormData();
-    formData.append("file", file);
-    
     try {
-      const response = await axios.post(`${API}/upload/video`, formData, {
-        headers: { 
-          ...getAuthHeader(),
-          "Content-Type": "multipart/form-data"
-        }
-      });
+      const uploaded = await uploadVideoFile(file);
       
       // Auto-fill URL
-      const videoUrl = `${BACKEND_URL}${response.data.url}`;
+      const videoUrl = `${BACKEND_URL}${uploaded.url}`;
       setNewTvc(prev => ({ ...prev, url: videoUrl, name: file.name.replace(/\.[^/.]+$/, "") }));
       toast.success("Video berhasil diupload");
     } catch (error) {
@@ -258,18 +308,10 @@ const AdminPage = () => {
     if (!file) return;
     
     setUploadingBerbuka(true);
-    const formData = new FormData();
-    formData.append("file", file);
-    
     try {
-      const response = await axios.post(`${API}/upload/video`, formData, {
-        headers: { 
-          ...getAuthHeader(),
-          "Content-Type": "multipart/form-data"
-        }
-      });
+      const uploaded = await uploadVideoFile(file);
       
-      const videoUrl = `${BACKEND_URL}${response.data.url}`;
+      const videoUrl = `${BACKEND_URL}${uploaded.url}`;
       setNewBerbuka(prev => ({ ...prev, url: videoUrl, name: file.name.replace(/\.[^/.]+$/, "") }));
       toast.success("Video berhasil diupload");
     } catch (error) {
@@ -352,18 +394,10 @@ const AdminPage = () => {
     if (!file) return;
     
     setUploadingCountdown(true);
-    const formData = new FormData();
-    formData.append("file", file);
-    
     try {
-      const response = await axios.post(`${API}/upload/video`, formData, {
-        headers: { 
-          ...getAuthHeader(),
-          "Content-Type": "multipart/form-data"
-        }
-      });
+      const uploaded = await uploadVideoFile(file);
       
-      const videoUrl = `${BACKEND_URL}${response.data.url}`;
+      const videoUrl = `${BACKEND_URL}${uploaded.url}`;
       setNewCountdown(prev => ({ ...prev, url: videoUrl, name: file.name.replace(/\.[^/.]+$/, "") }));
       toast.success("Video berhasil diupload");
     } catch (error) {
@@ -449,7 +483,7 @@ const AdminPage = () => {
     try {
       await axios.post(`${API}/schedules`, newSchedule, { headers: getAuthHeader() });
       toast.success("Jadwal berhasil ditambahkan");
-      setNewSchedule({ date: "", subuh_time: "04:30", maghrib_time: "", location: "Bekasi" });
+      setNewSchedule({ date: "", subuh_time: "04:30", maghrib_time: "", location: "Bekasi", timezone: "WIB" });
       setSelectedDate(null);
       fetchData();
     } catch (error) {
@@ -493,6 +527,88 @@ const AdminPage = () => {
     }
   };
 
+  const handleImportSchedules = async (e) => {
+    const file = e.target.files?.[0];
+    if (!file) return;
+
+    setImportingSchedules(true);
+    const formData = new FormData();
+    formData.append("file", file);
+
+    try {
+      const response = await axios.post(`${API}/schedules/import`, formData, {
+        headers: {
+          ...getAuthHeader(),
+          "Content-Type": "multipart/form-data"
+        }
+      });
+      const { inserted, updated, unchanged, invalid, rows } = response.data;
+      toast.success(`Import selesai: ${inserted} baru, ${updated} diubah, ${unchanged} sama`);
+      if (invalid > 0) {
+        const firstError = rows.find((row) => row.status === "invalid");
+        toast.error(`${invalid} baris tidak valid (baris ${firstError.row}: ${firstError.error})`);
+      }
+      fetchData();
+    } catch (error) {
+      if (error.response?.status === 401) {
+        navigate("/login");
+      } else {
+        toast.error(error.response?.data?.detail || "Gagal import jadwal");
+      }
+    } finally {
+      setImportingSchedules(false);
+      e.target.value = "";
+    }
+  };
+
+  // Satu lokasi per baris: nama, latitude, longitude, elevasi (m), zona waktu
+  const parseGenerateLocations = (text) => text
+    .split("\n")
+    .map((line) => line.trim())
+    .filter(Boolean)
+    .map((line) => {
+      const [location, latitude, longitude, elevation, timezone] = line.split(",").map((part) => part.trim());
+      return {
+        location,
+        latitude: parseFloat(latitude),
+        longitude: parseFloat(longitude),
+        elevation: parseFloat(elevation) || 0,
+        timezone: (timezone || "WIB").toUpperCase()
+      };
+    });
+
+  const handleGenerateSchedules = async () => {
+    const locations = parseGenerateLocations(generateForm.locations);
+    if (!generateForm.start_date || !generateForm.end_date || locations.length === 0) {
+      toast.error("Isi tanggal mulai, tanggal akhir, dan minimal 1 lokasi");
+      return;
+    }
+    if (locations.some((loc) => !loc.location || isNaN(loc.latitude) || isNaN(loc.longitude))) {
+      toast.error("Format lokasi: nama, latitude, longitude, elevasi, zona");
+      return;
+    }
+
+    setGeneratingSchedules(true);
+    try {
+      const response = await axios.post(`${API}/schedules/generate`, {
+        locations,
+        start_date: generateForm.start_date,
+        end_date: generateForm.end_date
+      }, { headers: getAuthHeader() });
+      const { inserted, updated, unchanged } = response.data;
+      toast.success(`Generate selesai: ${inserted} baru, ${updated} diubah, ${unchanged} sama`);
+      fetchData();
+    } catch (error) {
+      if (error.response?.status === 401) {
+        navigate("/login");
+      } else {
+        toast.error(error.response?.data?.detail || "Gagal generate jadwal");
+      }
+    } finally {
+      setGeneratingSchedules(false);
+    }
+  };
+
   const handleDateSelect = (date) => {
     setSelectedDate(date);
     setNewSchedule(prev => ({
@@ -512,10 +628,14 @@ const AdminPage = () => {
       return;
     }
     try {
-      await axios.post(`${API}/auth/change-password`, {
+      const response = await axios.post(`${API}/auth/change-password`, {
         current_password: changePassword.current_password,
         new_password: changePassword.new_password
       }, { headers: getAuthHeader() });
+      // Token lama dicabut setelah ganti password, pakai token baru
+      if (response.data.token) {
+        localStorage.setItem("admin_token", response.data.token);
+      }
       toast.success("Password berhasil diubah");
       setChangePassword({ current_password: "", new_password: "", confirm_password: "" });
       setShowChangePassword(false);
@@ -1078,7 +1198,23 @@ const AdminPage = () => {
                     data-testid="schedule-location-input"
                   />
                 </div>
-                <div className="md:col-span-2 flex items-end">
+                <div>
+                  <Label className="text-purple-300">Zona Waktu</Label>
+                  <Select
+                    value={newSchedule.timezone}
+                    onValueChange={(value) => setNewSchedule(prev => ({ ...prev, timezone: value }))}
+                  >
+                    <SelectTrigger className="bg-frestea-surface border-frestea-purple/30" data-testid="schedule-timezone-select">
+                      <SelectValue />
+                    </SelectTrigger>
+                    <SelectContent>
+                      {TIMEZONES.map((tz) => (
+                        <SelectItem key={tz} value={tz}>{tz}</SelectItem>
+                      ))}
+                    </SelectContent>
+                  </Select>
+                </div>
+                <div className="flex items-end">
                   <Button onClick={handleAddSchedule} className="w-full bg-frestea-gold text-black hover:bg-frestea-gold/80" data-testid="add-schedule-btn">
                     <Plus className="w-4 h-4 mr-2" />
                     Tambah Jadwal
@@ -1086,6 +1222,87 @@ const AdminPage = () => {
                 </div>
               </div>
 
+              {/* Import Schedule (CSV / Excel) */}
+              <div className="flex flex-col md:flex-row md:items-center gap-4 p-4 bg-frestea-dark/50 rounded-lg">
+                <p className="text-purple-300 text-sm flex-1">
+                  Import jadwal dari CSV/Excel dengan kolom: date, subuh_time, maghrib_time, location, timezone
+                </p>
+                <div className="relative">
+                  <input
+                    type="file"
+                    accept=".csv,.xlsx"
+                    onChange={handleImportSchedules}
+                    className="absolute inset-0 w-full h-full opacity-0 cursor-pointer"
+                    disabled={importingSchedules}
+                    data-testid="schedule-import-input"
+                  />
+                  <Button
+                    variant="outline"
+                    className="w-full border-dashed border-frestea-purple/50"
+                    disabled={importingSchedules}
+                  >
+                    {importingSchedules ? (
+                      <RefreshCw className="w-4 h-4 mr-2 animate-spin" />
+                    ) : (
+                      <Upload className="w-4 h-4 mr-2" />
+                    )}
+                    {importingSchedules ? "Importing..." : "Import CSV/Excel"}
+                  </Button>
+                </div>
+              </div>
+
+              {/* Generate Schedule (perhitungan Kemenag dari koordinat) */}
+              <div className="grid grid-cols-1 md:grid-cols-6 gap-4 p-4 bg-frestea-dark/50 rounded-lg">
+                <div className="md:col-span-3">
+                  <Label className="text-purple-300 flex items-center gap-1">
+                    <MapPin className="w-3 h-3" /> Lokasi (nama, lat, lon, elevasi, zona)
+                  </Label>
+                  <textarea
+                    rows={3}
+                    placeholder={"Jakarta, -6.2088, 106.8456, 8, WIB\nMakassar, -5.1477, 119.4327, 10, WITA"}
+                    value={generateForm.locations}
+                    onChange={(e) => setGenerateForm(prev => ({ ...prev, locations: e.target.value }))}
+                    className="w-full rounded-md p-2 text-sm text-white bg-frestea-surface border border-frestea-purple/30"
+                    data-testid="generate-locations-input"
+                  />
+                </div>
+                <div>
+                  <Label className="text-purple-300">Dari</Label>
+                  <Input
+                    type="date"
+                    value={generateForm.start_date}
+                    onChange={(e) => setGenerateForm(prev => ({ ...prev, start_date: e.target.value }))}
+                    className="bg-frestea-surface border-frestea-purple/30"
+                    data-testid="generate-start-input"
+                  />
+                </div>
+                <div>
+                  <Label className="text-purple-300">Sampai</Label>
+                  <Input
+                    type="date"
+                    value={generateForm.end_date}
+                    onChange={(e) => setGenerateForm(prev => ({ ...prev, end_date: e.target.value }))}
+                    className="bg-frestea-surface border-frestea-purple/30"
+                    data-testid="generate-end-input"
+                  />
+                </div>
+                <div className="flex items-end">
+                  <Button
+                    onClick={handleGenerateSchedules}
+                    disabled={generatingSchedules}
+                    className="w-full bg-frestea-purple hover:bg-frestea-purple/80"
+                    data-testid="generate-schedules-btn"
+                  >
+                    {generatingSchedules ? (
+                      <RefreshCw className="w-4 h-4 mr-2 animate-spin" />
+                    ) : (
+                      <CalendarDays className="w-4 h-4 mr-2" />
+                    )}
+                    {generatingSchedules ? "Generating..." : "Generate Jadwal"}
+                  </Button>
+                </div>
+              </div>
+
               {/* Schedule List */}
               <Table>
                 <TableHeader>
@@ -1094,6 +1311,7 @@ const AdminPage = () => {
                     <TableHead className="text-purple-300">Subuh</TableHead>
                     <TableHead className="text-purple-300">Maghrib</TableHead>
                     <TableHead className="text-purple-300">Wilayah</TableHead>
+                    <TableHead className="text-purple-300">Zona</TableHead>
                     <TableHead className="text-purple-300 text-right">Aksi</TableHead>
                   </TableRow>
                 </TableHeader>
@@ -1104,6 +1322,7 @@ const AdminPage = () => {
                       <TableCell className="text-purple-300 font-mono">{schedule.subuh_time || "-"}</TableCell>
                       <TableCell className="text-frestea-gold font-mono">{schedule.maghrib_time}</TableCell>
                       <TableCell className="text-purple-300">{schedule.location}</TableCell>
+                      <TableCell className="text-purple-300">{schedule.timezone || "WIB"}</TableCell>
                       <TableCell className="text-right space-x-2">
                         <Dialog>
                           <DialogTrigger asChild>
@@ -1155,6 +1374,22 @@ const AdminPage = () => {
                                   className="bg-frestea-dark border-frestea-purple/30"
                                 />
                               </div>
+                              <div>
+                                <Label className="text-purple-300">Zona Waktu</Label>
+                                <Select
+                                  value={editingSchedule?.timezone || "WIB"}
+                                  onValueChange={(value) => setEditingSchedule(prev => ({ ...prev, timezone: value }))}
+                                >
+                                  <SelectTrigger className="bg-frestea-dark border-frestea-purple/30">
+                                    <SelectValue />
+                                  </SelectTrigger>
+                                  <SelectContent>
+                                    {TIMEZONES.map((tz) => (
+                                      <SelectItem key={tz} value={tz}>{tz}</SelectItem>
+                                    ))}
+                                  </SelectContent>
+                                </Select>
+                              </div>
                             </div>
                             <DialogFooter>
                               <DialogClose asChild>
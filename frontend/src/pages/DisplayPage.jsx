@@ -1,10 +1,30 @@
 import { useState, useEffect, useRef, useCallback } from "react";
 import axios from "axios";
 import { Volume2, VolumeX } from "lucide-react";
+import { useServerClock } from "../hooks/use-server-clock";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Lokasi layar dari URL, mis. /display?location=Makassar (kosong = lokasi default)
+const DISPLAY_LOCATION = new URLSearchParams(window.location.search).get("location");
+const LOCATION_QUERY = DISPLAY_LOCATION ? `?location=${encodeURIComponent(DISPLAY_LOCATION)}` : "";
+
+// ID layar untuk heartbeat: ?screen= di URL, atau ID acak yang disimpan di browser
+const getScreenId = () => {
+  const fromUrl = new URLSearchParams(window.location.search).get("screen");
+  if (fromUrl) return fromUrl;
+  let screenId = localStorage.getItem("screenId");
+  if (!screenId) {
+    screenId = `screen-${Math.random().toString(36).slice(2, 10)}`;
+    localStorage.setItem("screenId", screenId);
+  }
+  return screenId;
+};
+const SCREEN_ID = getScreenId();
+const HEARTBEAT_INTERVAL_MS = 30000;
+const PLAY_EVENTS_MAX = 1000;
+
 const DisplayPage = () => {
   const [displayState, setDisplayState] = useState(null);
   const [countdown, setCountdown] = useState(null);
@@ -16,40 +36,174 @@ const DisplayPage = () => {
   const [showCountdownVideo, setShowCountdownVideo] = useState(false);
   const [intervalTimer, setIntervalTimer] = useState(0);
 
+  // Stream aktif = polling tidak perlu jalan
+  const streamConnected = useRef(false);
+
+  // Jam server (dikoreksi round trip), supaya semua layar berganti di detik yang sama
+  const serverNow = useServerClock(API);
+
+  // Saat Maghrib dalam jam server (epoch ms) selama state countdown
+  const countdownDeadline = useRef(null);
+
+  const applyDisplayState = useCallback((data) => {
+    setDisplayState(data);
+    if (data.state === "countdown") {
+      // maghrib_at absolut; countdown_seconds sudah basi sebesar latensi jaringan
+      countdownDeadline.current = data.maghrib_at
+        ? Date.parse(data.maghrib_at)
+        : serverNow() + (data.countdown_seconds || 0) * 1000;
+      setCountdown(Math.max(Math.floor((countdownDeadline.current - serverNow()) / 1000), 0));
+    }
+  }, [serverNow]);
+
+  // ETag terakhir, untuk conditional GET (304 Not Modified)
+  const displayEtag = useRef(null);
+
   // Fetch display state
-  const fetchDisplayState = useCallback(async () => {
+  const fetchDisplayState = useCallback(async (force = false) => {
     try {
-      const response = await axios.get(`${API}/display-state`);
-      setDisplayState(response.data);
-      if (response.data.countdown_seconds) {
-        setCountdown(response.data.countdown_seconds);
-      }
+      const headers = !force && displayEtag.current ? { "If-None-Match": displayEtag.current } : {};
+      const response = await axios.get(`${API}/display-state${LOCATION_QUERY}`, {
+        headers,
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+      });
+      if (response.status === 304) return;
+      displayEtag.current = response.headers.etag || null;
+      applyDisplayState(response.data);
     } catch (error) {
       console.error("Error fetching display state:", error);
     }
-  }, []);
+  }, [applyDisplayState]);
 
+  // Server push (SSE) - state dikirim saat connect, transisi, dan perubahan admin
+  useEffect(() => {
+    if (typeof EventSource === "undefined") return;
+    const source = new EventSource(`${API}/display-stream${LOCATION_QUERY}`);
+    source.addEventListener("state", (event) => {
+      streamConnected.current = true;
+      applyDisplayState(JSON.parse(event.data));
+    });
+    source.onerror = () => {
+      // EventSource reconnect otomatis, sementara itu polling ambil alih
+      streamConnected.current = false;
+    };
+    return () => {
+      streamConnected.current = false;
+      source.close();
+    };
+  }, [applyDisplayState]);
+
+  // Polling sebagai fallback jika stream tidak tersedia
   useEffect(() => {
     fetchDisplayState();
-    const interval = setInterval(fetchDisplayState, 30000);
+    const interval = setInterval(() => {
+      if (!streamConnected.current) {
+        fetchDisplayState();
+      }
+    }, 30000);
     return () => clearInterval(interval);
   }, [fetchDisplayState]);
 
-  // Countdown timer
+  // Heartbeat ke server: state, video yang diputar, buffer dan jam layar
+  const displayStateRef = useRef(null);
+  const stallCount = useRef(0);
+  displayStateRef.current = displayState;
+
+  // Proof-of-play: event pemutaran TVC, dikirim per batch bersama heartbeat
+  const playEvents = useRef([]);
+  const currentPlay = useRef(null); // video_id TVC yang sedang diputar
+
+  const recordPlay = useCallback((videoId, event) => {
+    playEvents.current.push({ video_id: videoId, event, played_at: Date.now() });
+    if (playEvents.current.length > PLAY_EVENTS_MAX) playEvents.current.shift();
+  }, []);
+
+  const finishPlay = useCallback((completed) => {
+    if (currentPlay.current) recordPlay(currentPlay.current, completed ? "complete" : "skipped");
+    currentPlay.current = null;
+  }, [recordPlay]);
+
   useEffect(() => {
-    if (displayState?.state === "countdown" && countdown !== null) {
-      const timer = setInterval(() => {
-        setCountdown((prev) => {
-          if (prev <= 1) {
-            fetchDisplayState();
-            return 0;
-          }
-          return prev - 1;
+    const sendHeartbeat = () => {
+      const video = videoRef.current;
+      let bufferedSeconds = null;
+      if (video && video.buffered.length > 0) {
+        bufferedSeconds = Math.max(video.buffered.end(video.buffered.length - 1) - video.currentTime, 0);
+      }
+      const stalls = stallCount.current;
+      stallCount.current = 0;
+      axios.post(`${API}/screens/heartbeat`, {
+        screen_id: SCREEN_ID,
+        location: displayStateRef.current?.location || DISPLAY_LOCATION,
+        state: displayStateRef.current?.state || "loading",
+        video_url: video?.currentSrc || null,
+        buffered_seconds: bufferedSeconds,
+        stalls,
+        client_time: Date.now(),
+      }).catch(() => {});
+
+      if (playEvents.current.length > 0) {
+        const events = playEvents.current.splice(0, 500);
+        axios.post(`${API}/screens/plays`, {
+          screen_id: SCREEN_ID,
+          location: displayStateRef.current?.location || DISPLAY_LOCATION,
+          events,
+        }).catch(() => {
+          // Kirim ulang di heartbeat berikutnya
+          playEvents.current = events.concat(playEvents.current).slice(-PLAY_EVENTS_MAX);
         });
-      }, 1000);
-      return () => clearInterval(timer);
-    }
-  }, [displayState?.state, countdown, fetchDisplayState]);
+      }
+    };
+    sendHeartbeat();
+    const interval = setInterval(sendHeartbeat, HEARTBEAT_INTERVAL_MS);
+    return () => clearInterval(interval);
+  }, []);
+
+  const handleStall = () => {
+    stallCount.current += 1;
+  };
+
+  // TVC yang terpotong (pindah state, video berganti) tercatat skipped
+  useEffect(() => {
+    if (displayState?.state !== "tvc") finishPlay(false);
+  }, [displayState?.state, finishPlay]);
+
+  const handleTvcPlay = () => {
+    const videoId = displayState?.current_tvc_videos?.[currentVideoIndex]?.id;
+    if (!videoId || currentPlay.current === videoId) return; // Lanjut setelah pause, bukan pemutaran baru
+    finishPlay(false);
+    currentPlay.current = videoId;
+    recordPlay(videoId, "start");
+  };
+
+  // Countdown timer: sisa waktu dihitung ulang dari jam server tiap detik,
+  // jadi tidak ikut tertinggal saat timer browser diperlambat
+  const berbukaStartedFor = useRef(null);
+  useEffect(() => {
+    if (displayState?.state !== "countdown" || countdownDeadline.current === null) return;
+    let timer;
+    const tick = () => {
+      const deadline = countdownDeadline.current;
+      const remainingMs = deadline - serverNow();
+      if (remainingMs <= 0) {
+        setCountdown(0);
+        if (berbukaStartedFor.current !== deadline) {
+          berbukaStartedFor.current = deadline;
+          // Berbuka mulai tepat saat Maghrib, tanpa menunggu jawaban server
+          setDisplayState((prev) => (
+            prev?.state === "countdown" ? { ...prev, state: "berbuka", countdown_seconds: null } : prev
+          ));
+          fetchDisplayState(true);
+        }
+        return;
+      }
+      setCountdown(Math.floor(remainingMs / 1000));
+      // Bangun tepat setelah angka detik berganti
+      timer = setTimeout(tick, (remainingMs % 1000) + 5);
+    };
+    tick();
+    return () => clearTimeout(timer);
+  }, [displayState?.state, displayState?.maghrib_at, fetchDisplayState, serverNow]);
 
   // Interval timer untuk countdown video
   useEffect(() => {
@@ -108,6 +262,7 @@ const DisplayPage = () => {
         videoRef.current.play();
       }
     } else if (displayState?.state === "tvc") {
+      finishPlay(true);
       if (videoCount <= 1) {
         // Single TVC video - restart
         if (videoRef.current) {
@@ -162,6 +317,7 @@ const DisplayPage = () => {
                 autoPlay
                 muted={isMuted}
                 playsInline
+                onWaiting={handleStall}
                 onEnded={handleCountdownVideoEnded}
                 data-testid="countdown-video-player"
               />
@@ -263,6 +419,7 @@ const DisplayPage = () => {
               autoPlay
               muted={isMuted}
               playsInline
+              onWaiting={handleStall}
               onEnded={handleVideoEnded}
               data-testid="berbuka-video-player"
             />
@@ -302,6 +459,8 @@ const DisplayPage = () => {
               autoPlay
               muted={isMuted}
               playsInline
+              onWaiting={handleStall}
+              onPlay={handleTvcPlay}
               onEnded={handleVideoEnded}
               data-testid="tvc-video-player"
             />
@@ -317,7 +476,7 @@ const DisplayPage = () => {
                 <p className="text-xl md:text-2xl text-frestea-green mt-4">Berasa Refresh Beneran</p>
                 {displayState?.maghrib_time && (
                   <p className="text-purple-300 text-base mt-8">
-                    Maghrib Hari Ini: <span className="text-frestea-gold font-bold">{displayState.maghrib_time}</span> WIB
+                    Maghrib Hari Ini: <span className="text-frestea-gold font-bold">{displayState.maghrib_time}</span> {displayState.timezone || "WIB"}
                   </p>
                 )}
               </div>
@@ -0,0 +1,82 @@
+"""
+Shared fixtures: the backend modules are imported from backend/, and every
+test gets its own in-memory storage (mongomock or a temporary SQLite file)
+instead of a MongoDB server.
+
+  pip install -r backend/requirements-dev.txt
+  python -m pytest -q
+
+Without mongomock-motor the MongoDB variants are skipped.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Read by server.py at import time; nothing connects to this URL
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "countdown_test")
+os.environ.setdefault("DISPLAY_SNAPSHOT_PATH", os.path.join(tempfile.mkdtemp(), "display-snapshot.json"))
+
+import server  # noqa: E402
+from sqlite_repository import SQLiteRepository  # noqa: E402
+
+REPOSITORY_BACKENDS = ["mongo", "sqlite"]
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+def make_repository(backend: str, tmp_path: Path):
+    if backend == "sqlite":
+        return SQLiteRepository(str(tmp_path / "countdown.db"), readers=2)
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from mongo_repository import MongoRepository
+    repository = MongoRepository(mongomock_motor.AsyncMongoMockClient()["countdown_test"])
+    # mongomock has no sessions
+    repository.transactions_supported = False
+    return repository
+
+@pytest.fixture(params=REPOSITORY_BACKENDS)
+def repository(request, tmp_path):
+    repository = make_repository(request.param, tmp_path)
+    yield repository
+    repository.close()
+
+@pytest.fixture(params=REPOSITORY_BACKENDS)
+def client(request, tmp_path, monkeypatch):
+    """TestClient running the app's lifespan on fresh storage and upload directories"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(server, "repo", make_repository(request.param, tmp_path))
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path / "uploads" / "videos")
+    monkeypatch.setattr(server, "UPLOAD_TMP_DIR", tmp_path / "uploads" / "tmp")
+    monkeypatch.setattr(server, "DISPLAY_SNAPSHOT_PATH", str(tmp_path / "display-snapshot.json"))
+    monkeypatch.setattr(server, "display_timeline", server.DisplayTimeline())
+    # Their asyncio events bind to the first loop that waits on them
+    monkeypatch.setattr(server, "display_hub", server.DisplayHub())
+    monkeypatch.setattr(server, "screen_fleet", server.ScreenFleet())
+    monkeypatch.setattr(server, "auth_users", server.AuthUsers())
+    monkeypatch.setattr(server, "token_cache", server.OrderedDict())
+    monkeypatch.setattr(server, "login_failures", {})
+    # Shut down with every lifespan, which a worker runs only once
+    monkeypatch.setattr(server, "auth_executor", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(server, "probe_executor", None)
+    # Cheapest bcrypt cost: hashing speed is not under test
+    gensalt = server.bcrypt.gensalt
+    monkeypatch.setattr(server.bcrypt, "gensalt", lambda rounds=12, prefix=b"2b": gensalt(4, prefix))
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def auth_headers(client):
+    response = client.post("/api/auth/setup", json={"username": "admin", "password": "admin123"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['token']}"}
@@ -0,0 +1,47 @@
+"""GET /api/admin/bootstrap: the whole admin panel in one request, or only the sections changed since a version"""
+
+SECTIONS = {"tvc_videos", "berbuka_videos", "countdown_videos", "schedules", "users"}
+
+def bootstrap(client, headers, **params) -> dict:
+    response = client.get("/api/admin/bootstrap", headers=headers, params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_full_bootstrap(client, auth_headers):
+    client.post("/api/tvc-videos", headers=auth_headers, json={"name": "TVC", "url": "https://cdn.example/t.mp4"})
+    result = bootstrap(client, auth_headers)
+    assert result["full"] is True
+    assert SECTIONS <= set(result)
+    assert [video["name"] for video in result["tvc_videos"]] == ["TVC"]
+    assert [user["username"] for user in result["users"]] == ["admin"]
+    assert "password_hash" not in result["users"][0]
+    assert result["display_state"]["state"] == "tvc"
+
+def test_since_returns_only_changed_sections(client, auth_headers):
+    version = bootstrap(client, auth_headers)["version"]
+    unchanged = bootstrap(client, auth_headers, since=version)
+    assert (unchanged["full"], unchanged["version"]) == (False, version)
+    assert not SECTIONS & set(unchanged)
+    assert "display_state" in unchanged
+
+    client.post("/api/schedules", headers=auth_headers, json={"date": "2026-03-01", "maghrib_time": "18:14", "location": "Jakarta"})
+    client.post("/api/tvc-videos", headers=auth_headers, json={"name": "TVC", "url": "https://cdn.example/t.mp4"})
+    delta = bootstrap(client, auth_headers, since=version)
+    assert delta["full"] is False
+    assert delta["version"] != version
+    assert SECTIONS & set(delta) == {"schedules", "tvc_videos"}
+    assert [s["date"] for s in delta["schedules"]] == ["2026-03-01"]
+
+    client.post("/api/auth/users", headers=auth_headers, json={"username": "editor", "password": "editor1"})
+    delta = bootstrap(client, auth_headers, since=delta["version"])
+    assert SECTIONS & set(delta) == {"users"}
+
+def test_unknown_or_foreign_versions_get_everything(client, auth_headers):
+    version = bootstrap(client, auth_headers)["version"]
+    epoch, numbers = version.split("-", 1)
+    # Another epoch (e.g. a restored database), garbage, or a different section count
+    for since in (f"other-{numbers}", "garbage", f"{epoch}-0.0", f"{epoch}-a.b.c.d.e"):
+        assert bootstrap(client, auth_headers, since=since)["full"] is True, since
+
+def test_bootstrap_requires_login(client):
+    assert client.get("/api/admin/bootstrap").status_code in (401, 403)
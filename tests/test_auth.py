@@ -0,0 +1,79 @@
+"""Token verification: the per-token cache and revocation by password change or user deletion"""
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+import server
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+def verify(client, token: str) -> int:
+    return client.get("/api/auth/verify", headers=bearer(token)).status_code
+
+def legacy_token(username: str, **claims) -> str:
+    """A token as issued before iat/iat_ms were added"""
+    payload = {"username": username, "exp": datetime.now(timezone.utc) + timedelta(hours=1), **claims}
+    return jwt.encode(payload, server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+
+def change_password(client, token: str, current: str, new: str):
+    return client.post("/api/auth/change-password", headers=bearer(token),
+                       json={"current_password": current, "new_password": new})
+
+def test_changed_password_token_is_valid_at_once(client, auth_headers):
+    old_token = auth_headers["Authorization"].split()[1]
+    password, token = "admin123", old_token
+    # Same millisecond as the revocation or not, the fresh token must verify
+    for i in range(10):
+        response = change_password(client, token, password, f"secret{i}")
+        assert response.status_code == 200, response.text
+        password, token = f"secret{i}", response.json()["token"]
+        assert verify(client, token) == 200
+    assert verify(client, old_token) == 401
+
+def test_other_sessions_are_revoked(client, auth_headers):
+    other = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"}).json()["token"]
+    assert verify(client, other) == 200
+    token = auth_headers["Authorization"].split()[1]
+    assert change_password(client, token, "admin123", "newpass1").status_code == 200
+    # Cached as verified before, rejected now
+    assert verify(client, other) == 401
+    assert client.post("/api/auth/login", json={"username": "admin", "password": "newpass1"}).status_code == 200
+
+def test_legacy_tokens_valid_until_first_revocation(client, auth_headers):
+    no_iat = legacy_token("admin")
+    seconds_iat = legacy_token("admin", iat=int(datetime.now(timezone.utc).timestamp()) - 5)
+    assert verify(client, no_iat) == 200
+    assert verify(client, seconds_iat) == 200
+
+    token = auth_headers["Authorization"].split()[1]
+    assert change_password(client, token, "admin123", "newpass1").status_code == 200
+    assert verify(client, no_iat) == 401
+    assert verify(client, seconds_iat) == 401
+
+def test_deleted_user_tokens_are_rejected(client, auth_headers):
+    user = client.post("/api/auth/users", headers=auth_headers, json={"username": "editor", "password": "editor1"}).json()
+    token = client.post("/api/auth/login", json={"username": "editor", "password": "editor1"}).json()["token"]
+    assert verify(client, token) == 200
+    assert client.delete(f"/api/auth/users/{user['id']}", headers=auth_headers).status_code == 200
+    assert verify(client, token) == 401
+
+def test_verification_is_cached(client, auth_headers):
+    token = auth_headers["Authorization"].split()[1]
+    assert verify(client, token) == 200
+    assert token in server.token_cache
+    assert verify(client, token) == 200
+
+def test_invalid_tokens(client, auth_headers):
+    expired = legacy_token("admin", exp=datetime.now(timezone.utc) - timedelta(seconds=1))
+    forged = jwt.encode({"username": "admin", "exp": datetime.now(timezone.utc) + timedelta(hours=1)}, "wrong", algorithm="HS256")
+    unknown = legacy_token("nobody")
+    for token in (expired, forged, unknown, "garbage"):
+        assert verify(client, token) == 401
+
+def test_login_throttle(client, auth_headers):
+    for _ in range(server.LOGIN_MAX_FAILURES):
+        assert client.post("/api/auth/login", json={"username": "admin", "password": "wrong"}).status_code == 401
+    response = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
@@ -0,0 +1,48 @@
+import pytest
+from fastapi import HTTPException
+
+from server import parse_byte_range
+
+SIZE = 1000
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=999-999", (999, 999)),
+    ("BYTES = 10-20", (10, 20)),
+    # Overlong end is clamped to the file
+    ("bytes=900-5000", (900, 999)),
+    # Suffix: the last N bytes, all of them if N exceeds the size
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert parse_byte_range(header, SIZE) == expected
+
+@pytest.mark.parametrize("header", [
+    "items=0-10",
+    "bytes=0-10,20-30",
+    "bytes=abc-",
+    "bytes=10-xyz",
+    "bytes=-",
+    "bytes=",
+])
+def test_malformed_or_multiple_ranges_send_whole_file(header):
+    assert parse_byte_range(header, SIZE) is None
+
+@pytest.mark.parametrize("header", [
+    "bytes=1000-",
+    "bytes=5000-6000",
+    "bytes=500-100",
+    "bytes=-0",
+])
+def test_unsatisfiable_ranges_are_416(header):
+    with pytest.raises(HTTPException) as error:
+        parse_byte_range(header, SIZE)
+    assert error.value.status_code == 416
+    assert error.value.headers["Content-Range"] == f"bytes */{SIZE}"
+
+def test_any_range_of_empty_file_is_416():
+    with pytest.raises(HTTPException) as error:
+        parse_byte_range("bytes=0-", 0)
+    assert error.value.status_code == 416
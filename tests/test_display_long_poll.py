@@ -0,0 +1,50 @@
+"""GET /api/display-state: ETag/If-None-Match and the ?wait= long-poll"""
+import asyncio
+import time
+
+import server
+
+async def add_tvc(name: str):
+    video = server.TVCVideoCreate(name=name, url=f"https://cdn.example/{name}.mp4", order=0)
+    await server.create_tvc_video(video, username="admin")
+
+def test_conditional_get(client):
+    response = client.get("/api/display-state")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+    etag = response.headers["ETag"]
+    not_modified = client.get("/api/display-state", headers={"If-None-Match": etag})
+    assert (not_modified.status_code, not_modified.content) == (304, b"")
+    assert not_modified.headers["ETag"] == etag
+    assert client.get("/api/display-state", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+def test_wait_without_change_times_out_as_304(client, monkeypatch):
+    monkeypatch.setattr(server, "DISPLAY_LONG_POLL_MAX_SECONDS", 0.2)
+    etag = client.get("/api/display-state").headers["ETag"]
+    started = time.monotonic()
+    # ?wait= beyond the maximum is capped
+    response = client.get("/api/display-state", params={"wait": 30}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert 0.2 <= time.monotonic() - started < 5
+    assert server.display_hub.subscribers == {}
+
+def test_wait_answers_on_change(client):
+    etag = client.get("/api/display-state").headers["ETag"]
+
+    async def scenario():
+        waiting = asyncio.create_task(server.get_display_state(wait=30, location=None, if_none_match=etag))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        await add_tvc("promo")
+        return await asyncio.wait_for(waiting, 5)
+
+    response = client.portal.call(scenario)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert b"promo" in response.body
+
+def test_wait_with_outdated_etag_answers_at_once(client):
+    started = time.monotonic()
+    response = client.get("/api/display-state", params={"wait": 30}, headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert time.monotonic() - started < 5
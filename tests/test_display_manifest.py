@@ -0,0 +1,60 @@
+"""GET /api/display-manifest: the media screens should prefetch, in full or as changes since a version"""
+import os
+
+import server
+
+def upload(client, headers) -> dict:
+    response = client.post("/api/upload/video", headers=headers, files={"file": ("clip.mp4", os.urandom(2048), "video/mp4")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def add_tvc(client, headers, media: dict, order: int) -> str:
+    response = client.post("/api/tvc-videos", headers=headers, json={"name": f"TVC {order}", "url": media["url"], "order": order})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def manifest(client, **params) -> dict:
+    response = client.get("/api/display-manifest", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_manifest_lists_media_with_size_and_hash(client, auth_headers):
+    media = upload(client, auth_headers)
+    add_tvc(client, auth_headers, media, 0)
+    result = manifest(client)
+    assert result["full"] is True
+    [item] = result["items"]
+    assert (item["url"], item["size"], item["sha256"]) == (media["url"], media["size"], media["sha256"])
+    assert item["states"] == ["tvc"]
+
+def test_changes_since_version(client, auth_headers):
+    first, second = upload(client, auth_headers), upload(client, auth_headers)
+    first_id = add_tvc(client, auth_headers, first, 0)
+    version = manifest(client)["version"]
+    assert manifest(client, since=version)["items"] == []
+
+    add_tvc(client, auth_headers, second, 1)
+    delta = manifest(client, since=version)
+    assert delta["full"] is False
+    assert [item["url"] for item in delta["items"]] == [second["url"]]
+    assert delta["removed"] == []
+
+    version = delta["version"]
+    client.delete(f"/api/tvc-videos/{first_id}", headers=auth_headers)
+    delta = manifest(client, since=version)
+    assert (delta["items"], delta["removed"]) == ([], [first["url"]])
+
+def test_version_is_a_content_hash(client, auth_headers):
+    add_tvc(client, auth_headers, upload(client, auth_headers), 0)
+    version = manifest(client)["version"]
+    # Another worker computes the same version from the same data, so "no changes" holds anywhere...
+    server.manifest_versions.clear()
+    unchanged = manifest(client, since=version)
+    assert (unchanged["version"], unchanged["full"], unchanged["items"]) == (version, False, [])
+    # ...but it can only diff against versions it served itself: unknown ones get everything
+    add_tvc(client, auth_headers, upload(client, auth_headers), 1)
+    server.manifest_versions.clear()
+    result = manifest(client, since=version)
+    assert result["full"] is True
+    assert len(result["items"]) == 2
+    assert manifest(client, since="unknown")["full"] is True
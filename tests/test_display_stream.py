@@ -0,0 +1,57 @@
+"""GET /api/display-stream: the state on connect, then a Server-Sent Event per change"""
+import asyncio
+import json
+
+import server
+
+def parse_event(chunk: str) -> tuple:
+    event, data = chunk.rstrip("\n").split("\n")
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+async def add_tvc(name: str):
+    video = server.TVCVideoCreate(name=name, url=f"https://cdn.example/{name}.mp4", order=0)
+    await server.create_tvc_video(video, username="admin")
+
+def test_initial_state_then_changes(client):
+    async def scenario():
+        response = await server.display_stream(location=None)
+        assert response.media_type == "text/event-stream"
+        assert response.headers["X-Accel-Buffering"] == "no"
+        events = response.body_iterator
+        event, state = parse_event(await events.__anext__())
+        assert (event, state["state"], state["current_tvc_videos"]) == ("state", "tvc", [])
+
+        await add_tvc("promo")
+        event, state = parse_event(await asyncio.wait_for(events.__anext__(), 5))
+        assert [video["name"] for video in state["current_tvc_videos"]] == ["promo"]
+
+        assert sum(len(queues) for queues in server.display_hub.subscribers.values()) == 1
+        await events.aclose()
+        assert server.display_hub.subscribers == {}
+
+    client.portal.call(scenario)
+
+def test_idle_stream_sends_pings(client, monkeypatch):
+    monkeypatch.setattr(server, "DISPLAY_STREAM_HEARTBEAT_SECONDS", 0.05)
+
+    async def scenario():
+        events = (await server.display_stream(location=None)).body_iterator
+        await events.__anext__()
+        assert await asyncio.wait_for(events.__anext__(), 5) == ": ping\n\n"
+        await events.aclose()
+
+    client.portal.call(scenario)
+
+def test_slow_subscriber_keeps_latest_states(client, monkeypatch):
+    monkeypatch.setattr(server, "DISPLAY_STREAM_QUEUE_SIZE", 2)
+
+    async def scenario():
+        hub = server.display_hub
+        queue = hub.subscribe("Jakarta")
+        for message in ("a", "b", "c"):
+            hub.publish("jakarta", message)
+        assert [queue.get_nowait() for _ in range(queue.qsize())] == ["b", "c"]
+        hub.unsubscribe("Jakarta", queue)
+        assert hub.subscribers == {}
+
+    client.portal.call(scenario)
@@ -0,0 +1,158 @@
+"""
+DisplayTimeline answers /display-state from compiled intervals; payload_at
+splices countdown_seconds into cached JSON and must stay byte-identical to
+serializing state_at at every instant.
+"""
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import server
+from server import INDONESIA_TIMEZONES, DisplayTimeline
+
+WIB = INDONESIA_TIMEZONES["WIB"]
+WITA = INDONESIA_TIMEZONES["WITA"]
+
+BERBUKA_SECONDS = 600
+
+def make_timeline() -> DisplayTimeline:
+    timeline = DisplayTimeline()
+    timeline._apply({
+        "first_date": "2026-03-01",
+        "last_date": "2026-03-10",
+        "schedules": [
+            {"id": "s1", "date": "2026-03-02", "subuh_time": "04:40", "maghrib_time": "18:14",
+             "location": "Jakarta", "timezone": "WIB"},
+            {"id": "s2", "date": "2026-03-02", "subuh_time": "04:50", "maghrib_time": "18:22",
+             "location": "Makassar", "timezone": "WITA"},
+        ],
+        "tvc_videos": [
+            {"id": "t1", "name": "TVC 1", "url": "/api/videos/t1.mp4", "order": 0},
+            {"id": "t2", "name": "TVC 2", "url": "/api/videos/t2.mp4", "order": 1},
+        ],
+        "berbuka_video": {"id": "b1", "name": "Berbuka", "url": "/api/videos/b1.mp4", "duration_seconds": BERBUKA_SECONDS},
+        "countdown_video": {"id": "c1", "name": "Countdown", "url": "/api/videos/c1.mp4"},
+        "media_info": {},
+    })
+    return timeline
+
+def at(tz, *args) -> datetime:
+    return tz.localize(datetime(*args))
+
+# Instants around every boundary of 2026-03-02 in Jakarta
+JAKARTA_INSTANTS = [
+    ((2026, 3, 2, 0, 0, 0), "tvc"),
+    ((2026, 3, 2, 4, 39, 59), "tvc"),
+    ((2026, 3, 2, 4, 40, 0), "countdown"),
+    ((2026, 3, 2, 12, 0, 0), "countdown"),
+    ((2026, 3, 2, 18, 13, 59), "countdown"),
+    ((2026, 3, 2, 18, 14, 0), "berbuka"),
+    ((2026, 3, 2, 18, 23, 59), "berbuka"),
+    ((2026, 3, 2, 18, 24, 0), "tvc"),
+    ((2026, 3, 2, 23, 59, 59), "tvc"),
+    # No schedule that day: idle TVC without schedule fields
+    ((2026, 3, 3, 18, 14, 0), "tvc"),
+]
+
+@pytest.mark.parametrize("instant, state", JAKARTA_INSTANTS)
+def test_payload_matches_state_json(instant, state):
+    timeline = make_timeline()
+    location = timeline.location("Jakarta")
+    now = at(WIB, *instant)
+    expected = timeline.state_at(now, location)
+    assert expected.state == state
+    assert timeline.payload_at(now, location) == expected.model_dump_json().encode()
+    # Served again from the cached template
+    assert timeline.payload_at(now, location) == expected.model_dump_json().encode()
+
+def test_countdown_is_spliced_per_request():
+    timeline = make_timeline()
+    location = timeline.location("Jakarta")
+    seen = set()
+    for seconds in (0, 1, 59, 3600):
+        now = at(WIB, 2026, 3, 2, 18, 13, 59) - timedelta(seconds=seconds)
+        payload = json.loads(timeline.payload_at(now, location))
+        assert payload["state"] == "countdown"
+        assert payload["countdown_seconds"] == seconds + 1
+        assert payload["countdown_video"]["id"] == "c1"
+        seen.add(payload["countdown_seconds"])
+    assert len(seen) == 4
+
+def test_transition_instants():
+    timeline = make_timeline()
+    state = timeline.state_at(at(WIB, 2026, 3, 2, 12, 0), timeline.location("Jakarta"))
+    assert state.maghrib_at == "2026-03-02T18:14:00+07:00"
+    assert state.berbuka_end_at == "2026-03-02T18:24:00+07:00"
+
+def test_berbuka_state_fields():
+    timeline = make_timeline()
+    state = timeline.state_at(at(WIB, 2026, 3, 2, 18, 20), timeline.location("Jakarta"))
+    assert state.countdown_seconds is None
+    assert state.countdown_video is None
+    assert state.berbuka_end_time == "2026-03-02T18:24:00+07:00"
+    assert state.berbuka_video.id == "b1"
+
+def test_idle_day_has_no_schedule_fields():
+    timeline = make_timeline()
+    state = timeline.state_at(at(WIB, 2026, 3, 3, 12, 0), timeline.location("Jakarta"))
+    assert state.state == "tvc"
+    assert state.maghrib_time is None
+    assert state.maghrib_at is None
+    assert [video.id for video in state.current_tvc_videos] == ["t1", "t2"]
+
+def test_locations_use_their_own_time_zone():
+    timeline = make_timeline()
+    location = timeline.location("makassar")
+    assert location.timezone == "WITA"
+    # 17:21 in Jakarta, long before Jakarta's maghrib but 30 s before Makassar's
+    now = at(WITA, 2026, 3, 2, 18, 21, 30)
+    state = timeline.state_at(now, location)
+    assert state.state == "countdown"
+    assert state.countdown_seconds == 30
+    assert state.maghrib_at == "2026-03-02T18:22:00+08:00"
+    assert timeline.payload_at(now, location) == state.model_dump_json().encode()
+
+def test_unknown_location_shows_tvc():
+    timeline = make_timeline()
+    location = timeline.location("Sorong")
+    now = at(WIB, 2026, 3, 2, 18, 14)
+    assert timeline.state_at(now, location).state == "tvc"
+    assert timeline.payload_at(now, location) == timeline.state_at(now, location).model_dump_json().encode()
+
+def test_etag_changes_only_at_boundaries():
+    timeline = make_timeline()
+    location = timeline.location("Jakarta")
+    countdown = {timeline.etag(at(WIB, 2026, 3, 2, hour, minute), location) for hour, minute in ((4, 40), (12, 0), (18, 13))}
+    assert len(countdown) == 1
+    assert timeline.etag(at(WIB, 2026, 3, 2, 18, 14), location) not in countdown
+    assert timeline.etag(at(WIB, 2026, 3, 2, 4, 39), location) not in countdown
+
+def test_etag_follows_data():
+    timeline = make_timeline()
+    now = at(WIB, 2026, 3, 2, 12, 0)
+    before = timeline.etag(now, timeline.location("Jakarta"))
+    changed = make_timeline()
+    changed._apply({
+        "first_date": "2026-03-01", "last_date": "2026-03-10",
+        "schedules": [{"id": "s1", "date": "2026-03-02", "subuh_time": "04:40", "maghrib_time": "18:15",
+                       "location": "Jakarta", "timezone": "WIB"}],
+        "tvc_videos": [], "berbuka_video": None, "countdown_video": None, "media_info": {},
+    })
+    assert changed.etag(now, changed.location("Jakarta")) != before
+
+def test_window_holds_every_zone_through_jakartas_last_day():
+    timeline = make_timeline()
+    wit = INDONESIA_TIMEZONES["WIT"]
+    # 23:30 in Jakarta on 03-10 is already 03-11 in Jayapura, past the window
+    assert at(WIB, 2026, 3, 10, 23, 30).astimezone(wit).date() == date(2026, 3, 11)
+    assert timeline.covers(date(2026, 3, 9))
+    assert not timeline.covers(date(2026, 3, 10))
+    assert not timeline.covers(date(2026, 2, 28))
+
+def test_rebuilt_window_covers_today(client):
+    assert client.get("/api/display-state").status_code == 200
+    today = datetime.now(server.JAKARTA_TZ).date()
+    timeline = server.display_timeline
+    assert timeline.last_date == today + timedelta(days=server.TIMELINE_DAYS_AHEAD + 1)
+    assert timeline.covers(today + timedelta(days=server.TIMELINE_DAYS_AHEAD))
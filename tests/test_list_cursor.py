@@ -0,0 +1,70 @@
+"""Keyset pagination of the admin lists: ?limit= pages chained by X-Next-Cursor"""
+import pytest
+
+def create_schedules(client, headers, locations, days):
+    csv = "date,maghrib_time,location\n" + "".join(
+        f"2026-03-{day:02d},18:{day:02d},{location}\n" for day in range(1, days + 1) for location in locations
+    )
+    response = client.post("/api/schedules/import", headers=headers, files={"file": ("jadwal.csv", csv.encode())})
+    assert response.json()["inserted"] == len(locations) * days
+
+def pages(client, url: str, limit: int, **filters):
+    """Every page of `url`, following X-Next-Cursor until it is absent"""
+    result, cursor = [], None
+    while True:
+        params = {**filters, "limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(url, params=params)
+        assert response.status_code == 200, response.text
+        result.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return result
+
+@pytest.mark.parametrize("limit", [1, 4, 5, 7, 100])
+def test_schedule_pages_cover_list_once(client, auth_headers, limit):
+    create_schedules(client, auth_headers, ["Bandung", "Jakarta"], 10)
+    everything = client.get("/api/schedules").json()
+    assert "X-Next-Cursor" not in client.get("/api/schedules").headers
+    assert [(s["date"], s["location"]) for s in everything] == sorted((s["date"], s["location"]) for s in everything)
+
+    result = pages(client, "/api/schedules", limit)
+    assert all(len(page) == limit for page in result[:-1])
+    assert 0 < len(result[-1]) <= limit
+    assert [s for page in result for s in page] == everything
+
+def test_cursor_with_filters_and_fields(client, auth_headers):
+    create_schedules(client, auth_headers, ["Bandung", "Jakarta"], 10)
+    result = pages(client, "/api/schedules", 4, location="Jakarta", fields="date", **{"from": "2026-03-03", "to": "2026-03-08"})
+    assert result == [
+        [{"date": "2026-03-03"}, {"date": "2026-03-04"}, {"date": "2026-03-05"}, {"date": "2026-03-06"}],
+        [{"date": "2026-03-07"}, {"date": "2026-03-08"}],
+    ]
+
+def test_page_boundary_is_stable_under_inserts(client, auth_headers):
+    create_schedules(client, auth_headers, ["Jakarta"], 6)
+    first = client.get("/api/schedules", params={"limit": 3})
+    cursor = first.headers["X-Next-Cursor"]
+    # Sorts before the cursor: not repeated or shifted into the next page
+    client.post("/api/schedules", headers=auth_headers, json={"date": "2026-02-28", "maghrib_time": "18:10", "location": "Jakarta"})
+    second = client.get("/api/schedules", params={"limit": 3, "cursor": cursor})
+    assert [s["date"] for s in first.json()] == ["2026-03-01", "2026-03-02", "2026-03-03"]
+    assert [s["date"] for s in second.json()] == ["2026-03-04", "2026-03-05", "2026-03-06"]
+    assert "X-Next-Cursor" not in second.headers
+
+def test_video_pages(client, auth_headers):
+    for order in (2, 0, 1, 0):
+        response = client.post("/api/tvc-videos", headers=auth_headers, json={"name": f"TVC {order}", "url": f"https://cdn.example/{order}.mp4", "order": order})
+        assert response.status_code == 200, response.text
+    everything = client.get("/api/tvc-videos").json()
+    assert [video["order"] for video in everything] == [0, 0, 1, 2]
+    assert [video for page in pages(client, "/api/tvc-videos", 1) for video in page] == everything
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "e30", "WyIyMDI2LTAzLTAxIl0"])
+def test_invalid_cursor_is_400(client, cursor):
+    # e30 is {} and WyIyMDI2LTAzLTAxIl0 a one-field key: wrong shape for (date, location)
+    response = client.get("/api/schedules", params={"limit": 2, "cursor": cursor})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("params", [{"limit": 0}, {"fields": "date,nope"}, {"from": "03/01/2026"}])
+def test_invalid_list_parameters(client, params):
+    assert client.get("/api/schedules", params=params).status_code in (400, 422)
@@ -0,0 +1,58 @@
+"""Media probing: failures are recorded on the media_files record and never escape the background task"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import media_probe
+import server
+
+@pytest.fixture
+def probe_in_thread(monkeypatch):
+    """Probe in a thread, so a patched media_probe.probe_file is the one that runs"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(server, "probe_executor", executor)
+    yield
+    executor.shutdown()
+
+def upload(client, headers) -> str:
+    response = client.post("/api/upload/video", headers=headers, files={"file": ("clip.mp4", os.urandom(2048), "video/mp4")})
+    assert response.status_code == 200, response.text
+    return response.json()["filename"]
+
+def probe_all(client, headers) -> dict:
+    response = client.post("/api/media/probe", headers=headers, params={"all": True})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def media(client, filename: str) -> dict:
+    return client.portal.call(server.repo.find_media, filename)
+
+def test_unparseable_file_is_probed_with_reason(client, auth_headers, probe_in_thread):
+    filename = upload(client, auth_headers)
+    assert probe_all(client, auth_headers) == {"probed": 0, "failed": 1}
+    record = media(client, filename)
+    assert record["probed_at"] is not None
+    assert record["probe_error"]
+    assert client.portal.call(server.repo.media_filenames, True) == []
+
+def test_probe_crash_leaves_file_unprobed(client, auth_headers, probe_in_thread, monkeypatch):
+    def crash(path):
+        raise IndexError("parser bug")
+    monkeypatch.setattr(media_probe, "probe_file", crash)
+    filename = upload(client, auth_headers)
+    assert probe_all(client, auth_headers) == {"probed": 0, "failed": 1}
+    record = media(client, filename)
+    assert record.get("probed_at") is None
+    assert record["probe_error"] == "IndexError: parser bug"
+    assert client.portal.call(server.repo.media_filenames, True) == [filename]
+
+def test_broken_pool_is_replaced(client, auth_headers, probe_in_thread, monkeypatch):
+    def broken(path):
+        raise BrokenProcessPool("worker died")
+    monkeypatch.setattr(media_probe, "probe_file", broken)
+    upload(client, auth_headers)
+    executor = server.probe_executor
+    probe_all(client, auth_headers)
+    assert server.probe_executor is not executor
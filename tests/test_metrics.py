@@ -0,0 +1,69 @@
+"""The metrics module's text format, and /metrics labelling requests by route template"""
+import pytest
+
+import metrics
+import server
+
+def sample(text: str, series: str) -> float:
+    """Value of one series, e.g. 'name{a="b"}'; 0 when it has not been recorded yet"""
+    for line in text.splitlines():
+        name, _, value = line.rpartition(" ")
+        if name == series:
+            return float(value)
+    return 0
+
+def test_counter_and_gauge_render():
+    registry = metrics.Registry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    in_flight = registry.gauge("in_flight", "In flight")
+    requests.inc("/a")
+    requests.inc("/a", amount=2)
+    requests.inc('quote"d\n')
+    in_flight.inc()
+    in_flight.dec(amount=0.5)
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a"} 3',
+        'requests_total{route="quote\\"d\\n"} 1',
+        "# HELP in_flight In flight",
+        "# TYPE in_flight gauge",
+        "in_flight 0.5",
+    ]
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value=value)
+    text = "\n".join(histogram.render())
+    assert sample(text, 'latency_seconds_bucket{le="0.1"}') == 2
+    assert sample(text, 'latency_seconds_bucket{le="1"}') == 3
+    assert sample(text, 'latency_seconds_bucket{le="+Inf"}') == 4
+    assert sample(text, "latency_seconds_sum") == pytest.approx(3.65)
+    assert sample(text, "latency_seconds_count") == 4
+
+def test_label_count_is_checked():
+    counter = metrics.Counter("c_total", "C", ("a", "b"))
+    with pytest.raises(ValueError):
+        counter.inc("only-one")
+
+def test_requests_are_labelled_by_route_template(client):
+    video = 'http_requests_total{route="/api/videos/{file_path:path}",method="GET",status="404"}'
+    unmatched = 'http_requests_total{route="unmatched",method="GET",status="404"}'
+    before = client.get("/metrics").text
+    for name in ("a.mp4", "b.mp4", "ab/cd/c.mp4"):
+        assert client.get(f"/api/videos/{name}").status_code == 404
+    client.get("/no-such-page")
+    after = client.get("/metrics")
+    assert after.headers["content-type"] == metrics.CONTENT_TYPE
+    # One series for every file path, so the label set stays bounded
+    assert sample(after.text, video) - sample(before, video) == 3
+    assert sample(after.text, unmatched) - sample(before, unmatched) == 1
+    assert "c.mp4" not in after.text
+    duration = 'http_request_duration_seconds_count{route="/api/videos/{file_path:path}",method="GET"}'
+    assert sample(after.text, duration) - sample(before, duration) == 3
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(server, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
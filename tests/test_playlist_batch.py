@@ -0,0 +1,49 @@
+"""POST /api/playlists/batch: playlist order and is_active for the three video collections in one write"""
+import pytest
+
+import server
+
+def create(client, headers, kind: str, name: str, **fields) -> str:
+    response = client.post(f"/api/{kind}", headers=headers, json={"name": name, "url": f"https://cdn.example/{name}.mp4", **fields})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def batch(client, headers, body: dict):
+    return client.post("/api/playlists/batch", headers=headers, json=body)
+
+def test_reorder_and_toggle(client, auth_headers):
+    tvc = [create(client, auth_headers, "tvc-videos", f"tvc{i}", order=i) for i in range(3)]
+    berbuka = create(client, auth_headers, "berbuka-videos", "berbuka")
+    response = batch(client, auth_headers, {
+        "tvc_videos": {"order": tvc[::-1], "active": {tvc[0]: False}},
+        "berbuka_videos": {"active": {berbuka: False}},
+    })
+    assert response.status_code == 200, response.text
+    # The middle video keeps its position: counted only when something changed
+    assert response.json()["modified"] == {"tvc_videos": 2, "berbuka_videos": 1}
+
+    videos = client.get("/api/tvc-videos").json()
+    assert [video["id"] for video in videos] == tvc[::-1]
+    assert {video["id"]: video["is_active"] for video in videos} == {tvc[0]: False, tvc[1]: True, tvc[2]: True}
+    assert client.get("/api/berbuka-videos").json()[0]["is_active"] is False
+    # One rebuild sees the whole batch
+    assert [video.id for video in server.display_timeline.tvc_videos] == [tvc[2], tvc[1]]
+
+@pytest.mark.parametrize("body, status", [
+    ({}, 400),
+    ({"berbuka_videos": {"order": []}}, 400),
+    ({"tvc_videos": {"order": ["missing"]}}, 400),
+    ({"tvc_videos": {"active": {"missing": True}}}, 404),
+])
+def test_invalid_batches_change_nothing(client, auth_headers, body, status):
+    video_id = create(client, auth_headers, "tvc-videos", "tvc", order=0)
+    assert batch(client, auth_headers, body).status_code == status
+    assert client.get("/api/tvc-videos").json()[0]["id"] == video_id
+
+def test_partial_order_is_rejected(client, auth_headers):
+    tvc = [create(client, auth_headers, "tvc-videos", f"tvc{i}", order=i) for i in range(2)]
+    assert batch(client, auth_headers, {"tvc_videos": {"order": tvc[:1]}}).status_code == 400
+    assert batch(client, auth_headers, {"tvc_videos": {"order": [tvc[0], tvc[0], tvc[1]]}}).status_code == 400
+
+def test_batch_requires_login(client):
+    assert batch(client, {}, {"tvc_videos": {"active": {}}}).status_code in (401, 403)
@@ -0,0 +1,51 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+import prayer_times
+
+# Kemenag RI jadwal imsakiyah, 1 Ramadan 1446 H (2025-03-01): latitude,
+# longitude, elevation, UTC offset, Subuh, Maghrib
+KEMENAG_2025_03_01 = {
+    "Jakarta": (-6.1754, 106.8272, 8, 7, "04:41", "18:15"),
+    "Surabaya": (-7.2575, 112.7521, 3, 7, "04:16", "17:51"),
+    "Makassar": (-5.1477, 119.4327, 5, 8, "04:51", "18:24"),
+}
+
+# The low-precision solar formulas are good to about a minute, and Kemenag
+# rounds per region rather than per city
+TOLERANCE_MINUTES = 2
+
+def minutes(label: str) -> int:
+    hour, minute = map(int, label.split(":"))
+    return hour * 60 + minute
+
+def test_matches_kemenag_tables():
+    cities = list(KEMENAG_2025_03_01.values())
+    subuh, maghrib = prayer_times.compute_prayer_times(
+        [c[0] for c in cities], [c[1] for c in cities], [c[2] for c in cities], [c[3] for c in cities],
+        date(2025, 3, 1), 1,
+    )
+    for i, (name, city) in enumerate(KEMENAG_2025_03_01.items()):
+        assert abs(subuh[i, 0] - minutes(city[4])) <= TOLERANCE_MINUTES, name
+        assert abs(maghrib[i, 0] - minutes(city[5])) <= TOLERANCE_MINUTES, name
+
+def test_grid_shape_and_whole_minutes():
+    subuh, maghrib = prayer_times.compute_prayer_times([-6.2, 3.6], [106.8, 98.7], [0, 0], [7, 7], date(2026, 1, 1), 30)
+    assert subuh.shape == maghrib.shape == (2, 30)
+    assert np.array_equal(subuh, np.ceil(subuh))
+    # Subuh before sunrise, Maghrib after noon, everywhere in Indonesia
+    assert ((subuh > 4 * 60) & (subuh < 5 * 60 + 30)).all()
+    assert ((maghrib > 17 * 60 + 30) & (maghrib < 18 * 60 + 45)).all()
+
+def test_ihtiyat_is_added():
+    args = ([-6.2], [106.8], [0], [7], date(2026, 3, 1), 1)
+    subuh, maghrib = prayer_times.compute_prayer_times(*args, ihtiyat_minutes=0)
+    subuh_ihtiyat, maghrib_ihtiyat = prayer_times.compute_prayer_times(*args)
+    assert subuh_ihtiyat[0, 0] - subuh[0, 0] == pytest.approx(prayer_times.IHTIYAT_MINUTES, abs=1)
+    assert maghrib_ihtiyat[0, 0] - maghrib[0, 0] == pytest.approx(prayer_times.IHTIYAT_MINUTES, abs=1)
+
+def test_format_minutes():
+    labels = prayer_times.format_minutes(np.array([[0.0, 278.0, 1095.0, np.nan]]))
+    assert labels.tolist() == [["00:00", "04:38", "18:15", ""]]
@@ -0,0 +1,291 @@
+"""
+One set of behaviours both storage backends must share: every test runs
+against MongoRepository (on mongomock) and SQLiteRepository.
+"""
+import pytest
+
+from repository import DuplicateError, ListQuery
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def repo(repository):
+    await repository.ensure_schema()
+    return repository
+
+def schedule(date: str, location: str = "Jakarta", maghrib_time: str = "18:14", **fields) -> dict:
+    return {
+        "id": f"{location}-{date}",
+        "date": date,
+        "subuh_time": "04:40",
+        "maghrib_time": maghrib_time,
+        "location": location,
+        "timezone": "WIB",
+        "created_at": "2026-01-01T00:00:00+00:00",
+        **fields,
+    }
+
+def video(video_id: str, order: int = 0, is_active: bool = True) -> dict:
+    return {
+        "id": video_id,
+        "name": f"Video {video_id}",
+        "url": f"/api/videos/{video_id}.mp4",
+        "order": order,
+        "is_active": is_active,
+        "created_at": f"2026-01-01T00:00:0{order}+00:00",
+    }
+
+def media(filename: str, sha256: str, size: int = 100, ref_count: int = 0) -> dict:
+    return {
+        "id": filename,
+        "filename": filename,
+        "sha256": sha256,
+        "size": size,
+        "content_type": "video/mp4",
+        "original_name": filename,
+        "ref_count": ref_count,
+        "created_at": "2026-01-01T00:00:00+00:00",
+    }
+
+# ---- Admin users ----
+
+async def test_users(repo):
+    assert await repo.count_users() == 0
+    await repo.insert_user({"id": "u1", "username": "admin", "password_hash": "h", "created_at": "2026-01-01"})
+    with pytest.raises(DuplicateError):
+        await repo.insert_user({"id": "u2", "username": "admin", "password_hash": "h", "created_at": "2026-01-02"})
+    await repo.insert_user({"id": "u3", "username": "editor", "password_hash": "h", "created_at": "2026-01-03"})
+
+    assert (await repo.find_user("admin"))["id"] == "u1"
+    assert (await repo.find_user_by_id("u3"))["username"] == "editor"
+    assert await repo.find_user("nobody") is None
+    assert [user["username"] for user in await repo.list_users()] == ["admin", "editor"]
+    assert all("password_hash" not in user for user in await repo.list_users())
+
+    await repo.update_user({"tokens_valid_after": 1767225600123}, username="editor")
+    states = {state["username"]: state["tokens_valid_after"] for state in await repo.user_token_states()}
+    assert states == {"admin": 0, "editor": 1767225600123}
+
+    assert await repo.delete_user("u3")
+    assert not await repo.delete_user("u3")
+    assert await repo.count_users() == 1
+
+# ---- Videos ----
+
+async def test_videos(repo):
+    await repo.insert_video("tvc_videos", video("t2", order=1))
+    await repo.insert_video("tvc_videos", video("t1", order=0))
+    await repo.insert_video("tvc_videos", video("t3", order=2, is_active=False))
+    await repo.insert_video("berbuka_videos", {**video("b1"), "duration_seconds": 300})
+    assert await repo.video_ids("tvc_videos") == {"t1", "t2", "t3"}
+
+    tvc, berbuka, countdown = await repo.display_videos()
+    assert [v["id"] for v in tvc] == ["t1", "t2"]
+    assert berbuka["id"] == "b1" and berbuka["is_active"] is True
+    assert countdown is None
+
+    before, after = await repo.update_video("tvc_videos", "t1", {"name": "Renamed", "is_active": False})
+    assert (before["name"], after["name"], after["is_active"]) == ("Video t1", "Renamed", False)
+    assert await repo.update_video("tvc_videos", "missing", {"name": "x"}) is None
+
+    modified = await repo.apply_video_updates({"tvc_videos": {"t2": {"order": 5}, "missing": {"order": 1}}})
+    assert modified == {"tvc_videos": 1}
+    assert sorted(await repo.video_urls()) == sorted(f"/api/videos/{i}.mp4" for i in ("t1", "t2", "t3", "b1"))
+
+    assert (await repo.delete_video("tvc_videos", "t3"))["id"] == "t3"
+    assert await repo.delete_video("tvc_videos", "t3") is None
+
+# ---- Schedules ----
+
+async def test_schedule_unique_location_date(repo):
+    await repo.insert_schedule(schedule("2026-03-01"))
+    with pytest.raises(DuplicateError):
+        await repo.insert_schedule(schedule("2026-03-01", id="other"))
+    # Same date elsewhere is fine
+    await repo.insert_schedule(schedule("2026-03-01", location="Bandung"))
+
+    collided = await repo.insert_schedules([schedule("2026-03-02"), schedule("2026-03-01", id="again")])
+    assert collided == {1}
+
+    await repo.insert_schedule(schedule("2026-03-03"))
+    with pytest.raises(DuplicateError):
+        await repo.update_schedule("Jakarta-2026-03-03", {"date": "2026-03-02"})
+    updated = await repo.update_schedule("Jakarta-2026-03-03", {"maghrib_time": "18:13"})
+    assert updated["maghrib_time"] == "18:13"
+    assert await repo.update_schedule("missing", {"maghrib_time": "18:13"}) is None
+    assert await repo.delete_schedule("Jakarta-2026-03-03")
+    assert not await repo.delete_schedule("Jakarta-2026-03-03")
+
+async def test_schedule_queries(repo):
+    for day in range(1, 6):
+        for location in ("Jakarta", "Bandung"):
+            await repo.insert_schedule(schedule(f"2026-03-0{day}", location=location))
+
+    between = await repo.schedules_between("2026-03-02", "2026-03-04")
+    assert sorted((s["date"], s["location"]) for s in between) == [
+        (f"2026-03-0{day}", location) for day in (2, 3, 4) for location in ("Bandung", "Jakarta")
+    ]
+    found = await repo.find_schedules(["Jakarta"], ["2026-03-01", "2026-03-05", "2026-04-01"])
+    assert sorted(s["date"] for s in found) == ["2026-03-01", "2026-03-05"]
+    assert all("_id" not in s for s in found)
+
+async def test_upsert_schedules(repo):
+    await repo.insert_schedule(schedule("2026-03-01"))
+    inserted, modified = await repo.upsert_schedules(
+        [schedule("2026-03-01", maghrib_time="18:15", id="new-id"), schedule("2026-03-02")], overwrite=False
+    )
+    assert (inserted, modified) == (1, 0)
+    assert (await repo.find_schedules(["Jakarta"], ["2026-03-01"]))[0]["maghrib_time"] == "18:14"
+
+    inserted, modified = await repo.upsert_schedules([schedule("2026-03-01", maghrib_time="18:15", id="new-id")])
+    assert (inserted, modified) == (0, 1)
+    stored = (await repo.find_schedules(["Jakarta"], ["2026-03-01"]))[0]
+    # Only the schedule fields change; id and created_at are kept
+    assert (stored["maghrib_time"], stored["id"]) == ("18:15", "Jakarta-2026-03-01")
+
+# ---- Keyset listings ----
+
+async def test_keyset_listing(repo):
+    for day in range(1, 8):
+        for location in ("Jakarta", "Bandung"):
+            await repo.insert_schedule(schedule(f"2026-03-{day:02d}", location=location))
+    query = ListQuery("maghrib_schedules", ("date", "location"), equals={"location": "Jakarta"},
+                      ranges={"date": ("2026-03-02", None)}, fields=frozenset({"date"}))
+
+    upto, has_more = await repo.list_boundary(query, None, 3)
+    assert (tuple(upto), has_more) == (("2026-03-04", "Jakarta"), True)
+    first = [doc async for doc in repo.iter_list(query, None, upto)]
+    assert [doc["date"] for doc in first] == ["2026-03-02", "2026-03-03", "2026-03-04"]
+    assert all(set(doc) <= {"date", "location"} for doc in first)
+
+    upto, has_more = await repo.list_boundary(query, tuple(upto), 3)
+    assert (tuple(upto), has_more) == (("2026-03-07", "Jakarta"), False)
+    assert await repo.list_boundary(query, ("2026-03-07", "Jakarta"), 3) == (None, False)
+
+    everything = ListQuery("maghrib_schedules", ("date", "location"))
+    keys = [(doc["date"], doc["location"]) async for doc in repo.iter_list(everything, ("2026-03-06", "Bandung"))]
+    assert keys == [("2026-03-06", "Jakarta"), ("2026-03-07", "Bandung"), ("2026-03-07", "Jakarta")]
+
+# ---- Media library ----
+
+async def test_media(repo):
+    await repo.insert_media(media("a.mp4", "aaa", size=100, ref_count=1))
+    await repo.insert_media(media("b.mp4", "bbb", size=50))
+    with pytest.raises(DuplicateError):
+        await repo.insert_media(media("c.mp4", "aaa"))
+    with pytest.raises(DuplicateError):
+        await repo.insert_media(media("a.mp4", "ccc"))
+
+    assert (await repo.find_media_by_sha256("bbb"))["filename"] == "b.mp4"
+    assert await repo.find_media("c.mp4") is None
+    assert await repo.media_usage() == {"files": 2, "bytes": 150, "unreferenced_files": 1, "unreferenced_bytes": 50}
+
+    await repo.change_media_refs("a.mp4", 2)
+    await repo.change_media_refs("a.mp4", -3)
+    assert (await repo.find_media("a.mp4"))["ref_count"] == 0
+    # A decrement that would go below zero is not applied
+    await repo.change_media_refs("a.mp4", -1)
+    assert (await repo.find_media("a.mp4"))["ref_count"] == 0
+    await repo.set_media_refs({"b.mp4": 2})
+    assert [(await repo.find_media(name))["ref_count"] for name in ("a.mp4", "b.mp4")] == [0, 2]
+
+    assert sorted(await repo.media_filenames(unprobed_only=True)) == ["a.mp4", "b.mp4"]
+    before = await repo.update_media_probe("a.mp4", {"duration_seconds": 12.5, "probed_at": "2026-01-01"})
+    assert before["filename"] == "a.mp4" and before.get("duration_seconds") is None
+    assert await repo.media_filenames(unprobed_only=True) == ["b.mp4"]
+    info = {doc["filename"]: doc for doc in await repo.media_info(["a.mp4", "missing.mp4"])}
+    assert list(info) == ["a.mp4"]
+    assert (info["a.mp4"]["size"], info["a.mp4"]["duration_seconds"]) == (100, 12.5)
+
+    await repo.delete_media("a.mp4")
+    assert await repo.find_media("a.mp4") is None
+
+async def test_upload_sessions(repo):
+    session = {"id": "up1", "filename": "a.mp4", "content_type": "video/mp4", "size": 10, "sha256": None, "created_at": "2026-01-01"}
+    await repo.insert_upload_session(session)
+    assert (await repo.find_upload_session("up1"))["size"] == 10
+    assert await repo.delete_upload_session("up1")
+    assert not await repo.delete_upload_session("up1")
+    assert await repo.find_upload_session("up1") is None
+
+# ---- Screen heartbeats ----
+
+async def test_heartbeats(repo):
+    beat = {"screen_id": "s1", "location": "Jakarta", "state": "tvc", "video_url": None,
+            "buffered_seconds": 4.5, "stalls": 0, "clock_drift_ms": 12}
+    await repo.insert_heartbeats([
+        {**beat, "received_at": "2026-03-01T10:00:00+00:00"},
+        {**beat, "received_at": "2026-03-02T10:00:00+00:00"},
+    ])
+    assert await repo.delete_heartbeats_before("2026-03-02T00:00:00+00:00") == 1
+    assert await repo.delete_heartbeats_before("2026-03-02T00:00:00+00:00") == 0
+
+# ---- Proof-of-play ----
+
+def play_rows(period: str, value: str, video_id: str, screen_id: str, starts: int, completes: int = 0, skips: int = 0):
+    return {period: value, "video_id": video_id, "screen_id": screen_id, "starts": starts, "completes": completes, "skips": skips}
+
+PLAY_EVENT = {"screen_id": "s1", "hour": "2026-03-01T18", "location": "Jakarta", "video_id": "v1",
+              "event": "start", "played_at": "2026-03-01T18:05:00+07:00"}
+
+async def record_batch(repo, batch_id: str, starts: int = 1):
+    await repo.record_plays(
+        batch_id,
+        [PLAY_EVENT] * starts,
+        [play_rows("hour", "2026-03-01T18", "v1", "s1", starts), play_rows("hour", "2026-03-01T19", "v2", "s2", 1, skips=1)],
+        [play_rows("date", "2026-03-01", "v1", "s1", starts), play_rows("date", "2026-03-01", "v2", "s2", 1, skips=1)],
+    )
+
+async def test_play_report(repo):
+    await record_batch(repo, "b1", starts=2)
+    await record_batch(repo, "b2", starts=1)
+
+    daily = await repo.play_report("date", "2026-03-01", "2026-03-01", False)
+    assert daily == [
+        {"period": "2026-03-01", "video_id": "v1", "starts": 3, "completes": 0, "skips": 0},
+        {"period": "2026-03-01", "video_id": "v2", "starts": 2, "completes": 0, "skips": 2},
+    ]
+    hourly = await repo.play_report("hour", "2026-03-01T00", "2026-03-01T23", True, video_id="v2")
+    assert hourly == [{"period": "2026-03-01T19", "video_id": "v2", "screen_id": "s2", "starts": 2, "completes": 0, "skips": 2}]
+    assert await repo.play_report("date", "2026-03-01", "2026-03-01", True, screen_id="s9") == []
+    assert await repo.play_report("date", "2026-03-02", "2026-03-31", False) == []
+
+async def test_play_batch_applies_once(repo):
+    await record_batch(repo, "b1", starts=2)
+    # A retry of the same batch, e.g. after the reply was lost
+    await record_batch(repo, "b1", starts=2)
+    daily = await repo.play_report("date", "2026-03-01", "2026-03-01", True)
+    assert [(row["video_id"], row["starts"]) for row in daily] == [("v1", 2), ("v2", 1)]
+
+async def test_prune_plays(repo):
+    await record_batch(repo, "b1")
+    assert await repo.prune_plays("2026-03-01T00", "2026-03-01T00") == 0
+    assert await repo.prune_plays("2026-03-02T00", "2026-03-02T00") == 1
+    # Rollups are kept
+    assert len(await repo.play_report("date", "2026-03-01", "2026-03-01", True)) == 2
+
+# ---- Admin panel revisions ----
+
+async def test_revisions(repo):
+    revisions = await repo.get_revisions()
+    assert revisions["epoch"]
+    await repo.bump_revisions(("schedules", "media"))
+    await repo.bump_revisions(("schedules",))
+    bumped = await repo.get_revisions()
+    assert bumped["epoch"] == revisions["epoch"]
+    assert (bumped["schedules"] - revisions.get("schedules", 0), bumped["media"] - revisions.get("media", 0)) == (2, 1)
+
+async def test_reading_revisions_does_not_write(repo, monkeypatch):
+    if not hasattr(repo, "db"):
+        pytest.skip("MongoDB only")
+    import mongomock
+    first = await repo.get_revisions()
+    writes = []
+    for name in ("update_one", "find_one_and_update"):
+        original = getattr(mongomock.collection.Collection, name)
+        def counted(self, *args, _original=original, _name=name, **kwargs):
+            writes.append(_name)
+            return _original(self, *args, **kwargs)
+        monkeypatch.setattr(mongomock.collection.Collection, name, counted)
+    assert [await repo.get_revisions() for _ in range(3)] == [first] * 3
+    assert writes == []
@@ -0,0 +1,102 @@
+"""Row report of POST /api/schedules/import, for CSV and Excel files"""
+import io
+from datetime import date, time
+
+import pytest
+
+CSV_ROWS = (
+    "tanggal,subuh,maghrib,lokasi,zona\n"
+    "2026-03-01,04:40,18:14,Jakarta,WIB\n"
+    "2026-03-02,,18:14,Jakarta,\n"
+    "2026-03-01,04:40,18:14,Jakarta,WIB\n"  # same date and location again
+    "01/03/2026,04:40,18:14,Bandung,WIB\n"
+    "2026-03-01,04:50,18:22,Makassar,WITA\n"
+    ",,,,\n"  # blank rows are skipped, not reported
+    "2026-03-03,04:40,,Jakarta,WIB\n"
+    "2026-03-04,04:40,18:15,Jayapura,XYZ\n"
+)
+
+def import_file(client, headers, filename: str, content: bytes):
+    return client.post("/api/schedules/import", headers=headers, files={"file": (filename, content)})
+
+def statuses(report: dict) -> dict:
+    return {row["row"]: (row["status"], row["date"], row["location"]) for row in report["rows"]}
+
+def test_csv_row_report(client, auth_headers):
+    response = import_file(client, auth_headers, "jadwal.csv", CSV_ROWS.encode())
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["total"], report["inserted"], report["updated"], report["unchanged"], report["invalid"]) == (7, 3, 0, 0, 4)
+    rows = statuses(report)
+    assert rows == {
+        2: ("inserted", "2026-03-01", "Jakarta"),
+        3: ("inserted", "2026-03-02", "Jakarta"),
+        4: ("invalid", "2026-03-01", "Jakarta"),
+        5: ("invalid", None, None),
+        6: ("inserted", "2026-03-01", "Makassar"),
+        8: ("invalid", None, None),
+        9: ("invalid", None, None),
+    }
+    errors = {row["row"]: row["error"] for row in report["rows"] if row["error"]}
+    assert "duplikat" in errors[4]
+    assert "YYYY-MM-DD" in errors[5]
+    assert "maghrib" in errors[8]
+    assert "WIB, WITA, atau WIT" in errors[9]
+
+    schedules = client.get("/api/schedules").json()
+    assert [(s["date"], s["location"], s["subuh_time"], s["timezone"]) for s in schedules] == [
+        ("2026-03-01", "Jakarta", "04:40", "WIB"),
+        ("2026-03-01", "Makassar", "04:50", "WITA"),
+        # Defaults for empty cells
+        ("2026-03-02", "Jakarta", "04:30", "WIB"),
+    ]
+
+def test_reimport_reports_updated_and_unchanged(client, auth_headers):
+    first = "date,maghrib_time,location\n2026-03-01,18:14,Jakarta\n2026-03-02,18:14,Jakarta\n"
+    assert import_file(client, auth_headers, "a.csv", first.encode()).json()["inserted"] == 2
+    second = "date,maghrib_time,location\n2026-03-01,18:14,Jakarta\n2026-03-02,18:15,Jakarta\n2026-03-03,18:15,Jakarta\n"
+    report = import_file(client, auth_headers, "b.csv", second.encode()).json()
+    assert [row["status"] for row in report["rows"]] == ["unchanged", "updated", "inserted"]
+    schedules = client.get("/api/schedules?location=Jakarta&fields=date,maghrib_time").json()
+    assert schedules == [
+        {"date": "2026-03-01", "maghrib_time": "18:14"},
+        {"date": "2026-03-02", "maghrib_time": "18:15"},
+        {"date": "2026-03-03", "maghrib_time": "18:15"},
+    ]
+
+def test_xlsx_row_report(client, auth_headers):
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Date", "Subuh_Time", "Maghrib_Time", "Location", "Timezone"])
+    # Typed cells, as Excel stores them
+    sheet.append([date(2026, 3, 1), time(4, 40), time(18, 14), "Jakarta", "WIB"])
+    sheet.append(["2026-03-02", "04:41", "18:14", "Jakarta", "wib"])
+    sheet.append([date(2026, 3, 3), time(4, 41), "6 sore", "Jakarta", "WIB"])
+    content = io.BytesIO()
+    workbook.save(content)
+
+    response = import_file(client, auth_headers, "JADWAL.XLSX", content.getvalue())
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert statuses(report) == {
+        2: ("inserted", "2026-03-01", "Jakarta"),
+        3: ("inserted", "2026-03-02", "Jakarta"),
+        4: ("invalid", None, None),
+    }
+    assert "HH:MM" in report["rows"][2]["error"]
+
+@pytest.mark.parametrize("filename, content, detail", [
+    ("jadwal.txt", b"date,maghrib_time\n", "Format file"),
+    ("jadwal.csv", b"tanggal,lokasi\n2026-03-01,Jakarta\n", "Header"),
+    ("jadwal.csv", "date,maghrib_time\n2026-03-01,18:14\n".encode("utf-16"), "UTF-8"),
+    ("jadwal.xlsx", b"not a workbook", "Excel"),
+])
+def test_rejected_files(client, auth_headers, filename, content, detail):
+    response = import_file(client, auth_headers, filename, content)
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+
+def test_import_requires_login(client):
+    response = client.post("/api/schedules/import", files={"file": ("jadwal.csv", b"date,maghrib_time\n")})
+    assert response.status_code in (401, 403)
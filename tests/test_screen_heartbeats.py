@@ -0,0 +1,88 @@
+"""Screen heartbeats: the in-memory fleet view and batched writes to storage"""
+import time
+
+import pytest
+
+import server
+
+def heartbeat(client, screen_id: str, **fields):
+    body = {"screen_id": screen_id, "state": "tvc", **fields}
+    response = client.post("/api/screens/heartbeat", json=body)
+    assert response.status_code == 204, response.text
+
+def fleet(client, headers, **params) -> dict:
+    response = client.get("/api/admin/screens", headers=headers, params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def stored_heartbeats(client) -> int:
+    """Deletes them: the repository can only count what it prunes"""
+    return client.portal.call(server.repo.delete_heartbeats_before, "9999-12-31")
+
+def test_fleet_keeps_latest_status(client, auth_headers):
+    heartbeat(client, "lobby", location="Jakarta", state="countdown", client_time=int(time.time() * 1000) + 5000)
+    heartbeat(client, "lobby", location="Jakarta", state="berbuka", stalls=2, buffered_seconds=12.5)
+    heartbeat(client, "gate", location="Makassar")
+    result = fleet(client, auth_headers)
+    assert (result["online"], result["offline"], result["pending_writes"]) == (2, 0, 3)
+    gate, lobby = result["screens"]
+    assert (lobby["screen_id"], lobby["state"], lobby["stalls"], lobby["heartbeats"]) == ("lobby", "berbuka", 2, 2)
+    # Only the latest heartbeat counts, and it carried no client clock
+    assert lobby["clock_drift_ms"] is None
+    assert [s["screen_id"] for s in fleet(client, auth_headers, location="makassar")["screens"]] == ["gate"]
+
+def test_clock_drift(client, auth_headers):
+    heartbeat(client, "lobby", client_time=int(time.time() * 1000) + 5000)
+    drift = fleet(client, auth_headers)["screens"][0]["clock_drift_ms"]
+    assert 4000 < drift <= 5000
+
+def test_silent_screens_go_offline(client, auth_headers, monkeypatch):
+    heartbeat(client, "lobby")
+    monkeypatch.setattr(server, "SCREEN_OFFLINE_SECONDS", -1)
+    result = fleet(client, auth_headers)
+    assert (result["online"], result["offline"]) == (0, 1)
+    assert result["screens"][0]["online"] is False
+
+def test_fleet_size_is_bounded(client, monkeypatch):
+    monkeypatch.setattr(server, "SCREEN_FLEET_MAX", 1)
+    heartbeat(client, "lobby")
+    heartbeat(client, "lobby")
+    assert client.post("/api/screens/heartbeat", json={"screen_id": "gate", "state": "tvc"}).status_code == 503
+
+def test_flush_writes_in_batches(client, monkeypatch):
+    monkeypatch.setattr(server, "SCREEN_HEARTBEAT_BATCH_SIZE", 2)
+    batches = []
+    insert = server.repo.insert_heartbeats
+
+    async def counted(docs):
+        batches.append(len(docs))
+        await insert(docs)
+    monkeypatch.setattr(server.repo, "insert_heartbeats", counted)
+
+    for i in range(5):
+        heartbeat(client, f"screen-{i}")
+    client.portal.call(server.screen_fleet.flush)
+    assert batches == [2, 2, 1]
+    assert len(server.screen_fleet.pending) == 0
+    assert stored_heartbeats(client) == 5
+
+def test_failed_flush_keeps_heartbeats_in_order(client, monkeypatch):
+    heartbeat(client, "first")
+    heartbeat(client, "second")
+
+    async def unavailable(docs):
+        raise ConnectionError("database down")
+    insert = server.repo.insert_heartbeats
+    monkeypatch.setattr(server.repo, "insert_heartbeats", unavailable)
+    with pytest.raises(ConnectionError):
+        client.portal.call(server.screen_fleet.flush)
+    heartbeat(client, "third")
+    assert [h["screen_id"] for h in server.screen_fleet.pending] == ["first", "second", "third"]
+
+    monkeypatch.setattr(server.repo, "insert_heartbeats", insert)
+    client.portal.call(server.screen_fleet.flush)
+    assert stored_heartbeats(client) == 3
+
+def test_invalid_heartbeat(client):
+    assert client.post("/api/screens/heartbeat", json={"screen_id": "", "state": "tvc"}).status_code == 422
+    assert client.post("/api/screens/heartbeat", json={"screen_id": "lobby", "state": "tvc", "stalls": -1}).status_code == 422
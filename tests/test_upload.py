@@ -0,0 +1,123 @@
+"""Video uploads: the single-request form upload and resumable sessions"""
+import hashlib
+import os
+
+import pytest
+
+import server
+
+VIDEO = b"\x00\x00\x00\x18ftypmp42" + os.urandom(4096)
+
+def upload(client, headers, content: bytes, **fields):
+    return client.post("/api/upload/video", headers=headers, data=fields,
+                       files={"file": ("clip.mp4", content, "video/mp4")})
+
+def temp_files() -> list:
+    return list(server.UPLOAD_TMP_DIR.iterdir())
+
+def test_upload_is_stored_by_content_hash(client, auth_headers):
+    sha256 = hashlib.sha256(VIDEO).hexdigest()
+    response = upload(client, auth_headers, VIDEO, sha256=sha256)
+    assert response.status_code == 200, response.text
+    stored = response.json()
+    assert stored["sha256"] == sha256
+    assert stored["filename"] == f"{sha256[:2]}/{sha256[2:4]}/{sha256}.mp4"
+    assert stored["deduplicated"] is False
+    assert (server.UPLOAD_DIR / stored["filename"]).read_bytes() == VIDEO
+
+    again = upload(client, auth_headers, VIDEO).json()
+    assert (again["filename"], again["deduplicated"]) == (stored["filename"], True)
+    assert temp_files() == []
+
+def test_upload_rejections(client, auth_headers):
+    assert upload(client, auth_headers, VIDEO, sha256="0" * 64).status_code == 400
+    wrong_type = client.post("/api/upload/video", headers=auth_headers, files={"file": ("a.txt", b"text", "text/plain")})
+    assert wrong_type.status_code == 400
+    assert upload(client, {}, VIDEO).status_code in (401, 403)
+    assert temp_files() == []
+
+def test_oversized_declared_upload_is_refused_before_parsing(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(server, "MAX_UPLOAD_BYTES", 1024)
+    monkeypatch.setattr(server, "UPLOAD_FORM_OVERHEAD_BYTES", 1024)
+    response = upload(client, auth_headers, VIDEO)
+    assert response.status_code == 413
+    assert "maksimal" in response.json()["detail"]
+    assert temp_files() == []
+
+def test_oversized_streamed_upload_is_cut_off(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(server, "MAX_UPLOAD_BYTES", 1024)
+    monkeypatch.setattr(server, "UPLOAD_FORM_OVERHEAD_BYTES", 1024)
+    boundary = "x-boundary"
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"clip.mp4\"\r\n"
+            "Content-Type: video/mp4\r\n\r\n").encode()
+
+    def body():
+        # A generator body is sent chunked, without Content-Length
+        yield head
+        for _ in range(16):
+            yield b"\x00" * 1024
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    response = client.post("/api/upload/video", content=body(),
+                           headers={**auth_headers, "Content-Type": f"multipart/form-data; boundary={boundary}"})
+    assert response.status_code == 413
+    assert temp_files() == []
+
+# ---- Resumable sessions ----
+
+def start_session(client, headers, content: bytes, sha256=None):
+    response = client.post("/api/upload/sessions", headers=headers, json={
+        "filename": "clip.mp4", "content_type": "video/mp4", "size": len(content), "sha256": sha256,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def put_chunk(client, headers, upload_id: str, offset: int, chunk: bytes):
+    return client.put(f"/api/upload/sessions/{upload_id}", params={"offset": offset}, content=chunk, headers=headers)
+
+def test_resumable_upload(client, auth_headers):
+    upload_id = start_session(client, auth_headers, VIDEO, sha256=hashlib.sha256(VIDEO).hexdigest())
+    assert put_chunk(client, auth_headers, upload_id, 0, VIDEO[:1000]).json()["offset"] == 1000
+
+    # A retried or out-of-order chunk is refused with the offset to resume from
+    conflict = put_chunk(client, auth_headers, upload_id, 0, VIDEO[:1000])
+    assert conflict.status_code == 409
+    assert "1000" in conflict.json()["detail"]
+    assert client.get(f"/api/upload/sessions/{upload_id}", headers=auth_headers).json()["offset"] == 1000
+
+    incomplete = client.post(f"/api/upload/sessions/{upload_id}/finalize", headers=auth_headers)
+    assert incomplete.status_code == 400
+
+    assert put_chunk(client, auth_headers, upload_id, 1000, VIDEO[1000:]).json()["offset"] == len(VIDEO)
+    finalized = client.post(f"/api/upload/sessions/{upload_id}/finalize", headers=auth_headers)
+    assert finalized.status_code == 200, finalized.text
+    assert (server.UPLOAD_DIR / finalized.json()["filename"]).read_bytes() == VIDEO
+    assert client.get(f"/api/upload/sessions/{upload_id}", headers=auth_headers).status_code == 404
+    assert upload_id not in server.upload_session_locks
+
+def test_resumable_chunk_past_declared_size(client, auth_headers):
+    upload_id = start_session(client, auth_headers, VIDEO[:100])
+    assert put_chunk(client, auth_headers, upload_id, 0, VIDEO[:50]).status_code == 200
+    assert put_chunk(client, auth_headers, upload_id, 50, VIDEO[50:200]).status_code == 400
+    # The rejected chunk was dropped: resume from where it started
+    assert client.get(f"/api/upload/sessions/{upload_id}", headers=auth_headers).json()["offset"] == 50
+
+def test_resumable_checksum_mismatch_aborts(client, auth_headers):
+    upload_id = start_session(client, auth_headers, VIDEO, sha256="0" * 64)
+    put_chunk(client, auth_headers, upload_id, 0, VIDEO)
+    assert client.post(f"/api/upload/sessions/{upload_id}/finalize", headers=auth_headers).status_code == 400
+    assert client.get(f"/api/upload/sessions/{upload_id}", headers=auth_headers).status_code == 404
+    assert temp_files() == []
+
+@pytest.mark.parametrize("size", [0, 10 ** 15])
+def test_session_size_limits(client, auth_headers, size):
+    response = client.post("/api/upload/sessions", headers=auth_headers,
+                           json={"filename": "clip.mp4", "content_type": "video/mp4", "size": size})
+    assert response.status_code == 413
+
+def test_abort_session(client, auth_headers):
+    upload_id = start_session(client, auth_headers, VIDEO)
+    put_chunk(client, auth_headers, upload_id, 0, VIDEO[:10])
+    assert client.delete(f"/api/upload/sessions/{upload_id}", headers=auth_headers).status_code == 200
+    assert client.delete(f"/api/upload/sessions/{upload_id}", headers=auth_headers).status_code == 404
+    assert temp_files() == []
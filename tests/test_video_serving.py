@@ -0,0 +1,90 @@
+"""GET/HEAD /api/videos/...: Range/206, conditional requests and the X-Accel-Redirect hand-off"""
+import hashlib
+import os
+
+import pytest
+
+import server
+
+VIDEO = os.urandom(10_000)
+SHA256 = hashlib.sha256(VIDEO).hexdigest()
+
+@pytest.fixture
+def video_url(client, auth_headers) -> str:
+    response = client.post("/api/upload/video", headers=auth_headers, files={"file": ("clip.mp4", VIDEO, "video/mp4")})
+    assert response.status_code == 200, response.text
+    return response.json()["url"]
+
+def test_whole_file(client, video_url):
+    response = client.get(video_url)
+    assert response.status_code == 200
+    assert response.content == VIDEO
+    # Strong validator from the content hash the file is named after
+    assert response.headers["ETag"] == f'"{SHA256}"'
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["Content-Type"] == "video/mp4"
+    assert "immutable" in response.headers["Cache-Control"]
+
+def test_etag_survives_mtime_change(client, video_url):
+    before = client.get(video_url).headers["ETag"]
+    os.utime(server.UPLOAD_DIR / video_url.removeprefix("/api/videos/"), (0, 0))
+    assert client.get(video_url).headers["ETag"] == before
+
+def test_legacy_file_names_keep_stat_etag(client, auth_headers):
+    server.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    (server.UPLOAD_DIR / "old-upload.mp4").write_bytes(VIDEO)
+    etag = client.get("/api/videos/old-upload.mp4").headers["ETag"]
+    assert etag.startswith(f'"{len(VIDEO):x}-')
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", slice(0, 100)),
+    ("bytes=9990-", slice(9990, 10_000)),
+    ("bytes=-10", slice(9990, 10_000)),
+])
+def test_range(client, video_url, header, expected):
+    response = client.get(video_url, headers={"Range": header})
+    assert response.status_code == 206
+    assert response.content == VIDEO[expected]
+    assert response.headers["Content-Range"] == f"bytes {expected.start}-{expected.stop - 1}/{len(VIDEO)}"
+    assert response.headers["Content-Length"] == str(expected.stop - expected.start)
+
+def test_unsatisfiable_range(client, video_url):
+    response = client.get(video_url, headers={"Range": "bytes=10000-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(VIDEO)}"
+
+def test_if_range(client, video_url):
+    matching = client.get(video_url, headers={"Range": "bytes=0-9", "If-Range": f'"{SHA256}"'})
+    assert (matching.status_code, matching.content) == (206, VIDEO[:10])
+    stale = client.get(video_url, headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+    assert (stale.status_code, stale.content) == (200, VIDEO)
+
+def test_not_modified(client, video_url):
+    for header in (f'"{SHA256}"', f'W/"{SHA256}"', f'"x", "{SHA256}"', "*"):
+        response = client.get(video_url, headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+        assert response.content == b""
+    assert client.get(video_url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+def test_head(client, video_url):
+    response = client.head(video_url)
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["Content-Length"] == str(len(VIDEO))
+
+def test_accel_redirect(client, video_url, monkeypatch):
+    monkeypatch.setattr(server, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-videos/")
+    response = client.get(video_url)
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["X-Accel-Redirect"] == "/protected-videos/" + video_url.removeprefix("/api/videos/")
+    assert response.headers["ETag"] == f'"{SHA256}"'
+
+@pytest.mark.parametrize("path", ["missing.mp4", "../server.py", "ab/.hidden", "ab//cd.mp4", "ab"])
+def test_missing_or_unsafe_paths(client, video_url, path):
+    assert client.get(f"/api/videos/{path}").status_code == 404
+
+def test_weak_display_etag_still_matches(client):
+    etag = client.get("/api/display-state").headers["ETag"]
+    assert etag.startswith('W/"')
+    assert client.get("/api/display-state", headers={"If-None-Match": etag}).status_code == 304